@@ -1,5 +1,4 @@
 import re
-from tkinter import N
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.core.validators import RegexValidator
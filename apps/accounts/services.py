@@ -11,12 +11,19 @@ Elas devem chamar estas funções.
 """
 
 from django.shortcuts import get_object_or_404
+
+from apps.core.cache import get_or_compute, get_users_cache_version
+from apps.core.memo import request_memoize
 from .models import User  # Importa o modelo de usuário
 
+# Diretório de vendedores em cache; toda escrita de usuário troca a versão.
+SELLER_DIRECTORY_TIMEOUT = 60 * 60
+
 # ==========================
 # FUNÇÕES DE LEITURA (Read)
 # ==========================
 
+@request_memoize
 def get_seller_by_id(user_id: int) -> User:
     """
     Busca um vendedor específico pelo seu ID.
@@ -39,6 +46,7 @@ def get_seller_by_id(user_id: int) -> User:
     return seller
 
 
+@request_memoize
 def get_all_sellers():
     """
     Busca todos os usuários que são do tipo 'sellers'.
@@ -51,6 +59,22 @@ def get_all_sellers():
     return User.objects.filter(user_type='sellers').order_by('first_name', 'last_name')
 
 
+@request_memoize
+def get_seller_directory() -> list[User]:
+    """
+    Lista de vendedores de get_all_sellers() em cache, invalidada por
+    qualquer escrita de usuário (sinais em apps/accounts/signals.py).
+
+    Returns:
+        list[User]: vendedores ordenados por nome.
+    """
+    return get_or_compute(
+        f"accounts:seller_directory:{get_users_cache_version()}",
+        lambda: list(get_all_sellers()),
+        SELLER_DIRECTORY_TIMEOUT,
+    )
+
+
 # ==========================
 # FUNÇÕES DE AÇÃO (Write)
 # ==========================
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.cache import bump_cache_versions
+from .models import User
+
+
+# ==========================
+# INVALIDAÇÃO DE CACHE
+# ==========================
+@receiver(post_save, sender=User)
+def invalidate_user_caches_on_save(sender, instance, update_fields=None, **kwargs):
+    # O login só atualiza last_login, que nenhum cache usa.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_cache_versions(users=True)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_caches_on_delete(sender, instance, **kwargs):
+    bump_cache_versions(users=True)
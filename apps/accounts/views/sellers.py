@@ -14,12 +14,13 @@ from apps.accounts.forms import SellersCreationForm, SellersUpdateForm, SellerPr
 # MUDANÇA: Importamos nosso novo arquivo de serviços!
 # =========================================================
 from apps.accounts import services
+from apps.core.mixins import DataWriteMixin, mark_data_written
 
 
 # ==========================
 # CRIAÇÃO DE VENDEDORES
 # ==========================
-class SellersCreateView(CreateView, LoginRequiredMixin):
+class SellersCreateView(DataWriteMixin, CreateView, LoginRequiredMixin):
     """
     (Sem mudança)
     Como explicado no 'services.py', esta view já separa bem a lógica.
@@ -53,7 +54,7 @@ class SellersListView(ListView, LoginRequiredMixin):
         MUDANÇA: A view não sabe MAIS como buscar os vendedores.
         Ela simplesmente pede ao serviço.
         """
-        return services.get_all_sellers()
+        return services.get_seller_directory()
     
     def get_context_data(self, **kwargs):
         """
@@ -67,8 +68,8 @@ class SellersListView(ListView, LoginRequiredMixin):
         all_sellers = context['sellers'] 
         
         # Filtra a lista para a exibição no template
-        context['active_sellers'] = all_sellers.filter(is_active=True)
-        context['inactive_sellers'] = all_sellers.filter(is_active=False)
+        context['active_sellers'] = [seller for seller in all_sellers if seller.is_active]
+        context['inactive_sellers'] = [seller for seller in all_sellers if not seller.is_active]
         return context
 
 
@@ -96,7 +97,7 @@ class SellersDetailView(DetailView, LoginRequiredMixin):
 # ==========================
 # ATUALIZAÇÃO DE VENDEDORES
 # ==========================
-class SellersUpdateView(UpdateView, LoginRequiredMixin):
+class SellersUpdateView(DataWriteMixin, UpdateView, LoginRequiredMixin):
     """
     Permite editar os dados de um vendedor.
     A view pede o vendedor ao SERVIÇO.
@@ -118,7 +119,7 @@ class SellersUpdateView(UpdateView, LoginRequiredMixin):
 # ==========================
 # EXCLUSÃO DE VENDEDORES
 # ==========================
-class SellersDestroyView(DeleteView, LoginRequiredMixin):
+class SellersDestroyView(DataWriteMixin, DeleteView, LoginRequiredMixin):
     """
     Permite excluir (deletar) um vendedor.
     A view pede o vendedor ao SERVIÇO.
@@ -151,6 +152,7 @@ class SellersDeactivateView(View, LoginRequiredMixin):
         # ========================================================
         try:
             seller = services.toggle_seller_status(user_id=pk)
+            mark_data_written(request)
             
             # A view continua responsável pelo Feedback ao usuário (HTTP)
             status = "ativado" if seller.is_active else "desativado"
@@ -167,7 +169,7 @@ class SellersDeactivateView(View, LoginRequiredMixin):
 # ==========================
 # PERFIL DO VENDEDOR (NOVO)
 # ==========================
-class SellerProfileUpdateView(LoginRequiredMixin, UpdateView):
+class SellerProfileUpdateView(LoginRequiredMixin, DataWriteMixin, UpdateView):
     """
     Permite ao vendedor logado ver e editar seu próprio perfil.
     """
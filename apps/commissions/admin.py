@@ -1,10 +1,17 @@
-from django.contrib import admin
-from .models import Commission
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.core.mixins import mark_data_written
+from .models import Commission, CommissionLedgerEntry, CommissionMonthClose, PayoutBatch
+from .services import close_commission_months
+
 @admin.register(Commission)
 class CommissionAdmin(admin.ModelAdmin):
     list_display = ('sale', 'percentage', 'value', 'paid', 'paid_at')
-    list_filter = ('paid', 'sale__seller')
-    search_fields = ('sale__seller__first_name', 'sale__seller__last_name', 'sale__id')
+    list_filter = ('paid', 'seller')
+    search_fields = ('seller__first_name', 'seller__last_name', 'sale__id')
     readonly_fields = ('value', 'percentage'    )
 
     def save_model(self, request, obj, form, change):
@@ -13,3 +20,48 @@ class CommissionAdmin(admin.ModelAdmin):
         """
         obj.calculate_value()
         super().save_model(request, obj, form, change)
+        mark_data_written(request)
+
+    def has_delete_permission(self, request, obj=None):
+        # A comissão acompanha a venda: exclua a venda (exclusão lógica).
+        return False
+
+
+@admin.register(PayoutBatch)
+class PayoutBatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'paid_at', 'created_by', 'seller_count', 'commission_count', 'total_commission')
+    readonly_fields = ('idempotency_key', 'created_by', 'paid_at', 'total_commission', 'total_sales', 'commission_count', 'seller_count')
+    ordering = ('-paid_at',)
+    actions = ['close_payment_months']
+
+    @admin.action(description="Fechar o mês de pagamento dos lotes selecionados")
+    def close_payment_months(self, request, queryset):
+        """Fecha até o mês do lote mais recente selecionado (e os anteriores em aberto)."""
+        latest = queryset.aggregate(latest=Max('paid_at'))['latest']
+        try:
+            closes = close_commission_months(timezone.localtime(latest).date(), closed_by=request.user)
+        except ValidationError as e:
+            self.message_user(request, e.messages[0], messages.ERROR)
+            return
+        mark_data_written(request)
+        self.message_user(request, f"{len(closes)} mês(es) fechado(s).", messages.SUCCESS)
+
+
+class CommissionLedgerEntryInline(admin.TabularInline):
+    model = CommissionLedgerEntry
+    fields = ('seller', 'total_commission', 'total_sales', 'commission_count')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(CommissionMonthClose)
+class CommissionMonthCloseAdmin(admin.ModelAdmin):
+    list_display = ('month', 'commission_count', 'total_commission', 'total_sales', 'closed_by', 'created_at')
+    readonly_fields = ('month', 'closed_by', 'total_commission', 'total_sales', 'commission_count')
+    ordering = ('-month',)
+    inlines = [CommissionLedgerEntryInline]
+
+    def has_add_permission(self, request):
+        # Fechamentos são criados pelo comando close_commission_month ou pela ação nos lotes.
+        return False
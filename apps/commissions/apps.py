@@ -7,6 +7,7 @@ class CommissionsConfig(AppConfig):
     verbose_name = 'Commissions'
 
     def ready(self):
-        # Importa os sinais para garantir que eles sejam registrados
+        # Importa os sinais e as checagens para garantir que eles sejam registrados
+        import apps.commissions.checks
         import apps.commissions.signals
 
@@ -0,0 +1,27 @@
+from django.core.checks import Error, Tags, register
+from django.db import DatabaseError
+
+
+@register(Tags.database)
+def check_commission_seller_matches_sale(app_configs=None, databases=None, **kwargs):
+    """
+    Commission.seller_id precisa ser igual a sale.seller_id: os serviços de
+    comissões filtram e agrupam pela coluna local, sem passar pela venda.
+    Roda com `python manage.py check --database default`.
+    """
+    from apps.commissions.services import get_commissions_with_wrong_seller
+
+    errors = []
+    for alias in databases or []:
+        try:
+            wrong = get_commissions_with_wrong_seller().using(alias).count()
+        except DatabaseError:
+            continue  # banco ainda sem migrações
+        if wrong:
+            errors.append(Error(
+                f"{wrong} comissões com vendedor diferente do vendedor da venda.",
+                hint="Rode `python manage.py sync_commission_sellers` para corrigir.",
+                obj='commissions.Commission',
+                id='commissions.E001',
+            ))
+    return errors
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.commissions.services import close_commission_months
+from apps.core.utils import parse_month_argument
+
+
+class Command(BaseCommand):
+    help = (
+        "Fecha o mês de pagamento (e os anteriores ainda abertos), congelando "
+        "no ledger os totais de comissões pagas por vendedor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month', type=parse_month_argument,
+            help="Mês a fechar (AAAA-MM). Padrão: mês anterior.",
+        )
+
+    def handle(self, *args, **options):
+        month = options['month'] or (timezone.localdate().replace(day=1) - timedelta(days=1))
+
+        try:
+            closes = close_commission_months(month)
+        except ValidationError as e:
+            raise CommandError(e.messages[0])
+
+        for close in closes:
+            self.stdout.write(
+                f"{close.month:%m/%Y}: {close.commission_count} comissões | R$ {close.total_commission:.2f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(closes)} mês(es) fechado(s)."))
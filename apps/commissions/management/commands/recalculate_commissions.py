@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.models import User
+from apps.commissions.services import recalculate_seller_commissions
+from apps.core.utils import parse_date_argument
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica a taxa de comissão atual do vendedor às comissões existentes "
+        "(por padrão apenas as não pagas) com um único UPDATE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seller', type=int, required=True, help="ID do vendedor.")
+        parser.add_argument('--start', type=parse_date_argument, help="Data inicial da venda (AAAA-MM-DD).")
+        parser.add_argument('--end', type=parse_date_argument, help="Data final da venda (AAAA-MM-DD).")
+        parser.add_argument('--include-paid', action='store_true', help="Inclui comissões já pagas.")
+        parser.add_argument('--dry-run', action='store_true', help="Apenas mostra o que seria alterado.")
+
+    def handle(self, *args, **options):
+        try:
+            result = recalculate_seller_commissions(
+                seller_id=options['seller'],
+                start_date=options['start'],
+                end_date=options['end'],
+                include_paid=options['include_paid'],
+                dry_run=options['dry_run'],
+            )
+        except User.DoesNotExist:
+            raise CommandError(f"Vendedor {options['seller']} não encontrado.")
+
+        self.stdout.write(
+            f"Taxa aplicada: {result['percentage']}% | "
+            f"{result['changed']} de {result['rows']} comissões mudam | "
+            f"total atual R$ {result['current_total']} → novo total R$ {result['new_total']} "
+            f"(diferença R$ {result['difference']})"
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Dry-run: nada foi gravado."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{result['updated']} comissões recalculadas."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.commissions.services import reconcile_commission_counters
+
+
+class Command(BaseCommand):
+    help = "Reconstrói os contadores dos cards de comissões a partir das comissões gravadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Apenas lista os contadores divergentes.")
+
+    def handle(self, *args, **options):
+        divergent = reconcile_commission_counters(dry_run=options['dry_run'])
+
+        for key in divergent:
+            self.stdout.write(f"Divergente: {key}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry-run: {len(divergent)} contadores divergentes."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Contadores reconstruídos ({len(divergent)} estavam divergentes)."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.commissions.services import get_commissions_with_wrong_seller, sync_commission_sellers
+
+
+class Command(BaseCommand):
+    help = "Corrige comissões cujo vendedor difere do vendedor da venda."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Apenas conta as comissões divergentes.")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            wrong = get_commissions_with_wrong_seller().count()
+            self.stdout.write(self.style.WARNING(f"Dry-run: {wrong} comissões divergentes."))
+            return
+
+        fixed = sync_commission_sellers()
+        self.stdout.write(self.style.SUCCESS(f"{fixed} comissões corrigidas."))
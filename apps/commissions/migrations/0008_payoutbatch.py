@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:44
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0007_alter_commission_paid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayoutBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('idempotency_key', models.CharField(help_text='Token do formulário que originou o lote (evita pagamento em dobro).', max_length=64, unique=True)),
+                ('paid_at', models.DateTimeField(help_text='Data e hora do pagamento.')),
+                ('total_commission', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('commission_count', models.PositiveIntegerField(default=0)),
+                ('seller_count', models.PositiveIntegerField(default=0)),
+                ('created_by', models.ForeignKey(blank=True, help_text='Usuário que gerou o lote.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payout_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lote de pagamento',
+                'verbose_name_plural': 'Lotes de pagamento',
+                'ordering': ['-paid_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='commission',
+            name='payout_batch',
+            field=models.ForeignKey(blank=True, help_text='Lote de pagamento em que a comissão foi paga.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='commissions', to='commissions.payoutbatch'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:49
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0008_payoutbatch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommissionMonthClose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('month', models.DateField(help_text='Primeiro dia do mês fechado.', unique=True)),
+                ('total_commission', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('commission_count', models.PositiveIntegerField(default=0)),
+                ('closed_by', models.ForeignKey(blank=True, help_text='Usuário que fechou o mês.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='commission_month_closes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Fechamento mensal',
+                'verbose_name_plural': 'Fechamentos mensais',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CommissionLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='Primeiro dia do mês de pagamento.')),
+                ('total_commission', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('commission_count', models.PositiveIntegerField(default=0)),
+                ('seller', models.ForeignKey(help_text='Vendedor que recebeu as comissões.', on_delete=django.db.models.deletion.CASCADE, related_name='commission_ledger_entries', to=settings.AUTH_USER_MODEL)),
+                ('month_close', models.ForeignKey(help_text='Fechamento que gerou a linha.', on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='commissions.commissionmonthclose')),
+            ],
+            options={
+                'verbose_name': 'Linha do ledger de comissões',
+                'verbose_name_plural': 'Ledger de comissões',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('month', 'seller'), name='unique_ledger_entry_per_seller_per_month')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:52
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0009_commission_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommissionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador de comissões',
+                'verbose_name_plural': 'Contadores de comissões',
+                'ordering': ['key'],
+            },
+        ),
+    ]
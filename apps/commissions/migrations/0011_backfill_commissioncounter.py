@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_counters(apps, schema_editor):
+    Commission = apps.get_model('commissions', 'Commission')
+    CommissionCounter = apps.get_model('commissions', 'CommissionCounter')
+
+    counters = [CommissionCounter(key='pending')]
+    for row in (
+        Commission.objects.filter(paid=False).order_by()
+        .values('seller_id').annotate(total=Sum('value'), count=Count('id'))
+    ):
+        counters[0].total += row['total'] or 0
+        counters[0].count += row['count']
+        counters.append(CommissionCounter(
+            key=f"pending:seller:{row['seller_id']}", total=row['total'] or 0, count=row['count'],
+        ))
+
+    for row in (
+        Commission.objects.filter(paid=True, paid_at__isnull=False).order_by()
+        .annotate(month=TruncMonth('paid_at'))
+        .values('month').annotate(total=Sum('value'), count=Count('id'))
+    ):
+        counters.append(CommissionCounter(
+            key=f"paid:{row['month']:%Y-%m}", total=row['total'] or 0, count=row['count'],
+        ))
+
+    CommissionCounter.objects.bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0010_commissioncounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0011_backfill_commissioncounter'),
+        ('sales', '0003_hot_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(condition=models.Q(('paid', False)), fields=['seller', 'sale'], name='commission_unpaid_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(condition=models.Q(('paid', True)), fields=['paid_at', 'seller'], name='commission_paid_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payoutbatch',
+            index=models.Index(fields=['-paid_at'], name='payoutbatch_paid_at_idx'),
+        ),
+    ]
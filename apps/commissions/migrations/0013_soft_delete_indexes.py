@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commissions', '0012_hot_filter_indexes'),
+        ('sales', '0004_soft_delete_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='commission',
+            name='commission_unpaid_seller_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='commission',
+            name='commission_paid_at_idx',
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('paid', False)), fields=['seller', 'sale'], name='commission_unpaid_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('paid', True)), fields=['paid_at', 'seller'], name='commission_paid_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='commission_deleted_at_idx'),
+        ),
+    ]
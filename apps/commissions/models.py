@@ -1,8 +1,195 @@
 from django.db import models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from django.conf import settings
 from decimal import Decimal
-from apps.core.models import BaseModel
+from apps.core.models import BaseModel, SoftDeleteManager, SoftDeleteQuerySet
+
+
+class PayoutBatch(BaseModel):
+    """
+    Lote de pagamento de comissões.
+
+    Cada POST de pagamento gera no máximo um lote (chave de idempotência),
+    que guarda os totais e permite baixar o CSV de novo sem tocar nas comissões.
+    """
+
+    idempotency_key = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="Token do formulário que originou o lote (evita pagamento em dobro)."
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payout_batches',
+        help_text="Usuário que gerou o lote."
+    )
+    paid_at = models.DateTimeField(help_text="Data e hora do pagamento.")
+    total_commission = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    commission_count = models.PositiveIntegerField(default=0)
+    seller_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Lote de pagamento"
+        verbose_name_plural = "Lotes de pagamento"
+        ordering = ['-paid_at']
+        indexes = [
+            models.Index(fields=['-paid_at'], name='payoutbatch_paid_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Lote #{self.pk} - {self.paid_at:%d/%m/%Y %H:%M} - R$ {self.total_commission:.2f}"
+
+
+class CommissionMonthClose(BaseModel):
+    """
+    Fechamento mensal das comissões pagas.
+
+    Um mês fechado tem os totais por vendedor congelados no ledger
+    (CommissionLedgerEntry). Os meses são fechados em sequência, então
+    tudo antes do mês seguinte ao último fechamento é lido do ledger.
+    """
+
+    month = models.DateField(unique=True, help_text="Primeiro dia do mês fechado.")
+    closed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='commission_month_closes',
+        help_text="Usuário que fechou o mês."
+    )
+    total_commission = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_sales = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    commission_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Fechamento mensal"
+        verbose_name_plural = "Fechamentos mensais"
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"Fechamento {self.month:%m/%Y} - R$ {self.total_commission:.2f}"
+
+
+class CommissionLedgerEntry(models.Model):
+    """
+    Totais de comissões pagas de um vendedor em um mês fechado.
+    Gravado uma única vez no fechamento e nunca mais alterado.
+    """
+
+    month_close = models.ForeignKey(
+        CommissionMonthClose,
+        on_delete=models.CASCADE,
+        related_name='entries',
+        help_text="Fechamento que gerou a linha."
+    )
+    month = models.DateField(help_text="Primeiro dia do mês de pagamento.")
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='commission_ledger_entries',
+        help_text="Vendedor que recebeu as comissões."
+    )
+    total_commission = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    commission_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Linha do ledger de comissões"
+        verbose_name_plural = "Ledger de comissões"
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'seller'],
+                name='unique_ledger_entry_per_seller_per_month'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.seller_id} - {self.month:%m/%Y} - R$ {self.total_commission:.2f}"
+
+
+COUNTER_FIELDS = {'seller_id', 'paid', 'paid_at', 'value'}
+
+
+class CommissionCounter(models.Model):
+    """
+    Contadores corridos das comissões, lidos pelos cards do acompanhamento.
+
+    Cada linha é identificada por uma chave ('pending', 'pending:seller:<id>'
+    ou 'paid:AAAA-MM') e é ajustada na mesma transação de toda escrita de
+    comissões. O comando `reconcile_commission_counters` reconstrói tudo.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Contador de comissões"
+        verbose_name_plural = "Contadores de comissões"
+        ordering = ['key']
+
+    def __str__(self):
+        return f"{self.key}: {self.count} - R$ {self.total:.2f}"
+
+
+SELLER_GROUP_FIELDS = ('seller_id', 'seller__first_name', 'seller__last_name')
+
+
+class CommissionQuerySet(SoftDeleteQuerySet):
+    """
+    Filtros e agrupamentos de comissões pelas colunas locais (seller_id,
+    paid, paid_at), sem JOIN em sales_sale. Só os totais de venda
+    (total_sales) ainda leem a venda.
+    """
+
+    def unpaid(self):
+        return self.filter(paid=False)
+
+    def purgeable(self, moment):
+        # Comissões de lotes de pagamento nunca saem do banco: o lote precisa bater.
+        return super().purgeable(moment).filter(payout_batch__isnull=True)
+
+    def paid_between(self, start=None, end=None):
+        """Comissões pagas com paid_at em [start, end); None deixa o lado aberto."""
+        queryset = self.filter(paid=True)
+        if start:
+            queryset = queryset.filter(paid_at__gte=start)
+        if end:
+            queryset = queryset.filter(paid_at__lt=end)
+        return queryset
+
+    def for_seller(self, seller):
+        """Filtra por um vendedor (id) ou por vários (lista de ids); None não filtra."""
+        if seller is None or seller == '':
+            return self
+        if isinstance(seller, (list, tuple, set, frozenset)):
+            return self.filter(seller_id__in=seller)
+        return self.filter(seller_id=seller)
+
+    def with_totals(self, *group_by):
+        """Agrupa pelos campos informados somando comissões, vendas e quantidade."""
+        return self.values(*group_by).annotate(
+            total_commission=Sum('value'),
+            total_sales=Sum('sale__total_amount'),
+            commission_count=Count('id'),
+        ).order_by()
+
+    def by_seller_totals(self):
+        return self.with_totals(*SELLER_GROUP_FIELDS)
+
+    def by_month(self, per_seller: bool = True):
+        """Totais por mês de pagamento (no fuso local) e, por padrão, por vendedor."""
+        fields = ('payment_month', *SELLER_GROUP_FIELDS) if per_seller else ('payment_month',)
+        return self.annotate(payment_month=TruncMonth('paid_at')).with_totals(*fields)
 
 
 class Commission(BaseModel):
@@ -45,6 +232,53 @@ class Commission(BaseModel):
         blank=True,
         help_text="Data e hora em que a comissão foi paga."
     )
+    payout_batch = models.ForeignKey(
+        PayoutBatch,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='commissions',
+        help_text="Lote de pagamento em que a comissão foi paga."
+    )
+
+    # Comissões excluídas junto com a venda ficam fora de `objects`.
+    objects = SoftDeleteManager.from_queryset(CommissionQuerySet)()
+    all_objects = CommissionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Índices parciais: o SQLite usa um índice parcial quando a query repete
+            # a condição (paid / NOT paid), o que um índice sobre um booleano não faz.
+            # O manager padrão sempre filtra is_deleted, então as comissões
+            # excluídas ficam fora dos índices quentes.
+            models.Index(
+                fields=['seller', 'sale'],
+                condition=models.Q(paid=False, is_deleted=False),
+                name='commission_unpaid_seller_idx',
+            ),
+            models.Index(
+                fields=['paid_at', 'seller'],
+                condition=models.Q(paid=True, is_deleted=False),
+                name='commission_paid_at_idx',
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(is_deleted=True),
+                name='commission_deleted_at_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado gravado no banco, usado para ajustar os contadores no próximo save/delete.
+        if COUNTER_FIELDS.issubset(field_names):
+            instance._counter_state = instance.counter_state()
+        return instance
+
+    def counter_state(self):
+        """Campos que determinam em quais contadores a comissão entra."""
+        return (self.seller_id, self.paid, self.paid_at, self.value)
 
     def set_percentage(self):
         """Define o percentual de comissão a partir do vendedor."""
@@ -1,16 +1,37 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
-from django.db.models import Sum, Q, Count
+from django.db.models import Case, Sum, Q, Count, DecimalField, F, OuterRef, Subquery, Value, When
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models.functions import TruncMonth
+from django.db.models.functions import Abs, Coalesce, NullIf, TruncMonth
 
-from apps.commissions.models import Commission
+from apps.accounts.models import User
+from apps.commissions.models import (
+    SELLER_GROUP_FIELDS,
+    Commission,
+    CommissionCounter,
+    CommissionLedgerEntry,
+    CommissionMonthClose,
+    PayoutBatch,
+)
+from apps.sales.models import Sale
+from apps.core.memo import clear_request_memo, request_memoize
+from apps.dashboard.services import rebuild_rollup, refresh_seller_days
+
+PAYOUT_CHUNK_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+HISTORY_PAGE_SIZE = 50
 
 
 # =========================================================================
 # FUNÇÕES DE LEITURA (READ)
 # =========================================================================    
 
+@request_memoize
 def get_commission_by_id(commission_id: int) -> Commission:
     """
     Retorna uma comissão específica pelo seu ID.
@@ -25,154 +46,889 @@ def get_all_commissions() -> list[Commission]:
     return Commission.objects.all()
 
 
+@request_memoize
 def get_total_commission_value(seller_id: int | None = None) -> Decimal:
     """
-    Retorna o valor total de todas as comissões não pagas.
+    Retorna o valor total de todas as comissões não pagas (lido dos contadores).
     """
-    queryset = Commission.objects.filter(paid=False)
-
-    if seller_id:
-        queryset = queryset.filter(sale__seller_id=seller_id)
-
-    total = queryset.aggregate(total=Sum('value'))['total'] or Decimal('0.00')
-    return total
+    key = pending_seller_counter(seller_id) if seller_id else PENDING_COUNTER
+    total = CommissionCounter.objects.filter(key=key).values_list('total', flat=True).first()
+    return total or Decimal('0.00')
 
 
+@request_memoize
 def get_commission_totals_for_cards() -> dict:
     """
     Calcula os totais para os cards da página de Acompanhamento.
+    Lê apenas as linhas de contador necessárias, em uma única query.
     """
-    today = timezone.now().date()
-    
-    total_ready = Commission.objects.filter(
-        paid=False
-    ).aggregate(total=Sum('value'))['total'] or Decimal('0.00')
-
-    total_paid_month = Commission.objects.filter(
-        paid=True,
-        paid_at__year=today.year,
-        paid_at__month=today.month
-    ).aggregate(total=Sum('value'))['total'] or Decimal('0.00')
+    paid_key = paid_month_counter(timezone.localdate())
+    totals = dict(
+        CommissionCounter.objects.filter(key__in=[PENDING_COUNTER, paid_key]).values_list('key', 'total')
+    )
 
     return {
-        'ready_total': total_ready,
-        'paid_month_total': total_paid_month,
+        'ready_total': totals.get(PENDING_COUNTER) or Decimal('0.00'),
+        'paid_month_total': totals.get(paid_key) or Decimal('0.00'),
     }
 
 
-def get_commissions_ready_for_payment() -> list[dict]:
+@request_memoize
+def get_commissions_ready_for_payment(seller_ids=None) -> list[dict]:
     """
     Retorna comissões NÃO PAGAS, agrupadas por vendedor.
     A chave principal de valor é 'total_commission'.
+
+    Uma única leitura ordenada por vendedor monta os totais e a lista de
+    IDs de cada grupo. Com `seller_ids`, lê apenas os vendedores informados.
     """
-    commissions = Commission.objects.filter(
-        paid=False
-    ).select_related('sale__seller')
-    
-    grouped = commissions.values(
-        'sale__seller_id', 
-        'sale__seller__first_name', 
-        'sale__seller__last_name'
-    ).annotate(
-        # CORREÇÃO: Usamos total_commission para consistência com a View
-        total_commission=Sum('value'), 
-        total_sales=Sum('sale__total_amount'), # Valor total das vendas (para display)
-        commission_count=Count('id')
-    ).order_by('-total_commission')
-    
+    commissions = Commission.objects.unpaid()
+
+    if seller_ids is not None:
+        commissions = commissions.for_seller(list(seller_ids))
+
+    rows = commissions.order_by('seller_id', 'id').values_list(
+        'id',
+        'value',
+        'sale__total_amount',
+        'seller_id',
+        'seller__first_name',
+        'seller__last_name',
+    )
+
     payment_groups = []
+    group = None
 
-    for group in grouped:
-        seller_id = group['sale__seller_id']
-        
-        commission_ids = list(
-            commissions.filter(sale__seller_id=seller_id)
-            .values_list('id', flat=True)
-        )
-        
-        payment_groups.append({
-            'seller_id': seller_id,
-            'seller_name': f"{group['sale__seller__first_name']} {group['sale__seller__last_name']}",
-            # CHAVE CORRIGIDA
-            'total_commission': group['total_commission'], 
-            'total_sales': group['total_sales'],
-            'commission_count': group['commission_count'],
-            'commission_ids': commission_ids,
-        })
+    for commission_id, value, sale_amount, seller_id, first_name, last_name in rows.iterator(chunk_size=2000):
+        if group is None or group['seller_id'] != seller_id:
+            group = {
+                'seller_id': seller_id,
+                'seller_name': f"{first_name} {last_name}",
+                'total_commission': Decimal('0.00'),
+                'total_sales': Decimal('0.00'),  # Valor total das vendas (para display)
+                'commission_count': 0,
+                'commission_ids': [],
+            }
+            payment_groups.append(group)
+
+        group['total_commission'] += value or Decimal('0.00')
+        group['total_sales'] += sale_amount or Decimal('0.00')
+        group['commission_count'] += 1
+        group['commission_ids'].append(commission_id)
 
+    payment_groups.sort(key=lambda g: g['total_commission'], reverse=True)
     return payment_groups
 
 
+def parse_history_date(value):
+    """Converte a data do filtro (AAAA-MM-DD ou date) em date; inválida vira None."""
+    if not value or isinstance(value, date):
+        return value or None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def local_midnight(day: date) -> datetime:
+    """Início do dia no fuso do projeto, para comparar direto com paid_at."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def paid_period_bounds(start_date=None, end_date=None) -> tuple:
+    """
+    Período de pagamento como intervalo em paid_at: (início do dia inicial,
+    início do dia seguinte ao final), que usa índice diretamente, ao
+    contrário de paid_at__date. Datas ausentes ou inválidas viram None.
+    """
+    start_date = parse_history_date(start_date)
+    end_date = parse_history_date(end_date)
+    return (
+        local_midnight(start_date) if start_date else None,
+        local_midnight(end_date + timedelta(days=1)) if end_date else None,
+    )
+
+
+def get_paid_commissions(seller_id=None, start_date=None, end_date=None):
+    """Comissões PAGAS filtradas por vendedor e período de pagamento."""
+    return Commission.objects.paid_between(*paid_period_bounds(start_date, end_date)).for_seller(seller_id)
+
+
 def get_paid_commissions_history(seller_id=None, start_date=None, end_date=None):
     """
     Retorna todas as comissões PAGAS DETALHADAS (objetos Commission), 
     filtradas por vendedor e data de pagamento.
     """
-    queryset = Commission.objects.filter(
-        paid=True
-    ).select_related('sale__seller').order_by('-paid_at')
+    return (
+        get_paid_commissions(seller_id, start_date, end_date)
+        .select_related('sale', 'seller')
+        .order_by('-paid_at')
+    )
 
-    if seller_id:
-        queryset = queryset.filter(sale__seller_id=seller_id)
-    
-    # Filtra pela data em que a comissão foi paga (paid_at)
+
+@request_memoize
+def get_paid_commissions_totals(seller_id=None, start_date=None, end_date=None) -> dict:
+    """
+    Totais de vendas e comissões pagas do filtro inteiro: uma agregação
+    sobre o ledger (meses fechados) e outra sobre as comissões dos meses
+    abertos (e dos meses fechados cobertos só em parte pelo filtro).
+    """
+    window = get_ledger_window(start_date, end_date)
+    totals = {'total_commission': Decimal('0.00'), 'total_sales': Decimal('0.00')}
+
+    parts = [get_live_paid_commissions(seller_id, start_date, end_date, window).aggregate(
+        total_commission=Sum('value'),
+        total_sales=Sum('sale__total_amount'),
+    )]
+    if window:
+        parts.append(get_ledger_entries(seller_id, window).aggregate(
+            total_commission=Sum('total_commission'),
+            total_sales=Sum('total_sales'),
+        ))
+
+    for part in parts:
+        for key in totals:
+            totals[key] += part[key] or Decimal('0.00')
+    return totals
+
+
+def iter_paid_commissions_rows(seller_id=None, start_date=None, end_date=None, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Mesmo filtro de get_paid_commissions_history, mas como tuplas lidas em
+    blocos (cursor do servidor no PostgreSQL), para exportações grandes.
+    """
+    return (
+        get_paid_commissions_history(seller_id, start_date, end_date)
+        .values_list(
+            'id',
+            'paid_at',
+            'payout_batch_id',
+            'seller_id',
+            'seller__first_name',
+            'seller__last_name',
+            'sale_id',
+            'sale__date',
+            'sale__total_amount',
+            'percentage',
+            'value',
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return (month_start(month) + timedelta(days=32)).replace(day=1)
+
+
+@request_memoize
+def get_ledger_cutoff() -> date | None:
+    """
+    Primeiro dia depois do último mês fechado (None se nada foi fechado).
+    Tudo que foi pago antes dessa data está congelado no ledger.
+    """
+    last_closed = CommissionMonthClose.objects.order_by('-month').values_list('month', flat=True).first()
+    return next_month(last_closed) if last_closed else None
+
+
+def get_ledger_window(start_date=None, end_date=None):
+    """
+    Meses fechados cobertos INTEIROS pelo filtro, como (primeiro mês, mês
+    seguinte ao último). Meses cobertos só em parte continuam calculados ao
+    vivo, para respeitar o dia exato do filtro. None se nenhum mês se aplica.
+    """
+    cutoff = get_ledger_cutoff()
+    if not cutoff:
+        return None
+
+    start_date = parse_history_date(start_date)
+    end_date = parse_history_date(end_date)
+
+    first = None
     if start_date:
-        queryset = queryset.filter(paid_at__date__gte=start_date)
-        
+        first = start_date if start_date.day == 1 else next_month(start_date)
+    last = cutoff
     if end_date:
-        queryset = queryset.filter(paid_at__date__lte=end_date)
-        
+        day_after = end_date + timedelta(days=1)
+        last = min(last, day_after if day_after.day == 1 else month_start(end_date))
+
+    if first and first >= last:
+        return None
+    return first, last
+
+
+def get_ledger_entries(seller_id=None, window=None):
+    """Linhas do ledger dentro da janela de meses fechados."""
+    first, last = window
+    queryset = CommissionLedgerEntry.objects.filter(month__lt=last)
+    if first:
+        queryset = queryset.filter(month__gte=first)
+    if seller_id:
+        queryset = queryset.filter(seller_id=seller_id)
+    return queryset
+
+
+def outside_ledger(window) -> Q:
+    """Pagamentos fora da janela do ledger, como intervalos em paid_at."""
+    first, last = window
+    condition = Q(paid_at__gte=local_midnight(last))
+    if first:
+        condition |= Q(paid_at__lt=local_midnight(first))
+    return condition
+
+
+def get_live_paid_commissions(seller_id=None, start_date=None, end_date=None, window=None):
+    """Comissões pagas do filtro que NÃO estão cobertas pelo ledger."""
+    queryset = get_paid_commissions(seller_id, start_date, end_date)
+    if window:
+        queryset = queryset.filter(outside_ledger(window))
     return queryset
 
 
 def get_paid_commissions_summary(seller_id=None, start_date=None, end_date=None):
     """
     Retorna o histórico de comissões PAGAS, AGRUPADO por Vendedor e Mês de Pagamento.
+    Agrupa ao vivo (sem considerar o ledger); usado pelo fechamento mensal.
     """
-    queryset = Commission.objects.filter(
-        paid=True
-    ).select_related('sale__seller')
+    return (
+        get_paid_commissions(seller_id, start_date, end_date)
+        .by_month()
+        .order_by('-payment_month', 'seller__first_name', 'seller_id')
+    )
+
+
+def summary_month(row) -> date:
+    """Mês de pagamento de uma linha agrupada como date (TruncMonth devolve datetime)."""
+    month = row['payment_month']
+    if isinstance(month, datetime):
+        month = timezone.localtime(month).date() if timezone.is_aware(month) else month.date()
+    return month
+
+
+def ledger_summary_rows(entries, limit: int) -> list[dict]:
+    """Linhas do ledger no mesmo formato de get_paid_commissions_summary()."""
+    entries = entries.values(
+        *SELLER_GROUP_FIELDS, 'total_commission', 'total_sales', 'commission_count',
+        payment_month=F('month'),
+    ).order_by('-month', 'seller__first_name', 'seller_id')
+    return list(entries[:limit])
+
+
+def summary_sort_key(row):
+    return (-summary_month(row).toordinal(), row['seller__first_name'], row['seller_id'])
 
-    if seller_id:
-        queryset = queryset.filter(sale__seller_id=seller_id)
-    
-    # Filtra pelo campo pago (paid_at)
-    if start_date:
-        queryset = queryset.filter(paid_at__date__gte=start_date)
-        
-    if end_date:
-        queryset = queryset.filter(paid_at__date__lte=end_date)
-        
-    # Agrupamento e Agregação
-    summary = queryset.annotate(
-        payment_month=TruncMonth('paid_at')
-    ).values(
-        'sale__seller_id', 
-        'sale__seller__first_name', 
-        'sale__seller__last_name',
-        'payment_month'
-    ).annotate(
-        total_commission=Sum('value'),
-        total_sales=Sum('sale__total_amount'),
-        commission_count=Count('id')
-    ).order_by('-payment_month', 'sale__seller__first_name')
 
-    return summary
+def encode_history_cursor(row) -> str:
+    """Cursor da próxima página: (mês, nome, id) da última linha exibida."""
+    payload = {
+        'm': summary_month(row).strftime('%Y-%m'),
+        'n': row['seller__first_name'],
+        's': row['seller_id'],
+    }
+    return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_history_cursor(cursor):
+    """Lê o cursor da URL; cursor inválido volta para a primeira página (None)."""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(urlsafe_b64decode(cursor.encode()))
+        month = datetime.strptime(payload['m'], '%Y-%m').date()
+        return month, str(payload['n']), int(payload['s'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def history_cursor_condition(cursor) -> Q:
+    """
+    Linhas que vêm depois do cursor na ordem (-mês, nome, id): meses
+    anteriores, ou o mesmo mês com (nome, id) maior. É aplicado às comissões
+    antes do agrupamento, como intervalos em paid_at.
+    """
+    month, first_name, seller_id = cursor
+    month_start_at = local_midnight(month)
+    return Q(paid_at__lt=month_start_at) | (
+        Q(paid_at__gte=month_start_at, paid_at__lt=local_midnight(next_month(month)))
+        & seller_after_cursor(first_name, seller_id)
+    )
+
+
+def ledger_cursor_condition(cursor) -> Q:
+    """Mesma condição de history_cursor_condition(), nas colunas do ledger."""
+    month, first_name, seller_id = cursor
+    return Q(month__lt=month) | (Q(month=month) & seller_after_cursor(first_name, seller_id))
+
+
+def seller_after_cursor(first_name, seller_id) -> Q:
+    return Q(seller__first_name__gt=first_name) | Q(seller__first_name=first_name, seller_id__gt=seller_id)
+
+
+@request_memoize
+def get_paid_commissions_summary_page(seller_id=None, start_date=None, end_date=None,
+                                      cursor=None, page_size: int = HISTORY_PAGE_SIZE) -> dict:
+    """
+    Uma página do histórico agrupado, com paginação por cursor (keyset):
+    o custo não cresce com o número da página, como aconteceria com OFFSET.
+
+    Os meses fechados vêm do ledger e só os meses abertos são agrupados ao
+    vivo; as duas partes chegam já ordenadas e são intercaladas aqui.
+
+    Returns:
+        dict: 'rows' (linhas da página) e 'next_cursor' (None na última página).
+    """
+    window = get_ledger_window(start_date, end_date)
+    position = decode_history_cursor(cursor)
+
+    live = get_paid_commissions_summary(seller_id, start_date, end_date)
+    if window:
+        live = live.filter(outside_ledger(window))
+    if position:
+        live = live.filter(history_cursor_condition(position))
+
+    rows = list(live[:page_size + 1])
+    for row in rows:
+        row['payment_month'] = summary_month(row)
+
+    if window:
+        entries = get_ledger_entries(seller_id, window)
+        if position:
+            entries = entries.filter(ledger_cursor_condition(position))
+        rows = sorted(rows + ledger_summary_rows(entries, page_size + 1), key=summary_sort_key)
+
+    next_cursor = encode_history_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return {'rows': rows[:page_size], 'next_cursor': next_cursor}
 
 
 # =========================================================================
 # FUNÇÕES DE ESCRITA (WRITE)
 # ========================================================================= 
 
-def mark_commissions_as_paid(commission_ids: list[int]) -> int:
+def bulk_create_commissions(sales, batch_size: int | None = None) -> list[Commission]:
+    """
+    Cria as comissões de várias vendas recém-criadas com INSERTs em lote,
+    sem passar pelo sinal de post_save (uma comissão por venda).
+
+    As vendas precisam ter o vendedor carregado (sale.seller), de onde vem
+    o percentual, exatamente como no Commission.save().
+    """
+    commissions = []
+    for sale in sales:
+        commission = Commission(sale=sale, seller=sale.seller)
+        commission.set_percentage()
+        commission.calculate_value()
+        commissions.append(commission)
+
+    with transaction.atomic(savepoint=False):
+        created = Commission.objects.bulk_create(commissions, batch_size=batch_size)
+        deltas = {}
+        for commission in created:
+            add_counter_deltas(deltas, counter_contributions(commission.counter_state()))
+        apply_counter_deltas(deltas)
+    return created
+
+
+def soft_delete_commissions(queryset) -> int:
+    """
+    Exclusão lógica das comissões do queryset com um único UPDATE, tirando-as
+    dos contadores na mesma transação. As linhas continuam no banco (e nos
+    lotes de pagamento) até o comando purge_deleted.
+
+    Returns:
+        int: quantidade de comissões excluídas.
+    """
+    with transaction.atomic(savepoint=False):
+        deltas = {}
+        for state in queryset.values_list('seller_id', 'paid', 'paid_at', 'value'):
+            add_counter_deltas(deltas, counter_contributions(state), sign=-1)
+        deleted = queryset.soft_delete()
+        apply_counter_deltas(deltas)
+    return deleted
+
+
+def commission_value_expression(percentage):
+    """Expressão do valor da comissão: valor da venda × percentual / 100, no banco."""
+    sale_amount = Subquery(
+        Sale.objects.filter(pk=OuterRef('sale_id')).order_by().values('total_amount')[:1]
+    )
+    return sale_amount * percentage / Value(Decimal('100'))
+
+
+def recalculate_commissions(queryset, percentage: Decimal | None = None) -> int:
+    """
+    Recalcula percentual e valor das comissões do queryset com um único UPDATE.
+
+    Sem `percentage`, a taxa do vendedor é lida por subquery no próprio banco,
+    seguindo a regra do sinal de venda: usa a taxa atual do vendedor ou, se ele
+    não tiver taxa, mantém o percentual já gravado.
+
+    Returns:
+        int: quantidade de comissões atualizadas.
+    """
+    if percentage is None:
+        seller_rate = Subquery(
+            User.objects.filter(pk=OuterRef('seller_id')).values('commission_rate')[:1]
+        )
+        percentage = Coalesce(NullIf(seller_rate, Value(Decimal('0.00'))), F('percentage'))
+    else:
+        percentage = Value(percentage, output_field=DecimalField(max_digits=5, decimal_places=2))
+
+    with transaction.atomic(savepoint=False):
+        before = counter_totals(queryset)
+        updated = queryset.update(
+            percentage=percentage,
+            value=commission_value_expression(percentage),
+            updated_at=timezone.now(),
+        )
+        if before:
+            deltas = add_counter_deltas({}, before, sign=-1)
+            apply_counter_deltas(add_counter_deltas(deltas, counter_totals(queryset)))
+    return updated
+
+
+def recalculate_seller_commissions(
+    seller_id: int,
+    start_date=None,
+    end_date=None,
+    include_paid: bool = False,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Aplica a taxa atual do vendedor (User.commission_rate) às comissões já
+    existentes, filtradas pela data da venda. Por padrão só as não pagas.
+
+    O relatório (quantas mudam e quanto dinheiro) sai de uma única agregação;
+    fora do dry-run, a gravação é um único UPDATE seguido da reconstrução do
+    consolidado diário do período.
+
+    Returns:
+        dict: rows, changed, current_total, new_total, difference e updated.
+    """
+    seller = User.objects.get(pk=seller_id, user_type='sellers')
+    rate = seller.commission_rate or Decimal('0.00')
+
+    queryset = Commission.objects.for_seller(seller.pk)
+    if not include_paid:
+        queryset = queryset.unpaid()
+    if start_date:
+        queryset = queryset.filter(sale__date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(sale__date__lte=end_date)
+
+    new_value = commission_value_expression(
+        Value(rate, output_field=DecimalField(max_digits=5, decimal_places=2))
+    )
+    report = queryset.annotate(
+        new_value=new_value,
+        drift=Abs(F('value') - new_value),
+    ).aggregate(
+        rows=Count('id'),
+        changed=Count('id', filter=~Q(percentage=rate) | Q(drift__gte=Decimal('0.005'))),
+        current_total=Sum('value'),
+        new_total=Sum('new_value'),
+    )
+
+    current_total = (report['current_total'] or Decimal('0.00')).quantize(Decimal('0.01'))
+    new_total = Decimal(report['new_total'] or 0).quantize(Decimal('0.01'))
+    result = {
+        'rows': report['rows'],
+        'changed': report['changed'],
+        'percentage': rate,
+        'current_total': current_total,
+        'new_total': new_total,
+        'difference': new_total - current_total,
+        'updated': 0,
+    }
+
+    if dry_run or not report['changed']:
+        return result
+
+    with transaction.atomic():
+        result['updated'] = recalculate_commissions(queryset, percentage=rate)
+        rebuild_rollup(start_date=start_date, end_date=end_date, seller_id=seller.pk)
+
+    return result
+
+
+def mark_commissions_as_paid(
+    commission_ids: list[int],
+    payout_batch: PayoutBatch | None = None,
+    paid_at=None,
+    chunk_size: int = PAYOUT_CHUNK_SIZE,
+) -> int:
     """
     Marca uma lista de IDs de comissões como pagas e define o paid_at.
+
+    O UPDATE é feito em blocos de `chunk_size` IDs (limite de parâmetros do
+    SQLite) e só pega comissões ainda não pagas, então funciona como uma
+    reserva atômica: duas chamadas concorrentes nunca pagam a mesma comissão.
+    O update em massa não dispara sinais, então o consolidado diário
+    dos dias afetados e os contadores dos cards são ajustados aqui.
+    """
+    paid_at = paid_at or timezone.now()
+    commission_ids = list(commission_ids)
+    updated_count = 0
+    seller_days = set()
+    deltas = {}
+
+    with transaction.atomic():
+        for start in range(0, len(commission_ids), chunk_size):
+            rows = list(Commission.objects.unpaid().filter(
+                id__in=commission_ids[start:start + chunk_size],
+            ).values_list('id', 'seller_id', 'value', 'sale__date'))
+            if not rows:
+                continue
+
+            updated_count += Commission.objects.unpaid().filter(
+                id__in=[row[0] for row in rows],
+            ).update(
+                paid=True,
+                paid_at=paid_at,
+                payout_batch=payout_batch,
+                updated_at=paid_at,
+            )
+            for _, seller_id, value, sale_date in rows:
+                seller_days.add((seller_id, sale_date))
+                add_counter_deltas(deltas, counter_contributions((seller_id, False, None, value)), sign=-1)
+                add_counter_deltas(deltas, counter_contributions((seller_id, True, paid_at, value)))
+        refresh_seller_days(seller_days)
+        apply_counter_deltas(deltas)
+    return updated_count
+
+
+def create_payout_batch(seller_ids, idempotency_key: str, created_by=None) -> tuple[PayoutBatch, bool]:
+    """
+    Paga todas as comissões pendentes dos vendedores informados em um lote.
+
+    Idempotente pela `idempotency_key`: se o lote já existir (reenvio do
+    formulário, retry do navegador), ele é devolvido sem tocar nas comissões.
+    As comissões são reservadas com select_for_update (no-op no SQLite, onde
+    o UPDATE ... WHERE paid=False já garante a reserva atômica).
+
+    Returns:
+        tuple: (lote, criado agora?).
+
+    Raises:
+        ValidationError: se nenhuma comissão pendente for encontrada.
+    """
+    existing = PayoutBatch.objects.filter(idempotency_key=idempotency_key).first()
+    if existing:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            paid_at = timezone.now()
+            batch = PayoutBatch.objects.create(
+                idempotency_key=idempotency_key,
+                created_by=created_by,
+                paid_at=paid_at,
+            )
+
+            commission_ids = list(
+                Commission.objects.select_for_update()
+                .unpaid()
+                .for_seller(list(seller_ids))
+                .order_by('id')
+                .values_list('id', flat=True)
+            )
+            if not mark_commissions_as_paid(commission_ids, payout_batch=batch, paid_at=paid_at):
+                raise ValidationError("Vendedores selecionados não têm comissões prontas.")
+
+            totals = batch.commissions.aggregate(
+                total_commission=Sum('value'),
+                total_sales=Sum('sale__total_amount'),
+                commission_count=Count('id'),
+                seller_count=Count('seller_id', distinct=True),
+            )
+            for field, value in totals.items():
+                setattr(batch, field, value or 0)
+            batch.save(update_fields=[*totals, 'updated_at'])
+    except IntegrityError:
+        # Outro request criou o lote com a mesma chave ao mesmo tempo.
+        return PayoutBatch.objects.get(idempotency_key=idempotency_key), False
+
+    return batch, True
+
+
+def get_payout_batch_summary(batch: PayoutBatch):
+    """
+    Totais por vendedor de um lote de pagamento (linhas do CSV),
+    lidos das comissões já vinculadas ao lote. Inclui as comissões excluídas
+    depois do pagamento: o lote continua igual ao que foi pago.
     """
-    updated_count = Commission.objects.filter(
-        id__in=commission_ids,
-        paid=False
-    ).update(
-        paid=True,
-        paid_at=timezone.now()
+    return Commission.all_objects.filter(payout_batch=batch).by_seller_totals().order_by('-total_commission', 'seller__first_name')
+
+
+@request_memoize
+def get_payout_batch_by_id(batch_id: int) -> PayoutBatch:
+    """
+    Retorna um lote de pagamento específico pelo seu ID.
+    """
+    return get_object_or_404(PayoutBatch, pk=batch_id)
+
+
+def iter_payout_batch_details(batch: PayoutBatch, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Uma linha por comissão do lote (detalhe por venda), lida em blocos,
+    incluindo as excluídas depois do pagamento.
+    """
+    return (
+        Commission.all_objects.filter(payout_batch=batch).order_by('seller_id', 'sale__date')
+        .values_list(
+            'seller_id',
+            'seller__first_name',
+            'seller__last_name',
+            'sale_id',
+            'sale__date',
+            'sale__total_amount',
+            'percentage',
+            'value',
+        )
+        .iterator(chunk_size=chunk_size)
     )
-    return updated_count
\ No newline at end of file
+
+
+@request_memoize
+def get_recent_payout_batches(limit: int = 10):
+    """Últimos lotes de pagamento, para baixar o CSV novamente."""
+    return PayoutBatch.objects.select_related('created_by').order_by('-paid_at')[:limit]
+
+
+# =========================================================================
+# FECHAMENTO MENSAL (LEDGER)
+# =========================================================================
+
+def close_commission_months(month: date, closed_by=None) -> list[CommissionMonthClose]:
+    """
+    Fecha o mês informado e todos os anteriores ainda abertos, congelando no
+    ledger os totais pagos por vendedor e mês. Os meses são sempre fechados em
+    sequência, então o ledger cobre tudo antes de get_ledger_cutoff().
+
+    Returns:
+        list[CommissionMonthClose]: fechamentos criados, do mais antigo ao mais novo.
+    """
+    month = month_start(month)
+    if month >= month_start(timezone.localdate()):
+        raise ValidationError("Só é possível fechar meses já encerrados.")
+
+    with transaction.atomic():
+        cutoff = get_ledger_cutoff()
+        if cutoff and month < cutoff:
+            raise ValidationError(f"O mês {month:%m/%Y} já está fechado.")
+
+        rows = list(get_paid_commissions_summary(start_date=cutoff, end_date=next_month(month) - timedelta(days=1)))
+        for row in rows:
+            row['payment_month'] = summary_month(row)
+
+        first = cutoff or min([row['payment_month'] for row in rows] + [month])
+        closes = {}
+        current = first
+        while current <= month:
+            closes[current] = CommissionMonthClose(month=current, closed_by=closed_by)
+            current = next_month(current)
+
+        for row in rows:
+            close = closes[row['payment_month']]
+            close.total_commission += row['total_commission'] or Decimal('0.00')
+            close.total_sales += row['total_sales'] or Decimal('0.00')
+            close.commission_count += row['commission_count']
+
+        try:
+            with transaction.atomic():
+                CommissionMonthClose.objects.bulk_create(closes.values())
+        except IntegrityError:
+            raise ValidationError(f"O mês {month:%m/%Y} já está fechado.")
+
+        CommissionLedgerEntry.objects.bulk_create(
+            CommissionLedgerEntry(
+                month_close=closes[row['payment_month']],
+                month=row['payment_month'],
+                seller_id=row['seller_id'],
+                total_commission=row['total_commission'] or Decimal('0.00'),
+                total_sales=row['total_sales'] or Decimal('0.00'),
+                commission_count=row['commission_count'],
+            )
+            for row in rows
+        )
+
+    # O corte do ledger mudou: as leituras memoizadas na requisição não valem mais.
+    clear_request_memo()
+    return list(closes.values())
+
+
+# =========================================================================
+# CONTADORES DOS CARDS
+# =========================================================================
+PENDING_COUNTER = 'pending'
+
+
+def pending_seller_counter(seller_id) -> str:
+    return f'pending:seller:{seller_id}'
+
+
+def paid_month_counter(moment) -> str:
+    """Chave do total pago no mês de `moment` (date ou datetime, no fuso local)."""
+    if isinstance(moment, datetime):
+        moment = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+    return f'paid:{moment:%Y-%m}'
+
+
+def counter_contributions(state) -> dict:
+    """
+    Em quais contadores uma comissão entra, dado o seu counter_state():
+    {chave: (valor, quantidade)}.
+    """
+    if state is None:
+        return {}
+    seller_id, paid, paid_at, value = state
+    value = Decimal(value or 0)
+    if not paid:
+        return {PENDING_COUNTER: (value, 1), pending_seller_counter(seller_id): (value, 1)}
+    if paid_at:
+        return {paid_month_counter(paid_at): (value, 1)}
+    return {}
+
+
+def add_counter_deltas(deltas: dict, contributions: dict, sign: int = 1) -> dict:
+    """Soma (ou subtrai, com sign=-1) contribuições em um dicionário de deltas."""
+    for key, (total, count) in contributions.items():
+        current_total, current_count = deltas.get(key, (Decimal('0.00'), 0))
+        deltas[key] = (current_total + sign * total, current_count + sign * count)
+    return deltas
+
+
+def apply_counter_deltas(deltas: dict) -> None:
+    """
+    Aplica os deltas {chave: (valor, quantidade)} com 2 queries, quantas forem
+    as chaves: cria as linhas que faltam e soma tudo em um único UPDATE com CASE.
+    A soma é feita no banco (total = total + delta), então escritas concorrentes
+    não se sobrescrevem.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+
+    with transaction.atomic(savepoint=False):
+        CommissionCounter.objects.bulk_create(
+            [CommissionCounter(key=key) for key in deltas],
+            ignore_conflicts=True,
+        )
+        CommissionCounter.objects.filter(key__in=deltas).update(
+            total=F('total') + Case(
+                *(When(key=key, then=Value(total)) for key, (total, _) in deltas.items()),
+                output_field=DecimalField(max_digits=16, decimal_places=2),
+            ),
+            count=F('count') + Case(*(When(key=key, then=Value(count)) for key, (_, count) in deltas.items())),
+            updated_at=timezone.now(),
+        )
+    # Os cards lidos antes na mesma requisição ficaram desatualizados.
+    clear_request_memo()
+
+
+def counter_totals(queryset) -> dict:
+    """
+    Contribuição de um queryset de comissões para os contadores (pendentes
+    e pagas por mês): {chave: (valor, quantidade)}, em uma única agregação.
+    """
+    totals = {}
+    rows = (
+        queryset.order_by()
+        .annotate(month=TruncMonth('paid_at'))
+        .values('seller_id', 'paid', 'month')
+        .annotate(total=Sum('value'), count=Count('id'))
+    )
+    for row in rows:
+        total = row['total'] or Decimal('0.00')
+        for key in counter_contributions((row['seller_id'], row['paid'], row['month'], total)):
+            add_counter_deltas(totals, {key: (total, row['count'])})
+    return totals
+
+
+def expected_commission_counters() -> dict:
+    """Contadores recalculados do zero a partir das comissões: {chave: (valor, quantidade)}."""
+    expected = {PENDING_COUNTER: (Decimal('0.00'), 0)}
+
+    pending = (
+        Commission.objects.unpaid().order_by()
+        .values('seller_id').annotate(total=Sum('value'), count=Count('id'))
+    )
+    for row in pending:
+        add_counter_deltas(expected, {
+            PENDING_COUNTER: (row['total'] or Decimal('0.00'), row['count']),
+            pending_seller_counter(row['seller_id']): (row['total'] or Decimal('0.00'), row['count']),
+        })
+
+    paid = (
+        Commission.objects.paid_between().filter(paid_at__isnull=False).order_by()
+        .annotate(month=TruncMonth('paid_at'))
+        .values('month').annotate(total=Sum('value'), count=Count('id'))
+    )
+    for row in paid:
+        add_counter_deltas(expected, {
+            paid_month_counter(row['month']): (row['total'] or Decimal('0.00'), row['count']),
+        })
+
+    return expected
+
+
+def reconcile_commission_counters(dry_run: bool = False) -> list[str]:
+    """
+    Reconstrói a tabela de contadores a partir das comissões.
+
+    Returns:
+        list[str]: chaves que estavam divergentes.
+    """
+    with transaction.atomic():
+        expected = expected_commission_counters()
+        current = {
+            key: (total, count)
+            for key, total, count in CommissionCounter.objects.values_list('key', 'total', 'count')
+        }
+        # Contadores zerados equivalem a contadores ausentes.
+        zero = (Decimal('0.00'), 0)
+        divergent = sorted(
+            key for key in expected.keys() | current.keys()
+            if expected.get(key, zero) != current.get(key, zero)
+        )
+
+        if not dry_run:
+            CommissionCounter.objects.all().delete()
+            CommissionCounter.objects.bulk_create(
+                [CommissionCounter(key=key, total=total, count=count) for key, (total, count) in expected.items()],
+                batch_size=1000,
+            )
+
+    return divergent
+
+
+# =========================================================================
+# CONSISTÊNCIA DO VENDEDOR DA COMISSÃO
+# =========================================================================
+
+def get_commissions_with_wrong_seller():
+    """
+    Comissões cujo seller_id difere do vendedor da venda. Os serviços filtram
+    e agrupam por Commission.seller_id, então essa lista deve ser sempre vazia.
+    """
+    return Commission.objects.exclude(seller_id=F('sale__seller_id'))
+
+
+def sync_commission_sellers() -> int:
+    """
+    Copia o vendedor da venda para as comissões divergentes (um único UPDATE)
+    e reconstrói os contadores, que são separados por vendedor.
+
+    Returns:
+        int: quantidade de comissões corrigidas.
+    """
+    with transaction.atomic():
+        sale_seller = Subquery(
+            Sale.objects.filter(pk=OuterRef('sale_id')).order_by().values('seller_id')[:1]
+        )
+        fixed = get_commissions_with_wrong_seller().update(seller_id=sale_seller, updated_at=timezone.now())
+        if fixed:
+            reconcile_commission_counters()
+    return fixed
@@ -1,8 +1,9 @@
-from turtle import up
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from apps.sales.models import Sale
+from apps.dashboard.services import refresh_seller_days
 from .models import Commission
+from .services import add_counter_deltas, apply_counter_deltas, counter_contributions
 
 
 @receiver(post_save, sender=Sale)
@@ -13,28 +14,86 @@ def create_or_update_commission(sender, instance, created, **kwargs):
         return
 
     if created:
-        # VENDA NOVA → cria comissão
-        commission = Commission.objects.create(
-            sale=instance,
-            seller=seller,
-            percentage=seller.commission_rate or 0
-        )
-        commission.calculate_value()
-        commission.save()
+        # VENDA NOVA → cria comissão (o save() já calcula percentual e valor,
+        # então um único INSERT e um único recálculo do consolidado)
+        Commission.objects.create(sale=instance, seller=seller)
         return
 
     # VENDA ATUALIZADA → atualiza comissão existente
     try:
         commission = Commission.objects.get(sale=instance)
+        commission.seller = seller  # mantém Commission.seller igual ao vendedor da venda
         commission.percentage = seller.commission_rate or commission.percentage
         commission.calculate_value()
         commission.save()
     except Commission.DoesNotExist:
         # Se por algum motivo não existir, cria
-        commission = Commission.objects.create(
-            sale=instance,
-            seller=seller,
-            percentage=seller.commission_rate or 0
+        Commission.objects.create(sale=instance, seller=seller)
+
+
+# ==========================
+# CONSOLIDADO DIÁRIO (ROLLUP)
+# ==========================
+@receiver(pre_save, sender=Sale)
+def remember_previous_seller_day(sender, instance, **kwargs):
+    """Guarda (vendedor, dia) anterior para recalcular o dia antigo se a venda mudar de data."""
+    instance._previous_seller_day = None
+    if instance.pk:
+        instance._previous_seller_day = (
+            Sale.objects.filter(pk=instance.pk).values_list('seller_id', 'date').first()
         )
-        commission.calculate_value()
-        commission.save()
+
+
+@receiver(post_save, sender=Sale)
+def refresh_rollup_on_sale_save(sender, instance, created, **kwargs):
+    # O dia atual é recalculado pelo save da comissão; aqui só tratamos o dia antigo.
+    previous = getattr(instance, '_previous_seller_day', None)
+    if previous and previous != (instance.seller_id, instance.date):
+        refresh_seller_days([previous, (instance.seller_id, instance.date)])
+
+
+@receiver(post_delete, sender=Sale)
+def refresh_rollup_on_sale_delete(sender, instance, **kwargs):
+    # Venda já excluída logicamente (purge_deleted): o consolidado já não a conta.
+    if instance.is_deleted:
+        return
+    refresh_seller_days([(instance.seller_id, instance.date)])
+
+
+@receiver(post_save, sender=Commission)
+def refresh_rollup_on_commission_save(sender, instance, **kwargs):
+    sale = instance.sale
+    refresh_seller_days([(sale.seller_id, sale.date)])
+
+
+@receiver(post_delete, sender=Commission)
+def refresh_rollup_on_commission_delete(sender, instance, origin=None, **kwargs):
+    # Exclusão em cascata (venda ou vendedor): o post_delete da Sale já recalcula.
+    if instance.is_deleted or not (isinstance(origin, Commission) or getattr(origin, 'model', None) is Commission):
+        return
+    sale = Sale.objects.filter(pk=instance.sale_id).values_list('seller_id', 'date').first()
+    if sale:
+        refresh_seller_days([sale])
+
+
+# ==========================
+# CONTADORES DOS CARDS
+# ==========================
+@receiver(post_save, sender=Commission)
+def update_counters_on_commission_save(sender, instance, **kwargs):
+    """Ajusta os contadores pela diferença entre o estado gravado antes e o atual."""
+    previous = getattr(instance, '_counter_state', None)
+    current = instance.counter_state()
+    if previous != current:
+        deltas = add_counter_deltas({}, counter_contributions(previous), sign=-1)
+        apply_counter_deltas(add_counter_deltas(deltas, counter_contributions(current)))
+    instance._counter_state = current
+
+
+@receiver(post_delete, sender=Commission)
+def update_counters_on_commission_delete(sender, instance, **kwargs):
+    # Comissões excluídas logicamente já saíram dos contadores.
+    if instance.is_deleted:
+        return
+    state = getattr(instance, '_counter_state', None) or instance.counter_state()
+    apply_counter_deltas(add_counter_deltas({}, counter_contributions(state), sign=-1))
@@ -1,3 +1,388 @@
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core import checks
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.commissions.models import (
+    Commission,
+    CommissionCounter,
+    CommissionLedgerEntry,
+    CommissionMonthClose,
+    PayoutBatch,
+)
+from apps.commissions.services import (
+    get_commission_totals_for_cards,
+    get_commissions_ready_for_payment,
+    get_paid_commissions_summary_page,
+    get_paid_commissions_totals,
+    mark_commissions_as_paid,
+    recalculate_seller_commissions,
+    reconcile_commission_counters,
+)
+from apps.dashboard.models import SellerDailyRollup
+from apps.sales.models import Sale
+
+
+class RecalculateSellerCommissionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='rate@example.com', cpf='50000000000', password='senha-forte-123',
+            first_name='Rate', commission_rate=Decimal('1.00'),
+        )
+        for day in range(1, 5):
+            Sale.objects.create(seller=cls.seller, date=date(2025, 8, day), total_amount=Decimal('100.00'))
+        Commission.objects.filter(sale__date=date(2025, 8, 1)).update(paid=True)
+
+        cls.seller.commission_rate = Decimal('3.00')
+        cls.seller.save(update_fields=['commission_rate'])
+
+    def values(self):
+        return list(Commission.objects.order_by('sale__date').values_list('percentage', 'value'))
+
+    def test_dry_run_reports_without_writing(self):
+        before = self.values()
+
+        result = recalculate_seller_commissions(self.seller.id, dry_run=True)
+
+        self.assertEqual(self.values(), before)
+        self.assertEqual((result['rows'], result['changed'], result['updated']), (3, 3, 0))
+        self.assertEqual(result['current_total'], Decimal('3.00'))
+        self.assertEqual(result['new_total'], Decimal('9.00'))
+        self.assertEqual(result['difference'], Decimal('6.00'))
+
+    def test_updates_only_unpaid_commissions_in_range(self):
+        with self.assertNumQueries(2):  # vendedor + agregação
+            result = recalculate_seller_commissions(
+                self.seller.id, start_date=date(2025, 8, 1), end_date=date(2025, 8, 3), dry_run=True,
+            )
+        self.assertEqual(result['changed'], 2)
+
+        call_command(
+            'recalculate_commissions', '--seller', str(self.seller.id),
+            '--start', '2025-08-01', '--end', '2025-08-03', stdout=StringIO(),
+        )
+
+        self.assertEqual(self.values(), [
+            (Decimal('1.00'), Decimal('1.00')),  # paga: não muda
+            (Decimal('3.00'), Decimal('3.00')),
+            (Decimal('3.00'), Decimal('3.00')),
+            (Decimal('1.00'), Decimal('1.00')),  # fora do período
+        ])
+        self.assertEqual(
+            SellerDailyRollup.objects.get(seller=self.seller, date=date(2025, 8, 2)).commission_total,
+            Decimal('3.00'),
+        )
+
+
+    def test_including_paid_commissions_keeps_paid_month_counter(self):
+        Commission.objects.filter(paid=True).update(paid_at=timezone.now())
+        reconcile_commission_counters()
+
+        result = recalculate_seller_commissions(self.seller.id, include_paid=True)
+
+        self.assertEqual(result['updated'], 4)
+        self.assertEqual(reconcile_commission_counters(dry_run=True), [])
+
+class PaymentGroupsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sellers = [
+            User.objects.create_user(
+                email=f'payout{i}@example.com', cpf=f'5100000000{i}', password='senha-forte-123',
+                first_name=f'Payout{i}', last_name='Silva', commission_rate=Decimal('10.00'),
+            )
+            for i in range(3)
+        ]
+        for i, seller in enumerate(cls.sellers):
+            for day in range(1, i + 3):
+                Sale.objects.create(seller=seller, date=date(2025, 9, day), total_amount=Decimal('100.00'))
+        Commission.objects.filter(seller=cls.sellers[2], sale__date=date(2025, 9, 1)).update(paid=True)
+
+    def test_groups_are_built_in_one_query(self):
+        with self.assertNumQueries(1):
+            groups = get_commissions_ready_for_payment()
+
+        summary = [(g['seller_name'], g['commission_count'], g['total_commission'], g['total_sales'])
+                   for g in groups]
+        self.assertEqual(summary, [
+            ('Payout1 Silva', 3, Decimal('30.00'), Decimal('300.00')),
+            ('Payout2 Silva', 3, Decimal('30.00'), Decimal('300.00')),
+            ('Payout0 Silva', 2, Decimal('20.00'), Decimal('200.00')),
+        ])
+        ids = set(Commission.objects.filter(seller=self.sellers[0]).values_list('id', flat=True))
+        self.assertEqual(set(groups[2]['commission_ids']), ids)
+
+    def test_seller_filter_reads_only_selected_sellers(self):
+        groups = get_commissions_ready_for_payment(seller_ids=[self.sellers[0].id])
+        self.assertEqual([g['seller_id'] for g in groups], [self.sellers[0].id])
+
+
+class PayoutBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='financeiro@example.com', cpf='52000000000', password='senha-forte-123',
+            first_name='Financeiro', user_type='admin',
+        )
+        cls.seller = User.objects.create_user(
+            email='lote@example.com', cpf='52000000001', password='senha-forte-123',
+            first_name='Lote', last_name='Souza', commission_rate=Decimal('10.00'),
+        )
+        for day in range(1, 8):
+            Sale.objects.create(seller=cls.seller, date=date(2025, 10, day), total_amount=Decimal('100.00'))
+
+    @staticmethod
+    def content(response):
+        return b''.join(response.streaming_content).decode()
+
+    def pay(self, token='token-1'):
+        self.client.force_login(self.admin)
+        return self.client.post(reverse('commissions:commissions_tracking'), {
+            'selected_sellers': [str(self.seller.id)],
+            'payout_token': token,
+        })
+
+    def test_payout_creates_batch_and_csv(self):
+        response = self.pay()
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('Lote Souza,70.00', self.content(response))
+        batch = PayoutBatch.objects.get()
+        self.assertEqual((batch.commission_count, batch.seller_count, batch.total_commission),
+                         (7, 1, Decimal('70.00')))
+        self.assertFalse(Commission.objects.filter(paid=False).exists())
+        self.assertEqual(Commission.objects.filter(payout_batch=batch).count(), 7)
+
+    def test_retry_with_same_token_replays_batch(self):
+        first = self.pay()
+        Sale.objects.create(seller=self.seller, date=date(2025, 10, 20), total_amount=Decimal('50.00'))
+
+        replay = self.pay()
+
+        first_csv = self.content(first)
+        self.assertEqual(self.content(replay), first_csv)
+        self.assertEqual(PayoutBatch.objects.count(), 1)
+        self.assertEqual(Commission.objects.filter(paid=False).count(), 1)
+
+        download = self.client.get(reverse('commissions:payout_batch_csv', args=[PayoutBatch.objects.get().pk]))
+        self.assertEqual(self.content(download), first_csv)
+
+    def test_second_batch_for_paid_sellers_is_rejected(self):
+        self.pay('token-1')
+        response = self.pay('token-2')
+
+        self.assertRedirects(response, reverse('commissions:commissions_tracking'), fetch_redirect_response=False)
+        self.assertEqual(PayoutBatch.objects.count(), 1)
+
+    def test_mark_as_paid_updates_in_bounded_chunks(self):
+        ids = list(Commission.objects.values_list('id', flat=True))
+
+        self.assertEqual(mark_commissions_as_paid(ids, chunk_size=3), 7)
+        self.assertEqual(mark_commissions_as_paid(ids, chunk_size=3), 0)
+
+    def test_detailed_batch_and_history_exports_stream_one_line_per_commission(self):
+        self.pay()
+        batch = PayoutBatch.objects.get()
+
+        detailed = self.client.get(reverse('commissions:payout_batch_csv', args=[batch.pk]), {'detalhe': '1'})
+        self.assertTrue(detailed.streaming)
+        lines = self.content(detailed).splitlines()
+        self.assertEqual(len(lines), 2 + 1 + 1 + 7)  # resumo + linha em branco + cabeçalho + detalhe
+        self.assertIn(f'Lote Souza,{Commission.objects.order_by("id").first().sale_id},2025-10-01,100.00,10.00,10.00', lines[4])
+
+        history = self.client.get(reverse('commissions:commission_history_export'), {'seller': self.seller.id})
+        self.assertTrue(history.streaming)
+        lines = self.content(history).splitlines()
+        self.assertEqual(len(lines), 1 + 7)
+        self.assertTrue(all(f',{batch.pk},{self.seller.id},Lote Souza,' in line for line in lines[1:]))
+
+
+class CommissionHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='historico@example.com', cpf='53000000000', password='senha-forte-123',
+            first_name='Historico', user_type='admin',
+        )
+        cls.sellers = [
+            User.objects.create_user(
+                email=f'hist{i}@example.com', cpf=f'5300000000{i + 1}', password='senha-forte-123',
+                first_name=name, commission_rate=Decimal('10.00'),
+            )
+            for i, name in enumerate(['Ana', 'Bia', 'Caio'])
+        ]
+        # Cada vendedor recebe em junho e julho; o último pagamento de julho é às 23h30.
+        for seller in cls.sellers:
+            for day, paid_at in ((1, datetime(2025, 6, 10, 9)), (2, datetime(2025, 7, 31, 23, 30))):
+                sale = Sale.objects.create(seller=seller, date=date(2025, 6, day), total_amount=Decimal('100.00'))
+                Commission.objects.filter(sale=sale).update(paid=True, paid_at=timezone.make_aware(paid_at))
+
+    def test_keyset_pages_follow_month_and_name_order(self):
+        keys, cursor = [], None
+        while True:
+            page = get_paid_commissions_summary_page(cursor=cursor, page_size=2)
+            keys += [(row['payment_month'].month, row['seller__first_name']) for row in page['rows']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(keys, [
+            (7, 'Ana'), (7, 'Bia'), (7, 'Caio'),
+            (6, 'Ana'), (6, 'Bia'), (6, 'Caio'),
+        ])
+
+    def test_totals_come_from_one_aggregate_and_end_date_covers_whole_day(self):
+        with self.assertNumQueries(2):  # último fechamento + agregação
+            totals = get_paid_commissions_totals(start_date='2025-07-31', end_date='2025-07-31')
+        self.assertEqual(totals, {'total_commission': Decimal('30.00'), 'total_sales': Decimal('300.00')})
+
+        totals = get_paid_commissions_totals(seller_id=self.sellers[0].id, end_date='2025-07-30')
+        self.assertEqual(totals['total_commission'], Decimal('10.00'))
+
+    def test_view_paginates_and_keeps_filters(self):
+        self.client.force_login(self.admin)
+        url = reverse('commissions:commission_history')
+
+        first = self.client.get(url, {'start_date': '2025-06-01'})
+        self.assertEqual(len(first.context['summary_data']), 6)
+        self.assertIsNone(first.context['next_cursor'])
+        self.assertEqual(first.context['total_commission_filtered'], Decimal('60.00'))
+
+        cursor = get_paid_commissions_summary_page(start_date='2025-06-01', page_size=4)['next_cursor']
+        second = self.client.get(url, {'start_date': '2025-06-01', 'cursor': cursor})
+        self.assertEqual([row['seller__first_name'] for row in second.context['summary_data']], ['Bia', 'Caio'])
+        self.assertFalse(second.context['is_first_page'])
+        self.assertEqual(second.context['filter_query'], 'start_date=2025-06-01')
+        self.assertEqual(second.context['total_commission_filtered'], Decimal('60.00'))
+
+    def test_closed_months_are_read_from_the_ledger(self):
+        before = get_paid_commissions_summary_page()['rows']
+
+        call_command('close_commission_month', '--month', '2025-06', stdout=StringIO())
+
+        close = CommissionMonthClose.objects.get()
+        self.assertEqual((close.commission_count, close.total_commission), (3, Decimal('30.00')))
+        self.assertEqual(CommissionLedgerEntry.objects.filter(month=date(2025, 6, 1)).count(), 3)
+
+        # O mês fechado fica congelado, mesmo que uma comissão antiga mude depois.
+        Commission.objects.filter(paid_at__month=6).update(value=Decimal('99.00'))
+
+        with self.assertNumQueries(3):  # último fechamento + meses abertos + ledger
+            after = get_paid_commissions_summary_page()['rows']
+        self.assertEqual(after, before)
+        self.assertEqual(get_paid_commissions_totals(start_date='2025-06-01')['total_commission'], Decimal('60.00'))
+        # Mês coberto só em parte pelo filtro continua calculado ao vivo.
+        self.assertEqual(get_paid_commissions_totals(start_date='2025-06-10')['total_commission'], Decimal('327.00'))
+
+    def test_closing_is_sequential_and_final(self):
+        call_command('close_commission_month', '--month', '2025-07', stdout=StringIO())
+        self.assertEqual(
+            list(CommissionMonthClose.objects.order_by('month').values_list('month', 'commission_count')),
+            [(date(2025, 6, 1), 3), (date(2025, 7, 1), 3)],
+        )
+
+        with self.assertRaisesMessage(CommandError, "já está fechado"):
+            call_command('close_commission_month', '--month', '2025-06', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "meses já encerrados"):
+            call_command('close_commission_month', '--month', timezone.localdate().strftime('%Y-%m'), stdout=StringIO())
+
+
+class CommissionCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='contador@example.com', cpf='54000000000', password='senha-forte-123',
+            first_name='Contador', commission_rate=Decimal('10.00'),
+        )
+        cls.sales = [
+            Sale.objects.create(seller=cls.seller, date=date(2025, 11, day), total_amount=Decimal('100.00'))
+            for day in range(1, 5)
+        ]
+
+    def counters(self):
+        return dict(CommissionCounter.objects.values_list('key', 'total'))
+
+    def test_cards_read_counters_kept_by_every_write_path(self):
+        pending_key = f'pending:seller:{self.seller.id}'
+        self.assertEqual(self.counters()['pending'], Decimal('40.00'))
+
+        sale = self.sales[0]
+        sale.total_amount = Decimal('300.00')
+        sale.save()
+        mark_commissions_as_paid(Commission.objects.filter(sale__in=self.sales[2:]).values_list('id', flat=True))
+        self.sales[1].delete()
+
+        with self.assertNumQueries(1):
+            cards = get_commission_totals_for_cards()
+        self.assertEqual(cards, {'ready_total': Decimal('30.00'), 'paid_month_total': Decimal('20.00')})
+        self.assertEqual(self.counters()[pending_key], Decimal('30.00'))
+        self.assertEqual(reconcile_commission_counters(dry_run=True), [])
+
+    def test_reconcile_command_rebuilds_drifted_counters(self):
+        Commission.objects.update(value=Decimal('1.00'))  # UPDATE em massa não passa pelos contadores
+
+        out = StringIO()
+        call_command('reconcile_commission_counters', stdout=out)
+
+        self.assertIn('pending', out.getvalue())
+        self.assertEqual(self.counters()['pending'], Decimal('4.00'))
+        self.assertEqual(reconcile_commission_counters(dry_run=True), [])
+
+
+class CommissionQuerySetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sellers = [
+            User.objects.create_user(
+                email=f'qs{i}@example.com', cpf=f'5500000000{i}', password='senha-forte-123',
+                first_name=f'Qs{i}', commission_rate=Decimal('10.00'),
+            )
+            for i in range(2)
+        ]
+        for seller in cls.sellers:
+            for day in (1, 2):
+                Sale.objects.create(seller=seller, date=date(2025, 12, day), total_amount=Decimal('100.00'))
+        Commission.objects.filter(seller=cls.sellers[0], sale__date=date(2025, 12, 1)).update(
+            paid=True, paid_at=timezone.make_aware(datetime(2025, 12, 5, 10)),
+        )
+
+    def test_chainable_filters_and_groupings(self):
+        unpaid = Commission.objects.unpaid().for_seller([s.id for s in self.sellers]).by_seller_totals()
+        self.assertEqual(
+            sorted((row['seller__first_name'], row['commission_count'], row['total_commission']) for row in unpaid),
+            [('Qs0', 1, Decimal('10.00')), ('Qs1', 2, Decimal('20.00'))],
+        )
+
+        start = timezone.make_aware(datetime(2025, 12, 1))
+        months = list(Commission.objects.paid_between(start, None).for_seller(self.sellers[0].id).by_month())
+        self.assertEqual(len(months), 1)
+        self.assertEqual((months[0]['commission_count'], months[0]['total_sales']), (1, Decimal('100.00')))
+        self.assertFalse(Commission.objects.paid_between(None, start).exists())
+
+    def test_seller_change_on_sale_keeps_commission_in_sync(self):
+        sale = Sale.objects.get(seller=self.sellers[1], date=date(2025, 12, 2))
+        sale.seller = self.sellers[0]
+        sale.date = date(2025, 12, 3)
+        sale.save()
+
+        self.assertEqual(Commission.objects.get(sale=sale).seller_id, self.sellers[0].id)
+        self.assertEqual(checks.run_checks(tags=[checks.Tags.database], databases=['default']), [])
+
+    def test_database_check_reports_and_command_fixes_mismatch(self):
+        Commission.objects.filter(seller=self.sellers[1]).update(seller=self.sellers[0])
+
+        errors = checks.run_checks(tags=[checks.Tags.database], databases=['default'])
+        self.assertEqual([error.id for error in errors], ['commissions.E001'])
 
-# Create your tests here.
+        call_command('sync_commission_sellers', stdout=StringIO())
+        self.assertEqual(checks.run_checks(tags=[checks.Tags.database], databases=['default']), [])
+        self.assertEqual(Commission.objects.filter(seller=self.sellers[1]).count(), 2)
+        self.assertEqual(reconcile_commission_counters(dry_run=True), [])
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import CommissionTrackingView, CommissionHistoryView
+from .views import CommissionTrackingView, CommissionHistoryView, CommissionHistoryExportView, PayoutBatchCSVView
 
 app_name = 'commissions'
 
 urlpatterns = [
     path('', CommissionTrackingView.as_view(), name='commissions_tracking'),
     path('historico/', CommissionHistoryView.as_view(), name='commission_history'),
+    path('historico/exportar/', CommissionHistoryExportView.as_view(), name='commission_history_export'),
+    path('lotes/<int:pk>/csv/', PayoutBatchCSVView.as_view(), name='payout_batch_csv'),
 ]
\ No newline at end of file
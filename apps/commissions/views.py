@@ -1,15 +1,17 @@
 from django.shortcuts import render, redirect
 from django.views import View
 from django.contrib import messages
-from django.http import HttpResponse
 from django.utils import timezone
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
 
 # Importações de Serviços e Modelos
 from apps.commissions import services as commission_services
-# ATENÇÃO: Assumimos que esta função existe e retorna todos os vendedores para filtros
-from apps.accounts.services import get_all_sellers 
-import csv 
+from apps.core.mixins import ReportingDatabaseMixin, mark_data_written
+from apps.core.utils import stream_csv_response
+# Diretório de vendedores em cache, para o filtro do histórico
+from apps.accounts.services import get_seller_directory
+import uuid
 
 
 # =========================================================================
@@ -24,6 +26,8 @@ class CommissionTrackingView(LoginRequiredMixin, View):
     """
     template_name = "commissions/acompanhamento.html" 
     login_url = 'accounts:login'
+    # GET: sessão + usuário + cards + grupos + últimos lotes
+    query_budget = {'GET': 5}
 
     def get(self, request, *args, **kwargs):
         """ Carrega os dados para a tela principal (cards e tabela de grupos). """
@@ -36,61 +40,100 @@ class CommissionTrackingView(LoginRequiredMixin, View):
 
         context = {
             'totals': totals,
-            'payment_groups': payment_groups
+            'payment_groups': payment_groups,
+            'recent_batches': commission_services.get_recent_payout_batches(),
+            # Token de idempotência: um reenvio do mesmo formulário não paga duas vezes.
+            'payout_token': uuid.uuid4().hex,
         }
         return render(request, self.template_name, context)
 
     def post(self, request, *args, **kwargs):
         """ 
-        Processa o "Lote de Pagamento" (Gera CSV e Marca como Pago).
+        Processa o "Lote de Pagamento" (Marca como Pago e Gera CSV).
         """
-        seller_ids_selected = request.POST.getlist('selected_sellers')
+        seller_ids_selected = [
+            int(seller_id) for seller_id in request.POST.getlist('selected_sellers')
+            if seller_id.isdigit()
+        ]
         
         if not seller_ids_selected:
             messages.error(request, "Nenhum vendedor foi selecionado.")
-            return redirect('commissions:tracking') 
+            return redirect('commissions:commissions_tracking') 
 
-        # --- 1. Busca os dados COMPLETOs APENAS dos grupos selecionados ---
-        all_groups = commission_services.get_commissions_ready_for_payment()
-        groups_to_pay = [g for g in all_groups if str(g['seller_id']) in seller_ids_selected]
-        
-        if not groups_to_pay:
-            messages.error(request, "Vendedores selecionados não têm comissões prontas.")
-            return redirect('commissions:tracking')
-
-        # --- 2. Cria a resposta CSV e coleta todos os IDs ---
-        response = HttpResponse(content_type='text/csv')
-        filename = f"relatorio_pagamento_{timezone.now().date()}.csv"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID_Vendedor', 'Nome_Vendedor', 'Valor_Total_Pagar'])
-        
-        all_commission_ids_to_mark_paid = []
-        
-        for group in groups_to_pay:
-            writer.writerow([
-                group['seller_id'], 
-                group['seller_name'], 
-                group['total_commission'] # O valor total da comissão para o holerite
-            ])
-            # Coleta todos os IDs de comissão individuais para dar baixa no DB
-            all_commission_ids_to_mark_paid.extend(group['commission_ids'])
-
-        # --- 3. Marcar comissões como PAGAS no banco ---
-        # A baixa é dada no banco ANTES de enviar o CSV, garantindo que o sistema não perca o estado.
-        commission_services.mark_commissions_as_paid(all_commission_ids_to_mark_paid)
-        
-        # --- 4. Retorna o arquivo CSV (que é a confirmação visual da ação) ---
-        messages.success(request, "Relatório gerado! As comissões foram marcadas como pagas.")
-        return response
+        # --- 1. Cria o lote (ou reaproveita o lote já criado por este formulário) ---
+        payout_token = request.POST.get('payout_token') or uuid.uuid4().hex
+        try:
+            batch, created = commission_services.create_payout_batch(
+                seller_ids_selected,
+                idempotency_key=payout_token,
+                created_by=request.user,
+            )
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            return redirect('commissions:commissions_tracking')
+        mark_data_written(request)
+
+        # --- 2. Retorna o arquivo CSV do lote (que é a confirmação visual da ação) ---
+        if created:
+            messages.success(request, "Relatório gerado! As comissões foram marcadas como pagas.")
+        return payout_batch_csv_response(batch)
+
+
+class PayoutBatchCSVView(ReportingDatabaseMixin, LoginRequiredMixin, View):
+    """
+    Baixa novamente o CSV de um lote de pagamento já realizado,
+    sem alterar nenhuma comissão. Com ?detalhe=1 inclui uma seção
+    com uma linha por venda/comissão do lote.
+    """
+    login_url = 'accounts:login'
+
+    def get(self, request, pk, *args, **kwargs):
+        batch = commission_services.get_payout_batch_by_id(pk)
+        return payout_batch_csv_response(batch, with_details=request.GET.get('detalhe') == '1')
+
+
+def payout_batch_rows(batch, with_details=False):
+    """ Linhas do CSV do lote: uma por vendedor e, opcionalmente, o detalhe por venda. """
+    yield ['ID_Vendedor', 'Nome_Vendedor', 'Valor_Total_Pagar']
+
+    for row in commission_services.get_payout_batch_summary(batch):
+        yield [
+            row['seller_id'],
+            f"{row['seller__first_name']} {row['seller__last_name']}",
+            f"{row['total_commission']:.2f}",  # O valor total da comissão para o holerite
+        ]
+
+    if not with_details:
+        return
+
+    yield []
+    yield ['ID_Vendedor', 'Nome_Vendedor', 'ID_Venda', 'Data_Venda', 'Valor_Venda', 'Percentual', 'Valor_Comissao']
+    for seller_id, first_name, last_name, sale_id, sale_date, sale_amount, percentage, value in (
+        commission_services.iter_payout_batch_details(batch)
+    ):
+        yield [
+            seller_id,
+            f"{first_name} {last_name}",
+            sale_id,
+            sale_date.isoformat(),
+            f"{sale_amount:.2f}",
+            f"{percentage:.2f}",
+            f"{value:.2f}",
+        ]
+
+
+def payout_batch_csv_response(batch, with_details=False):
+    """ CSV do lote em streaming, a partir das comissões vinculadas a ele. """
+    suffix = "_detalhado" if with_details else ""
+    filename = f"relatorio_pagamento_{timezone.localtime(batch.paid_at).date()}_lote_{batch.pk}{suffix}.csv"
+    return stream_csv_response(filename, payout_batch_rows(batch, with_details))
 
 
 # =========================================================================
 # 2. VIEW DE HISTÓRICO (HISTORY)
 # Responsável por listar o histórico consolidado de comissões pagas.
 # =========================================================================
-class CommissionHistoryView(LoginRequiredMixin, View):
+class CommissionHistoryView(ReportingDatabaseMixin, LoginRequiredMixin, View):
     """
     Exibe o histórico de comissões já pagas. Os dados são agregados 
     por Vendedor e Mês de Pagamento para visualização consolidada.
@@ -106,25 +149,82 @@ class CommissionHistoryView(LoginRequiredMixin, View):
         start_date = request.GET.get('start_date', None)
         end_date = request.GET.get('end_date', None)
         
-        # 2. Chama o serviço para obter os totais AGREGADOS
-        summary_data = commission_services.get_paid_commissions_summary(
+        # 2. Chama o serviço para obter uma página dos dados AGREGADOS
+        page = commission_services.get_paid_commissions_summary_page(
             seller_id=seller_id,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            cursor=request.GET.get('cursor'),
         )
         
-        # 3. Calcula os totais globais da página (para o card de resumo no template)
-        total_commission_filtered = sum(item['total_commission'] for item in summary_data)
-        total_sales_filtered = sum(item['total_sales'] for item in summary_data)
+        # 3. Totais do filtro inteiro (card de resumo), calculados no banco
+        totals = commission_services.get_paid_commissions_totals(
+            seller_id=seller_id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+
+        # Filtros preservados nos links de paginação
+        filter_query = request.GET.copy()
+        filter_query.pop('cursor', None)
 
         context = {
-            'summary_data': summary_data, # O NOVO CONTEXTO COM DADOS AGRUPADOS
-            'all_sellers': get_all_sellers(),
+            'summary_data': page['rows'], # O NOVO CONTEXTO COM DADOS AGRUPADOS
+            'next_cursor': page['next_cursor'],
+            'is_first_page': not request.GET.get('cursor'),
+            'filter_query': filter_query.urlencode(),
+            'all_sellers': get_seller_directory(),
             'selected_seller': seller_id,
             'selected_start_date': start_date,
             'selected_end_date': end_date,
-            'total_commission_filtered': total_commission_filtered,
-            'total_sales_filtered': total_sales_filtered,
+            'total_commission_filtered': totals['total_commission'],
+            'total_sales_filtered': totals['total_sales'],
         }
         
-        return render(request, self.template_name, context)
\ No newline at end of file
+        return render(request, self.template_name, context)
+
+
+# =========================================================================
+# 3. EXPORTAÇÃO DO HISTÓRICO (CSV DETALHADO)
+# Uma linha por comissão paga, em streaming (memória constante).
+# =========================================================================
+class CommissionHistoryExportView(ReportingDatabaseMixin, LoginRequiredMixin, View):
+    """
+    Exporta em CSV todas as comissões PAGAS com os mesmos filtros
+    da tela de histórico (vendedor e período de pagamento).
+    """
+    login_url = 'accounts:login'
+
+    def get(self, request, *args, **kwargs):
+        seller_id = request.GET.get('seller') or None
+        start_date = request.GET.get('start_date') or None
+        end_date = request.GET.get('end_date') or None
+
+        rows = commission_services.iter_paid_commissions_rows(
+            seller_id=seller_id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        filename = f"historico_comissoes_{timezone.localdate()}.csv"
+        return stream_csv_response(filename, self.csv_rows(rows))
+
+    @staticmethod
+    def csv_rows(rows):
+        yield [
+            'ID_Comissao', 'Pago_Em', 'Lote', 'ID_Vendedor', 'Nome_Vendedor',
+            'ID_Venda', 'Data_Venda', 'Valor_Venda', 'Percentual', 'Valor_Comissao',
+        ]
+        for (commission_id, paid_at, batch_id, seller_id, first_name, last_name,
+             sale_id, sale_date, sale_amount, percentage, value) in rows:
+            yield [
+                commission_id,
+                timezone.localtime(paid_at).strftime('%Y-%m-%d %H:%M:%S') if paid_at else '',
+                batch_id or '',
+                seller_id,
+                f"{first_name} {last_name}",
+                sale_id,
+                sale_date.isoformat(),
+                f"{sale_amount:.2f}",
+                f"{percentage:.2f}",
+                f"{value:.2f}",
+            ]
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
+
+    def ready(self):
+        from apps.core.db import configure_sqlite_connection
+
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='core_sqlite_pragmas')
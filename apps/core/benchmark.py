@@ -0,0 +1,401 @@
+"""
+Massa de dados sintética e benchmark das views.
+
+`seed_benchmark_data` gera N vendedores × M dias de vendas com comissões
+(parte paga em lotes mensais, parte pendente) usando INSERTs em lote.
+`benchmark_urls` percorre as URLs de config/urls.py com o test client e
+mede latência (p50/p95) e número de queries de cada uma.
+`benchmark_concurrent_sales` mede a vazão de criação de vendas com várias
+threads escrevendo ao mesmo tempo, com e sem o perfil de produção do SQLite.
+
+Usados pelos comandos `seed_benchmark_data`, `run_benchmark` e
+`run_write_benchmark`.
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Count, Sum
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.commissions.models import Commission, PayoutBatch
+from apps.commissions.services import reconcile_commission_counters
+from apps.dashboard.services import rebuild_rollup
+from apps.sales.forms import SaleForm
+from apps.sales.models import Sale
+from apps.sales.services import create_sale, get_sales_totals
+
+BENCHMARK_EMAIL_DOMAIN = 'benchmark.local'
+BENCHMARK_PASSWORD = 'benchmark123'
+
+# Taxas de comissão (%) e o peso de cada uma entre os vendedores.
+COMMISSION_RATES = [
+    (Decimal('2.50'), 20),
+    (Decimal('3.00'), 30),
+    (Decimal('5.00'), 30),
+    (Decimal('7.50'), 15),
+    (Decimal('10.00'), 5),
+]
+SALE_PROBABILITY = 0.85  # chance de o vendedor ter venda num dia
+WEEKEND_FACTOR = 0.6
+MEDIAN_SALE_AMOUNT = 800
+PAYOUT_DAY = 5  # comissões do mês são pagas no dia 5 do mês seguinte
+READER_PAUSE = 0.01  # intervalo entre leituras de cada thread leitora (s)
+
+
+# ==========================
+# MASSA DE DADOS
+# ==========================
+def benchmark_sellers():
+    return User.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}')
+
+
+def random_sale_amount(rng: random.Random, day) -> Decimal:
+    amount = rng.lognormvariate(math.log(MEDIAN_SALE_AMOUNT), 0.5)
+    if day.weekday() >= 5:
+        amount *= WEEKEND_FACTOR
+    return Decimal(f'{max(amount, 10):.2f}')
+
+
+def payout_moment(sale_date):
+    """Data de pagamento das comissões do mês da venda (dia 5 do mês seguinte, 18h)."""
+    next_month = (sale_date.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return timezone.make_aware(datetime(next_month.year, next_month.month, PAYOUT_DAY, 18))
+
+
+def seed_benchmark_data(sellers: int, days: int, paid_ratio: float = 0.7, end_date=None,
+                        seed: int = 0, batch_size: int = 1000) -> dict:
+    """
+    Gera `sellers` vendedores com até `days` dias de vendas terminando em
+    `end_date` (hoje, por padrão). As vendas mais antigas (`paid_ratio` dos
+    dias) têm a comissão paga em lotes mensais; as demais ficam pendentes.
+
+    Tudo é gravado com bulk_create, por vendedor, e no fim o consolidado
+    diário e os contadores dos cards são reconstruídos de uma vez.
+
+    Returns:
+        dict: quantidades geradas (sellers, sales, paid, unpaid, batches).
+    """
+    rng = random.Random(seed)
+    end_date = end_date or timezone.localdate()
+    start_date = end_date - timedelta(days=days - 1)
+    paid_until = start_date + timedelta(days=int(days * paid_ratio))
+    now = timezone.now()
+    password = make_password(BENCHMARK_PASSWORD)
+    offset = benchmark_sellers().count()
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f'vendedor{offset + i}@{BENCHMARK_EMAIL_DOMAIN}',
+                    cpf=f'8{offset + i:010d}',
+                    first_name=f'Vendedor{offset + i}',
+                    last_name=rng.choice(['Silva', 'Souza', 'Oliveira', 'Santos', 'Lima', 'Costa']),
+                    password=password,
+                    user_type='sellers',
+                    commission_rate=rng.choices(
+                        [rate for rate, _ in COMMISSION_RATES],
+                        weights=[weight for _, weight in COMMISSION_RATES],
+                    )[0],
+                )
+                for i in range(sellers)
+            ],
+            batch_size=batch_size,
+        )
+
+        batches = {}
+        counts = {'sellers': len(users), 'sales': 0, 'paid': 0, 'unpaid': 0}
+
+        for user in users:
+            sales = []
+            for offset_days in range(days):
+                day = start_date + timedelta(days=offset_days)
+                if rng.random() < SALE_PROBABILITY:
+                    sales.append(Sale(seller=user, date=day, total_amount=random_sale_amount(rng, day)))
+            sales = Sale.objects.bulk_create(sales, batch_size=batch_size)
+
+            commissions = []
+            for sale in sales:
+                value = (sale.total_amount * user.commission_rate / Decimal('100')).quantize(Decimal('0.01'))
+                commission = Commission(
+                    seller=user, sale=sale, percentage=user.commission_rate, value=value,
+                )
+                paid_at = payout_moment(sale.date)
+                if sale.date < paid_until and paid_at <= now:
+                    if paid_at not in batches:
+                        batches[paid_at] = PayoutBatch.objects.create(
+                            idempotency_key=f'benchmark-{paid_at:%Y%m}-{seed}-{offset}',
+                            paid_at=paid_at,
+                        )
+                    commission.paid = True
+                    commission.paid_at = paid_at
+                    commission.payout_batch = batches[paid_at]
+                commissions.append(commission)
+            Commission.objects.bulk_create(commissions, batch_size=batch_size)
+
+            paid = sum(1 for commission in commissions if commission.paid)
+            counts['sales'] += len(sales)
+            counts['paid'] += paid
+            counts['unpaid'] += len(commissions) - paid
+
+        totals = (
+            Commission.objects.filter(payout_batch__in=batches.values()).order_by()
+            .values('payout_batch_id')
+            .annotate(
+                total_commission=Sum('value'),
+                total_sales=Sum('sale__total_amount'),
+                commission_count=Count('id'),
+                seller_count=Count('seller_id', distinct=True),
+            )
+        )
+        by_batch = {batch.pk: batch for batch in batches.values()}
+        for row in totals:
+            batch = by_batch[row.pop('payout_batch_id')]
+            for field, value in row.items():
+                setattr(batch, field, value)
+        PayoutBatch.objects.bulk_update(
+            by_batch.values(),
+            ['total_commission', 'total_sales', 'commission_count', 'seller_count'],
+        )
+        counts['batches'] = len(batches)
+
+        rebuild_rollup(start_date=start_date, end_date=end_date, batch_size=batch_size)
+        reconcile_commission_counters()
+
+    return counts
+
+
+# ==========================
+# BENCHMARK DAS URLS
+# ==========================
+# Namespaces e URLs fora do benchmark: o admin do Django e GETs com efeito colateral.
+SKIPPED_NAMESPACES = {'admin'}
+SKIPPED_URLS = {'accounts:logout', 'accounts:sellers_deactivate'}
+
+
+def iter_url_names(patterns=None, namespace=None):
+    """Nomes (com namespace) e view de todas as URLs nomeadas do projeto."""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in SKIPPED_NAMESPACES:
+                continue
+            inner = ':'.join(filter(None, [namespace, pattern.namespace])) or None
+            yield from iter_url_names(pattern.url_patterns, inner)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            name = f'{namespace}:{pattern.name}' if namespace else pattern.name
+            if name not in SKIPPED_URLS:
+                yield name, pattern
+
+
+def url_pk(pattern, seller):
+    """Um pk válido para URLs com <pk>, a partir do model da view."""
+    view_class = getattr(pattern.callback, 'view_class', None)
+    model = getattr(view_class, 'model', None)
+    if model is User:
+        return seller.pk
+    if model is Sale:
+        return Sale.objects.filter(seller=seller).values_list('pk', flat=True).first()
+    if 'lotes' in str(pattern.pattern):
+        return PayoutBatch.objects.values_list('pk', flat=True).first()
+    return None
+
+
+def percentile(values, fraction: float) -> float:
+    """Percentil pelo método nearest-rank."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def time_request(client, url):
+    """Executa um GET (consumindo respostas em streaming) e mede tempo e queries."""
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - start
+    return response.status_code, elapsed * 1000, len(queries)
+
+
+def benchmark_urls(admin, seller, repeat: int = 10) -> list[dict]:
+    """
+    Mede cada URL como admin e como vendedor. A primeira requisição de cada
+    URL é feita com o cache vazio; as demais, com o cache aquecido.
+
+    Returns:
+        list[dict]: url, name, role, status, requests, p50_ms, p95_ms, max_ms e queries
+        (maior número de queries entre as repetições).
+    """
+    queries_logger = logging.getLogger('apps.core.queries')
+    previous_level = queries_logger.level
+    queries_logger.setLevel(logging.ERROR)  # o benchmark já registra as queries
+
+    results = []
+    try:
+        for role, user in (('admin', admin), ('seller', seller)):
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            for name, pattern in iter_url_names():
+                kwargs = {}
+                if 'pk' in pattern.pattern.converters:
+                    kwargs['pk'] = url_pk(pattern, seller)
+                    if kwargs['pk'] is None:
+                        continue
+                url = reverse(name, kwargs=kwargs)
+
+                cache.clear()
+                timings, statuses, query_counts = [], set(), []
+                for _ in range(repeat):
+                    status, elapsed, query_count = time_request(client, url)
+                    statuses.add(status)
+                    timings.append(elapsed)
+                    query_counts.append(query_count)
+
+                results.append({
+                    'url': url,
+                    'name': name,
+                    'role': role,
+                    'status': sorted(statuses),
+                    'requests': repeat,
+                    'p50_ms': round(percentile(timings, 0.50), 2),
+                    'p95_ms': round(percentile(timings, 0.95), 2),
+                    'max_ms': round(max(timings), 2),
+                    'queries': max(query_counts),
+                })
+    finally:
+        queries_logger.setLevel(previous_level)
+
+    return results
+
+
+# ==========================
+# ESCRITA CONCORRENTE (SQLITE)
+# ==========================
+@contextmanager
+def sqlite_profile(path, production: bool):
+    """
+    Aponta a conexão default para um arquivo SQLite novo, com o perfil de
+    produção (PRAGMAs + BEGIN IMMEDIATE) ou com os padrões do Django, e
+    aplica as migrações. Restaura a configuração original ao sair.
+    """
+    settings_dict = connections['default'].settings_dict
+    original = {key: settings_dict.get(key) for key in ('NAME', 'OPTIONS', 'CONN_MAX_AGE')}
+    production_options = {'transaction_mode': 'IMMEDIATE'}
+
+    connections.close_all()
+    settings_dict.update(
+        NAME=str(path),
+        OPTIONS=production_options if production else {},
+        CONN_MAX_AGE=original['CONN_MAX_AGE'] if production else 0,
+    )
+    try:
+        with override_settings(**({} if production else {'SQLITE_PRAGMAS': {}})):
+            call_command('migrate', interactive=False, verbosity=0)
+            yield
+    finally:
+        connections.close_all()
+        settings_dict.update(original)
+
+
+def benchmark_concurrent_sales(threads: int = 8, sales_per_thread: int = 50, readers: int = 4) -> dict:
+    """
+    Cria vendas pelo fluxo normal (SaleForm + create_sale, com os sinais de
+    comissão, consolidado e contadores) em `threads` threads simultâneas,
+    cada uma com o seu vendedor, enquanto `readers` threads leem os totais
+    de vendas sem parar, como os dashboards abertos no início do turno.
+
+    Returns:
+        dict: created, locked (falhas "database is locked"), elapsed_s,
+        sales_per_second, latências p50/p95 em ms e reads (leituras concluídas).
+    """
+    sellers = User.objects.bulk_create([
+        User(
+            email=f'escrita{i}@{BENCHMARK_EMAIL_DOMAIN}',
+            cpf=f'7{i:010d}',
+            first_name=f'Escrita{i}',
+            user_type='sellers',
+            commission_rate=Decimal('5.00'),
+        )
+        for i in range(threads)
+    ])
+    start_day = date(2020, 1, 1)
+    barrier = threading.Barrier(threads + readers)
+    lock = threading.Lock()
+    done = threading.Event()
+    result = {'created': 0, 'locked': 0, 'reads': 0}
+    timings = []
+
+    def reader(index):
+        barrier.wait()
+        try:
+            while not done.is_set():
+                try:
+                    get_sales_totals(sellers[index % threads].id)
+                except OperationalError:
+                    with lock:
+                        result['locked'] += 1
+                    continue
+                with lock:
+                    result['reads'] += 1
+                time.sleep(READER_PAUSE)
+        finally:
+            connection.close()
+
+    def writer(seller):
+        barrier.wait()
+        try:
+            for i in range(sales_per_thread):
+                form = SaleForm(data={'date': start_day + timedelta(days=i), 'total_amount': '150.00'})
+                form.is_valid()
+                start = time.perf_counter()
+                try:
+                    create_sale(seller, form)
+                except OperationalError:
+                    with lock:
+                        result['locked'] += 1
+                    continue
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    result['created'] += 1
+                    timings.append(elapsed)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=writer, args=(seller,)) for seller in sellers]
+    readers = [threading.Thread(target=reader, args=(index,)) for index in range(readers)]
+    for thread in readers:
+        thread.start()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    result.update(
+        elapsed_s=round(elapsed, 3),
+        sales_per_second=round(result['created'] / elapsed, 1),
+        p50_ms=round(percentile(timings, 0.50), 2) if timings else None,
+        p95_ms=round(percentile(timings, 0.95), 2) if timings else None,
+    )
+    return result
@@ -0,0 +1,257 @@
+"""
+Versões de cache para invalidação por escrita.
+
+Cada vendedor tem um contador de versão, e cada (vendedor, mês) também,
+para que as vendas do dia não invalidem meses fechados; existe ainda um
+contador global.
+As chaves de cache incluem essas versões, então invalidar é só incrementar
+o contador: as entradas antigas deixam de ser lidas e expiram sozinhas.
+Outro contador muda a cada escrita de qualquer vendedor, para os dados
+agregados de todos (dashboard do admin), e outro a cada escrita de
+usuários (diretório de vendedores).
+
+Os contadores ficam na tabela CacheVersion, para que todos os workers e
+máquinas invalidem juntos mesmo com caches locais. Os incrementos de uma
+transação são gravados de uma vez, após o commit. Cada processo guarda as
+versões lidas por CACHE_VERSION_TTL segundos: no máximo uma leitura
+indexada por requisição, e uma escrita vale nos outros processos em até
+esse prazo. Invalidar também descarta a memoização da requisição atual
+(apps.core.memo), para que a própria requisição leia o que acabou de gravar.
+
+get_or_compute() lê uma entrada com proteção contra stampede: quando ela
+falta ou vence, só um processo recalcula; os outros esperam o resultado
+(entrada ausente) ou seguem com o valor anterior (entrada vencida).
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.memo import clear_request_memo
+from apps.core.models import CacheVersion
+
+GLOBAL_VERSION_KEY = 'global'
+ANY_SELLER_VERSION_KEY = 'sellers'
+USERS_VERSION_KEY = 'users'
+
+# Proteção contra stampede
+LOCK_TIMEOUT = 30  # s; libera o lock do cache.add() se o processo morrer (sem fcntl)
+LOCK_WAIT = 5  # s; quanto um processo espera o recálculo de outro
+LOCK_POLL_INTERVAL = 0.05
+STALE_GRACE = 60 * 60  # s; por quanto tempo um valor vencido ainda pode ser servido
+
+
+def seller_version_key(seller_id) -> str:
+    return f'seller:{seller_id}'
+
+
+def seller_month_version_key(seller_id, day) -> str:
+    return f'seller:{seller_id}:month:{day:%Y-%m}'
+
+
+def local_version_key(key) -> str:
+    return f'cacheversion:{key}'
+
+
+def version_ttl() -> int:
+    return getattr(settings, 'CACHE_VERSION_TTL', 2)
+
+
+def get_versions(keys) -> dict:
+    """
+    Versão atual de cada chave: do cache local, se lida há menos de
+    CACHE_VERSION_TTL segundos, ou do banco, em uma única query.
+    """
+    local = cache.get_many([local_version_key(key) for key in keys])
+    versions = {key: local[local_version_key(key)] for key in keys if local_version_key(key) in local}
+
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        stored = dict(CacheVersion.objects.filter(key__in=missing).values_list('key', 'version'))
+        fetched = {key: stored.get(key, 0) for key in missing}
+        cache.set_many({local_version_key(key): version for key, version in fetched.items()}, version_ttl())
+        versions.update(fetched)
+
+    return versions
+
+
+def get_cache_version(seller_id=None, users: bool = False) -> str:
+    """
+    Versão combinada para compor chaves de cache: global + vendedor ou,
+    sem vendedor, global + "qualquer vendedor"; com users=True, também
+    a versão dos usuários.
+    """
+    keys = [GLOBAL_VERSION_KEY]
+    keys.append(seller_version_key(seller_id) if seller_id is not None else ANY_SELLER_VERSION_KEY)
+    if users:
+        keys.append(USERS_VERSION_KEY)
+
+    versions = get_versions(keys)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def get_seller_month_versions(seller_id, *days) -> list[str]:
+    """
+    Versão global + (vendedor, mês) do mês de cada dia informado, lidas de
+    uma vez. Só escritas nesses meses mudam a versão, então um mês fechado
+    não é invalidado pelas vendas do dia.
+    """
+    keys = [seller_month_version_key(seller_id, day) for day in days]
+    versions = get_versions([GLOBAL_VERSION_KEY, *dict.fromkeys(keys)])
+    return [f"{versions[GLOBAL_VERSION_KEY]}.{versions[key]}" for key in keys]
+
+
+def get_users_cache_version() -> str:
+    """Versão global + usuários, para caches que não dependem de vendas."""
+    versions = get_versions([GLOBAL_VERSION_KEY, USERS_VERSION_KEY])
+    return f"{versions[GLOBAL_VERSION_KEY]}.{versions[USERS_VERSION_KEY]}"
+
+
+def _bump(keys):
+    with transaction.atomic(savepoint=False):
+        CacheVersion.objects.bulk_create([CacheVersion(key=key) for key in keys], ignore_conflicts=True)
+        CacheVersion.objects.filter(key__in=keys).update(version=F('version') + 1, updated_at=timezone.now())
+    # Este processo passa a ler a versão nova imediatamente.
+    cache.delete_many([local_version_key(key) for key in keys])
+    clear_request_memo()
+
+
+def _flush_pending_versions(connection):
+    keys = connection.pending_cache_versions
+    connection.pending_cache_versions = set()
+    if keys:
+        _bump(keys)
+
+
+def bump_cache_versions(seller_ids=(), everything: bool = False, users: bool = False, seller_months=()):
+    """
+    Invalida o cache dos vendedores informados (ou de todos, com everything=True;
+    ou do diretório de vendedores, com users=True). `seller_months` são pares
+    (vendedor, dia) cujo mês também é invalidado (get_seller_month_versions).
+
+    As chaves de toda a transação são acumuladas e incrementadas uma única
+    vez, após o commit (na hora, fora de transação): uma escrita curta em
+    CacheVersion por transação, em vez de disputar o lock do SQLite a cada
+    chamada. Quem calcular antes do commit grava na versão antiga, que deixa
+    de ser lida em seguida.
+    """
+    keys = {seller_version_key(seller_id) for seller_id in seller_ids if seller_id}
+    if keys:
+        keys.add(ANY_SELLER_VERSION_KEY)
+    keys |= {seller_month_version_key(seller_id, day) for seller_id, day in seller_months if seller_id and day}
+    if everything:
+        keys.add(GLOBAL_VERSION_KEY)
+    if users:
+        keys.add(USERS_VERSION_KEY)
+    if not keys:
+        return
+
+    # A própria requisição não pode reaproveitar leituras anteriores à escrita.
+    clear_request_memo()
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'pending_cache_versions', None)
+    if pending is None:
+        pending = connection.pending_cache_versions = set()
+    pending |= keys
+    # Um callback por chamada: se um savepoint for desfeito, os outros ainda
+    # descarregam o conjunto; o primeiro a rodar leva todas as chaves.
+    transaction.on_commit(lambda: _flush_pending_versions(connection))
+
+
+def lock_directory() -> Path:
+    return Path(getattr(settings, 'CACHE_LOCK_DIR', Path(tempfile.gettempdir()) / 'bibipay-locks'))
+
+
+def acquire_lock(key: str):
+    """
+    Lock de recálculo de `key` sem esperar: um handle, ou None se outro
+    processo (ou thread) já o tem. Usa flock em um arquivo por chave, que
+    vale para todos os workers da máquina e é liberado pelo sistema se o
+    processo morrer. Sem fcntl (Windows), cai no cache.add(), que é só
+    best-effort: no FileBasedCache ele não é atômico entre processos.
+    """
+    if fcntl is None:
+        return key if cache.add(f'lock:{key}', 1, LOCK_TIMEOUT) else None
+
+    directory = lock_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / hashlib.sha1(key.encode()).hexdigest()
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # O dono anterior pode ter apagado o arquivo entre o open e o flock.
+        if os.fstat(fd).st_ino != os.stat(path).st_ino:
+            raise BlockingIOError
+    except (BlockingIOError, FileNotFoundError):
+        os.close(fd)
+        return None
+    return (fd, path)
+
+
+def release_lock(handle):
+    if fcntl is None:
+        cache.delete(f'lock:{handle}')
+        return
+    fd, path = handle
+    # Apaga antes de soltar, para não acumular um arquivo por chave.
+    path.unlink(missing_ok=True)
+    os.close(fd)
+
+
+def get_or_compute(key: str, compute, timeout: int):
+    """
+    Valor em cache de `key` ou o resultado de compute(), gravado por `timeout`
+    segundos. Só quem pega o lock da chave (acquire_lock) recalcula; o lock
+    vale para todos os workers da máquina.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, refresh_at = entry
+        if refresh_at > time.time():
+            return value
+        lock = acquire_lock(key)
+        if lock is None:
+            # Vencido, mas já sendo recalculado por outro processo.
+            return value
+        return _compute_and_store(key, compute, timeout, lock)
+
+    lock = acquire_lock(key)
+    if lock is not None:
+        # Outro processo pode ter gravado entre o get e o lock.
+        entry = cache.get(key)
+        if entry is not None:
+            release_lock(lock)
+            return entry[0]
+        return _compute_and_store(key, compute, timeout, lock)
+
+    # Outro processo está calculando esta chave: espera o resultado dele.
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return _compute_and_store(key, compute, timeout, None)
+
+
+def _compute_and_store(key, compute, timeout, lock):
+    try:
+        value = compute()
+        cache.set(key, (value, time.time() + timeout), timeout + STALE_GRACE)
+        return value
+    finally:
+        if lock is not None:
+            release_lock(lock)
@@ -0,0 +1,26 @@
+"""
+Perfil de conexão do SQLite.
+
+Cada conexão nova recebe os PRAGMAs de settings.SQLITE_PRAGMAS (WAL,
+synchronous, busy_timeout, mmap e cache). Os PRAGMAs valem por conexão,
+por isso são aplicados no sinal connection_created, registrado em
+CoreConfig.ready().
+"""
+
+from django.conf import settings
+
+
+def get_sqlite_pragmas() -> dict:
+    return getattr(settings, 'SQLITE_PRAGMAS', {})
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Aplica os PRAGMAs configurados em uma conexão SQLite recém-aberta."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = get_sqlite_pragmas()
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -19,3 +19,15 @@ def redirect_by_user_type(view_func):
 
         return view_func(request, *args, **kwargs)
     return wrapper
+
+
+def query_budget(max_queries):
+    """
+    Declara o número máximo de queries da view (ver apps.core.middleware):
+    um número ou um dict por método HTTP ({'GET': 5}).
+    Em class-based views, basta o atributo `query_budget` na classe.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.startup import check_startup_budget
+
+SLOWEST_MODULES = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Roda django.setup() sob -X importtime e falha se algum módulo proibido "
+        "(GUI ou pesado) for importado ou se o setup passar do orçamento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=int, help="Orçamento em ms (padrão: settings.STARTUP_BUDGET_MS).")
+        parser.add_argument('--json', action='store_true', help="Imprime a medição em JSON.")
+
+    def handle(self, *args, **options):
+        report, errors = check_startup_budget(options['budget_ms'])
+        slowest = sorted(report['modules'].items(), key=lambda item: item[1], reverse=True)[:SLOWEST_MODULES]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'setup_ms': round(report['setup_ms'], 1),
+                'forbidden': report['forbidden'],
+                'slowest': [{'module': module, 'cumulative_ms': us / 1000} for module, us in slowest],
+                'errors': errors,
+            }, indent=2, ensure_ascii=False))
+        else:
+            self.stdout.write(f"django.setup(): {report['setup_ms']:.0f} ms, {len(report['modules'])} módulos.")
+            for module, us in slowest:
+                self.stdout.write(f"  {us / 1000:8.1f} ms  {module}")
+
+        if errors:
+            raise CommandError("\n".join(errors))
+        self.stdout.write(self.style.SUCCESS("Inicialização dentro do orçamento."))
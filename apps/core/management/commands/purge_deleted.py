@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.models import SoftDeleteManager
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def soft_delete_models():
+    """Modelos cujo manager padrão esconde as linhas excluídas."""
+    return [model for model in apps.get_models() if isinstance(model._default_manager, SoftDeleteManager)]
+
+
+def purge_model(model, before, batch_size: int) -> int:
+    """
+    Remove fisicamente, em lotes de `batch_size`, as linhas excluídas antes de
+    `before` que o modelo permite remover (purgeable: nada de lotes de
+    pagamento). Cada lote é uma transação curta, para não segurar o lock de
+    escrita do SQLite enquanto as vendas continuam chegando.
+    """
+    purged = 0
+    tombstones = model.all_objects.purgeable(before).order_by('pk')
+    while True:
+        ids = list(tombstones.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return purged
+        with transaction.atomic():
+            # A cascata só alcança linhas já excluídas (a comissão da venda).
+            model.all_objects.filter(pk__in=ids).delete()
+        purged += len(ids)
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove do banco as linhas excluídas logicamente (is_deleted) há mais de "
+        "N dias, em lotes. Comissões de lotes de pagamento são mantidas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Idade mínima da exclusão, em dias (padrão: 30).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Linhas por lote.")
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError("Use --days >= 0 e --batch-size >= 1.")
+
+        before = timezone.now() - timedelta(days=options['days'])
+        for model in soft_delete_models():
+            purged = purge_model(model, before, options['batch_size'])
+            self.stdout.write(f"{model._meta.label}: {purged} linha(s) removida(s).")
+
+        self.stdout.write(self.style.SUCCESS(f"Exclusões anteriores a {before:%d/%m/%Y %H:%M} removidas."))
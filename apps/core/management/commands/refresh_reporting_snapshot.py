@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from apps.core.cache import bump_cache_versions
+from apps.core.routers import get_reporting_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia o banco default para o snapshot SQLite de relatórios com a API de "
+        "backup do SQLite. Rode periodicamente (cron) quando não houver réplica."
+    )
+
+    def handle(self, *args, **options):
+        alias = get_reporting_alias()
+        if alias is None:
+            raise CommandError("Banco de relatórios não configurado (defina REPORTING_DB_NAME).")
+        source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+            raise CommandError("O snapshot só se aplica ao SQLite; réplicas são atualizadas pelo próprio banco.")
+
+        start = time.perf_counter()
+        source.ensure_connection()
+        target.ensure_connection()
+        # Cópia em um passo: com WAL no default, a leitura não bloqueia as vendas,
+        # e quem lê o snapshot vê a versão antiga até o backup terminar.
+        source.connection.backup(target.connection)
+        # Descarta o que foi calculado a partir do snapshot anterior.
+        bump_cache_versions(everything=True)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(self.style.SUCCESS(f"Snapshot de relatórios atualizado em {elapsed:.0f} ms."))
@@ -0,0 +1,76 @@
+import json
+import re
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.accounts.models import User
+from apps.core.benchmark import benchmark_sellers, benchmark_urls, seed_benchmark_data
+from apps.core.memo import get_memo_stats, reset_memo_stats
+
+
+def parse_sizes(value):
+    """Converte '10x30,50x90' em [(10, 30), (50, 90)] (vendedores × dias)."""
+    sizes = []
+    for size in value.split(','):
+        match = re.fullmatch(r'\s*(\d+)x(\d+)\s*', size)
+        if not match or int(match[1]) < 1 or int(match[2]) < 1:
+            raise CommandError(f"Tamanho inválido: {size!r} (use VENDEDORESxDIAS, ex.: 50x90).")
+        sizes.append((int(match[1]), int(match[2])))
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede p50/p95 e queries de todas as URLs do projeto em um banco de teste "
+        "isolado, para cada tamanho de massa de dados. Resultado em JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=parse_sizes, default=parse_sizes('10x30,50x90'),
+                            help="Tamanhos da massa, VENDEDORESxDIAS separados por vírgula. Padrão: 10x30,50x90.")
+        parser.add_argument('--repeat', type=int, default=20, help="Requisições por URL e perfil.")
+        parser.add_argument('--paid-ratio', type=float, default=0.7)
+        parser.add_argument('--output', help="Arquivo de saída (padrão: stdout).")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat deve ser maior que zero.")
+
+        # Banco de teste próprio: o benchmark apaga e recria a massa a cada tamanho.
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        report = {'repeat': options['repeat'], 'sizes': []}
+        try:
+            for sellers, days in options['sizes']:
+                call_command('flush', interactive=False, verbosity=0)
+                admin = User.objects.create_user(
+                    email='admin@example.com', cpf='00000000000', password='admin',
+                    first_name='Admin', user_type='admin', is_staff=True,
+                )
+                counts = seed_benchmark_data(sellers, days, paid_ratio=options['paid_ratio'])
+                seller = benchmark_sellers().order_by('pk').first()
+
+                self.stderr.write(f"{sellers}x{days}: {counts['sales']} vendas, medindo URLs...")
+                reset_memo_stats()
+                report['sizes'].append({
+                    'sellers': sellers,
+                    'days': days,
+                    **counts,
+                    'results': benchmark_urls(admin, seller, repeat=options['repeat']),
+                    'memo': get_memo_stats(),
+                })
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {options['output']}."))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,36 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.core.benchmark import benchmark_concurrent_sales, sqlite_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a vazão de criação de vendas com várias threads escrevendo ao mesmo "
+        "tempo, com os padrões do Django e com o perfil de produção do SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--sales-per-thread', type=int, default=50)
+        parser.add_argument('--readers', type=int, default=4, help="Threads lendo os totais durante as escritas.")
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("O benchmark de escrita só se aplica ao SQLite.")
+
+        report = {key: options[key] for key in ('threads', 'sales_per_thread', 'readers')}
+        # Bancos descartáveis: o banco configurado nunca é tocado.
+        with tempfile.TemporaryDirectory() as directory:
+            for profile, production in (('padrao', False), ('producao', True)):
+                self.stderr.write(f"Perfil {profile}...")
+                with sqlite_profile(Path(directory) / f'{profile}.sqlite3', production):
+                    report[profile] = benchmark_concurrent_sales(
+                        options['threads'], options['sales_per_thread'], options['readers'],
+                    )
+
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.benchmark import BENCHMARK_PASSWORD, seed_benchmark_data
+from apps.core.utils import parse_date_argument
+
+
+class Command(BaseCommand):
+    help = "Gera N vendedores × M dias de vendas com comissões (pagas e pendentes) para benchmark."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sellers', type=int, default=50, help="Quantidade de vendedores.")
+        parser.add_argument('--days', type=int, default=90, help="Quantidade de dias de vendas.")
+        parser.add_argument('--paid-ratio', type=float, default=0.7,
+                            help="Fração dos dias (os mais antigos) com comissão paga. Padrão: 0.7.")
+        parser.add_argument('--end', type=parse_date_argument, help="Último dia das vendas (AAAA-MM-DD). Padrão: hoje.")
+        parser.add_argument('--seed', type=int, default=0, help="Semente do gerador aleatório.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['sellers'] < 1 or options['days'] < 1:
+            raise CommandError("--sellers e --days devem ser maiores que zero.")
+        if not 0 <= options['paid_ratio'] <= 1:
+            raise CommandError("--paid-ratio deve estar entre 0 e 1.")
+
+        counts = seed_benchmark_data(
+            sellers=options['sellers'],
+            days=options['days'],
+            paid_ratio=options['paid_ratio'],
+            end_date=options['end'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['sellers']} vendedores, {counts['sales']} vendas "
+            f"({counts['paid']} comissões pagas em {counts['batches']} lotes, {counts['unpaid']} pendentes). "
+            f"Senha dos vendedores: {BENCHMARK_PASSWORD}"
+        ))
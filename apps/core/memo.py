@@ -0,0 +1,122 @@
+"""
+Memoização por requisição das funções de leitura dos serviços.
+
+Dentro de uma requisição (RequestMemoMiddleware), chamadas repetidas de
+uma função decorada com @request_memoize e com os mesmos argumentos
+devolvem o mesmo resultado sem ir ao banco de novo. A memória é descartada
+no fim da requisição e sempre que alguma escrita invalida o cache
+(apps.core.cache.bump_cache_versions). Fora de uma requisição, as funções
+rodam normalmente.
+
+O retorno é compartilhado entre as chamadas: quem recebe não deve alterá-lo.
+"""
+
+import functools
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_request_memo = ContextVar('request_memo', default=None)
+
+# Contadores do processo, por função: hits, misses e chamadas sem memo
+# (fora de requisição ou com argumentos que não servem de chave).
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+class RequestMemo:
+    def __init__(self):
+        self.values = {}
+        self.stats = defaultdict(Counter)
+
+    def record(self, name: str, outcome: str):
+        self.stats[name][outcome] += 1
+        with _stats_lock:
+            _stats[name][outcome] += 1
+
+
+@contextmanager
+def request_memo_scope():
+    """Ativa a memoização no bloco e devolve o RequestMemo (com as estatísticas)."""
+    memo = RequestMemo()
+    token = _request_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _request_memo.reset(token)
+
+
+def clear_request_memo():
+    """Esquece os resultados memoizados na requisição atual (após escritas)."""
+    memo = _request_memo.get()
+    if memo is not None:
+        memo.values.clear()
+
+
+def make_key(args, kwargs):
+    """Chave a partir dos argumentos; listas e conjuntos viram tuplas/frozensets."""
+    def freeze(value):
+        if isinstance(value, (list, tuple)):
+            return tuple(freeze(item) for item in value)
+        if isinstance(value, (set, frozenset)):
+            return frozenset(freeze(item) for item in value)
+        return value
+
+    key = (freeze(args), tuple(sorted((name, freeze(value)) for name, value in kwargs.items())))
+    hash(key)  # TypeError se algum argumento não for hashable
+    return key
+
+
+def request_memoize(func):
+    """Memoiza `func` durante a requisição, pela combinação dos argumentos."""
+    name = f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        memo = _request_memo.get()
+        if memo is None:
+            with _stats_lock:
+                _stats[name]['bypass'] += 1
+            return func(*args, **kwargs)
+
+        try:
+            key = (name, make_key(args, kwargs))
+        except TypeError:
+            memo.record(name, 'bypass')
+            return func(*args, **kwargs)
+
+        if key in memo.values:
+            memo.record(name, 'hits')
+            return memo.values[key]
+
+        memo.record(name, 'misses')
+        value = memo.values[key] = func(*args, **kwargs)
+        return value
+
+    return wrapper
+
+
+def summarize(stats) -> dict:
+    """{função: {hits, misses, bypass, hit_rate}} a partir dos contadores."""
+    summary = {}
+    for name, counter in sorted(stats.items()):
+        memoized = counter['hits'] + counter['misses']
+        summary[name] = {
+            'hits': counter['hits'],
+            'misses': counter['misses'],
+            'bypass': counter['bypass'],
+            'hit_rate': round(counter['hits'] / memoized, 3) if memoized else None,
+        }
+    return summary
+
+
+def get_memo_stats() -> dict:
+    """Taxa de acerto de cada função memoizada desde o início do processo."""
+    with _stats_lock:
+        return summarize(_stats)
+
+
+def reset_memo_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,173 @@
+"""
+Instrumentação de queries por requisição.
+
+Conta as queries, soma o tempo de banco e guarda as mais lentas de cada
+requisição. O resultado vai para o cabeçalho da resposta e para uma linha
+de log estruturada (logger 'apps.core.queries').
+
+Views podem declarar um orçamento de queries (atributo `query_budget` na
+classe ou o decorador apps.core.decorators.query_budget). Quando o
+orçamento é estourado, a requisição falha se QUERY_BUDGET_STRICT estiver
+ligado (testes) ou gera um warning no log (produção).
+
+ReportingPinMiddleware garante leitura-após-escrita com o banco de
+relatórios (apps.core.routers): depois de uma escrita de dados
+(apps.core.mixins.mark_data_written), o usuário lê do default por
+alguns minutos.
+
+RequestMemoMiddleware delimita a memoização das funções de serviço
+(apps.core.memo) a cada requisição; os acertos entram na linha de log.
+"""
+
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from apps.core.memo import request_memo_scope, summarize
+from apps.core.mixins import pin_to_default_database
+from apps.core.routers import get_reporting_alias
+
+logger = logging.getLogger('apps.core.queries')
+
+SLOWEST_STATEMENTS = 3
+SQL_PREVIEW_LENGTH = 300
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view executou mais queries do que o orçamento declarado."""
+
+
+class QueryStats:
+    """execute_wrapper que mede cada query executada durante a requisição."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []  # (duração, sql), das mais lentas para as mais rápidas
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            self.slowest.append((elapsed, sql))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOWEST_STATEMENTS:]
+
+    def as_dict(self) -> dict:
+        return {
+            'queries': self.count,
+            'db_ms': round(self.duration * 1000, 2),
+            'slowest': [
+                {'ms': round(elapsed * 1000, 2), 'sql': sql[:SQL_PREVIEW_LENGTH]}
+                for elapsed, sql in self.slowest
+            ],
+        }
+
+
+def get_query_budget(view_func, method: str):
+    """
+    Orçamento declarado na view (função decorada ou atributo da classe):
+    um número para todos os métodos ou um dict por método ({'GET': 5}).
+    """
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view_func, 'view_class', None), 'query_budget', None)
+    if isinstance(budget, dict):
+        budget = budget.get(method)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request.query_budget = None
+        request.query_view = None
+        request.memo_stats = None
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            response = self.get_response(request)
+
+        # Respostas em streaming executam queries depois daqui; só a parte
+        # anterior ao primeiro byte entra na conta.
+        response['X-DB-Queries'] = str(stats.count)
+        response['Server-Timing'] = f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': request.query_view,
+            'budget': request.query_budget,
+            **stats.as_dict(),
+        }
+        if request.memo_stats:
+            record['memo'] = summarize(request.memo_stats)
+        logger.info(json.dumps(record, ensure_ascii=False))
+
+        budget = request.query_budget
+        if budget is not None and stats.count > budget:
+            message = f"{request.query_view} executou {stats.count} queries (orçamento: {budget})."
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra={'query_stats': record})
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func, request.method)
+        view_class = getattr(view_func, 'view_class', None)
+        request.query_view = (view_class or view_func).__qualname__
+        return None
+
+
+# ==========================
+# MEMOIZAÇÃO POR REQUISIÇÃO
+# ==========================
+class RequestMemoMiddleware:
+    """Ativa @request_memoize durante a requisição e descarta tudo no fim."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_memo_scope() as memo:
+            request.memo_stats = memo.stats
+            return self.get_response(request)
+
+
+# ==========================
+# LEITURA APÓS ESCRITA (BANCO DE RELATÓRIOS)
+# ==========================
+class ReportingPinMiddleware:
+    """
+    Fixa no default as leituras de relatório de quem acabou de gravar algo.
+    Só as views que gravam dados marcam a requisição (mark_data_written);
+    um POST qualquer, como o do login, não fixa o usuário.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            getattr(request, 'wrote_data', False)
+            and response.status_code < 400
+            and get_reporting_alias() is not None
+            and request.user.is_authenticated
+        ):
+            pin_to_default_database(request)
+        return response
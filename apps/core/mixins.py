@@ -0,0 +1,128 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from apps.core.routers import get_reporting_alias, use_reporting_database
+
+# Chave de sessão com o instante até o qual o usuário lê só do default.
+REPORTING_PIN_SESSION_KEY = 'reporting_pinned_until'
+
+
+def pin_to_default_database(request):
+    """
+    Faz as próximas leituras de relatório do usuário irem para o default por
+    REPORTING_PIN_SECONDS, para ele ver o que acabou de gravar mesmo que a
+    réplica/snapshot ainda não tenha recebido a escrita.
+    """
+    seconds = getattr(settings, 'REPORTING_PIN_SECONDS', 300)
+    request.session[REPORTING_PIN_SESSION_KEY] = time.time() + seconds
+
+
+def is_pinned_to_default(request) -> bool:
+    return request.session.get(REPORTING_PIN_SESSION_KEY, 0) > time.time()
+
+
+def mark_data_written(request):
+    """
+    Sinaliza que a requisição gravou dados de relatório (vendas, comissões,
+    vendedores): ao final dela, ReportingPinMiddleware fixa o usuário no
+    default. Login, logout e formulários inválidos não marcam nada.
+    """
+    request.wrote_data = True
+
+
+class DataWriteMixin:
+    """Para views de edição genéricas: marca a escrita quando o formulário é válido."""
+
+    def form_valid(self, form):
+        mark_data_written(self.request)
+        return super().form_valid(form)
+
+
+class ReportingDatabaseMixin:
+    """
+    Lê os dados da view (GET/HEAD) do banco de relatórios configurado em
+    REPORTING_DATABASE_ALIAS. Continua no default se o alias não existir,
+    em requisições de escrita e logo depois de o usuário gravar algo.
+    """
+
+    def use_reporting_database(self, request) -> bool:
+        return (
+            request.method in ('GET', 'HEAD')
+            and get_reporting_alias() is not None
+            and not is_pinned_to_default(request)
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.use_reporting_database(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        # Sessão e usuário são carregados do default, antes do desvio.
+        request.user.is_authenticated
+        with use_reporting_database():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+        if response.streaming:
+            response.streaming_content = self.stream_from_reporting(response.streaming_content)
+        return response
+
+    @staticmethod
+    def stream_from_reporting(content):
+        # O CSV é gerado durante o envio, depois do dispatch: reentra no desvio.
+        with use_reporting_database():
+            yield from content
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional (ETag/Last-Modified) para telas de um usuário.
+
+    A view implementa get_validator(), uma consulta barata que retorna
+    (última alteração, quantidade). Se o navegador já tem a versão atual,
+    a resposta é 304 sem chamar os serviços nem renderizar o template.
+    """
+
+    def get_validator(self):
+        raise NotImplementedError
+
+    def get_etag(self, last_modified, count) -> str:
+        request = self.request
+        parts = [
+            type(self).__name__,
+            request.user.pk,
+            request.user.updated_at.isoformat(),
+            request.get_full_path(),
+            timezone.localdate().isoformat(),  # cards de hoje/ontem e filtros padrão
+            request.session.session_key,  # troca no login, junto com o token CSRF da página
+            last_modified.isoformat() if last_modified else '',
+            count,
+        ]
+        digest = hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+        return f'"{digest}"'
+
+    def get(self, request, *args, **kwargs):
+        # Mensagens pendentes precisam ser exibidas: não há como usar o cache.
+        if len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
+
+        last_modified, count = self.get_validator()
+        etag = self.get_etag(last_modified, count)
+        timestamp = None
+        if last_modified:
+            timestamp = max(last_modified, request.user.updated_at).timestamp()
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+        # A página é do usuário logado: só o navegador pode guardar.
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -1,4 +1,36 @@
 from django.db import models
+from django.utils import timezone
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    """QuerySet dos modelos com exclusão lógica (is_deleted/deleted_at)."""
+
+    def soft_delete(self) -> int:
+        """Marca as linhas como excluídas com um único UPDATE, sem sinais nem cascata."""
+        now = timezone.now()
+        return self.update(is_deleted=True, deleted_at=now, updated_at=now)
+
+    def deleted_before(self, moment):
+        """Linhas excluídas antes de `moment` (candidatas à remoção física)."""
+        return self.filter(is_deleted=True, deleted_at__lt=moment)
+
+    def purgeable(self, moment):
+        """
+        Linhas que o purge_deleted pode remover fisicamente. Os modelos
+        sobrescrevem para preservar o que ainda é histórico.
+        """
+        return self.deleted_before(moment)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """
+    Manager padrão dos modelos com exclusão lógica: esconde as linhas
+    excluídas. O manager `all_objects` de cada modelo enxerga todas.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
 
 class BaseModel(models.Model):
     """Abstract base model with common fields."""
@@ -11,3 +43,26 @@ class BaseModel(models.Model):
     class Meta:
         abstract = True
 
+
+
+class CacheVersion(models.Model):
+    """
+    Contador de versão de um grupo de entradas de cache ('global', 'users',
+    'sellers' ou 'seller:<id>'), usado como namespace nas chaves.
+
+    Fica no banco para que todos os workers (e máquinas) enxerguem a mesma
+    versão; cada processo guarda a leitura por alguns segundos (ver
+    apps.core.cache).
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Versão de cache"
+        verbose_name_plural = "Versões de cache"
+        ordering = ['key']
+
+    def __str__(self):
+        return f"{self.key}: v{self.version}"
@@ -0,0 +1,58 @@
+"""
+Roteamento de leituras para o banco de relatórios.
+
+Views de relatório (dashboard do admin, histórico e exportações) leem do
+alias `reporting` — uma réplica ou um snapshot SQLite atualizado pelo
+comando `refresh_reporting_snapshot` —, para que o fechamento do mês não
+dispute o banco com o lançamento de vendas. Só lê do alias quem entra em
+use_reporting_database() (ReportingDatabaseMixin); escritas e todas as
+demais leituras continuam no `default`.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_reporting_reads = ContextVar('reporting_reads', default=False)
+
+# Sessões e versões de cache nunca vêm do snapshot: uma sessão criada depois
+# dele não existiria lá, e versões antigas serviriam cache desatualizado.
+DEFAULT_ONLY_APPS = {'sessions', 'core'}
+
+
+def get_reporting_alias():
+    """Alias de relatórios, ou None se não estiver configurado em DATABASES."""
+    alias = getattr(settings, 'REPORTING_DATABASE_ALIAS', 'reporting')
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def use_reporting_database():
+    """Envia as leituras do bloco para o banco de relatórios (se configurado)."""
+    token = _reporting_reads.set(True)
+    try:
+        yield
+    finally:
+        _reporting_reads.reset(token)
+
+
+class ReportingRouter:
+    def db_for_read(self, model, **hints):
+        if not _reporting_reads.get() or model._meta.app_label in DEFAULT_ONLY_APPS:
+            return None
+        return get_reporting_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Os dois bancos têm os mesmos dados (réplica/snapshot do default).
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # O esquema do banco de relatórios vem do default (replicação ou cópia).
+        if db == get_reporting_alias():
+            return False
+        return None
@@ -0,0 +1,90 @@
+"""
+Orçamento de inicialização do processo.
+
+Roda `django.setup()` em um subprocesso com `python -X importtime` e
+verifica se algum módulo proibido (GUI ou pesado demais para um worker
+web) foi importado e se o setup ficou dentro do tempo limite. Usado pelo
+comando `check_startup` e pelos testes do app core.
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Pacotes que nunca devem ser carregados na inicialização dos workers:
+# interfaces gráficas (quebram em containers sem Tk) e bibliotecas pesadas
+# que nenhum app do projeto usa.
+FORBIDDEN_MODULES = (
+    'tkinter', '_tkinter', 'turtle', 'turtledemo', 'idlelib',
+    'matplotlib', 'pandas', 'numpy', 'IPython',
+)
+DEFAULT_STARTUP_BUDGET_MS = 2000
+
+# "import time:       265 |     113195 |         django.core.serializers.json"
+IMPORTTIME_LINE = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)$')
+
+SETUP_SCRIPT = (
+    "import time; start = time.perf_counter(); "
+    "import django; django.setup(); "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """Tempo cumulativo (µs) de cada módulo importado, a partir da saída do -X importtime."""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match[4]] = int(match[2])
+    return modules
+
+
+def is_forbidden(module: str) -> bool:
+    return module.split('.')[0] in FORBIDDEN_MODULES
+
+
+def measure_startup(settings_module=None) -> dict:
+    """
+    Mede o `django.setup()` em um interpretador novo.
+
+    Returns:
+        dict: setup_ms (tempo de parede do setup), modules (módulo -> µs
+        cumulativos) e forbidden (módulos proibidos que foram importados).
+    """
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = settings_module or os.environ.get(
+        'DJANGO_SETTINGS_MODULE', 'config.settings'
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SETUP_SCRIPT],
+        capture_output=True, text=True, env=env, cwd=settings.BASE_DIR, check=True,
+    )
+    modules = parse_importtime(result.stderr)
+    return {
+        'setup_ms': float(result.stdout.strip().splitlines()[-1]),
+        'modules': modules,
+        'forbidden': sorted(module for module in modules if is_forbidden(module)),
+    }
+
+
+def startup_budget_ms() -> int:
+    return getattr(settings, 'STARTUP_BUDGET_MS', DEFAULT_STARTUP_BUDGET_MS)
+
+
+def check_startup_budget(budget_ms=None) -> tuple[dict, list[str]]:
+    """
+    Mede a inicialização e lista as violações do orçamento.
+
+    Returns:
+        tuple: (medição de measure_startup(), lista de mensagens de erro).
+    """
+    budget_ms = budget_ms or startup_budget_ms()
+    report = measure_startup()
+    errors = [f"Módulo proibido importado na inicialização: {module}" for module in report['forbidden']]
+    if report['setup_ms'] > budget_ms:
+        errors.append(f"django.setup() levou {report['setup_ms']:.0f} ms (orçamento: {budget_ms} ms).")
+    return report, errors
@@ -1,5 +1,429 @@
-from django.test import TestCase
+import json
+import multiprocessing
+import re
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.accounts.models import User
+from apps.accounts.services import get_seller_directory
+from apps.commissions import services as commission_services
+from apps.commissions.models import Commission, PayoutBatch
+from apps.core.benchmark import benchmark_sellers, benchmark_urls, seed_benchmark_data
+from apps.core.cache import acquire_lock, get_cache_version, get_or_compute, release_lock
+from apps.core.management.commands.run_benchmark import parse_sizes
+from apps.core.memo import get_memo_stats, request_memo_scope, reset_memo_stats
+from apps.core.middleware import QueryBudgetExceeded
+from apps.core.mixins import ReportingDatabaseMixin
+from apps.core.models import CacheVersion
+from apps.core.routers import ReportingRouter, use_reporting_database
+from apps.core.startup import is_forbidden, measure_startup, parse_importtime
+from apps.dashboard.views.admin import AdminDashboardView
+from apps.sales import services as sales_services
+from apps.sales.models import Sale
+
 
 class CoreTests(TestCase):
     def test_placeholder(self):
         self.assertTrue(True)  # Placeholder test to ensure tests run correctly 
+
+
+# Linha do EXPLAIN QUERY PLAN de varredura completa da tabela ("SCAN tabela",
+# sem "USING INDEX"/"USING COVERING INDEX").
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+class QueryPlanTests(TestCase):
+    """
+    Roda EXPLAIN QUERY PLAN em cada SELECT feito pelas funções de serviço
+    de comissões e vendas e falha se alguma varrer uma tabela inteira.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='plano@example.com', cpf='90000000000', password='senha-forte-123',
+            first_name='Plano', commission_rate=Decimal('5.00'),
+        )
+        for day in range(1, 6):
+            Sale.objects.create(seller=cls.seller, date=date(2025, 6, day), total_amount=Decimal('100.00'))
+        cls.batch, _ = commission_services.create_payout_batch([cls.seller.id], 'plano')
+        for day in range(6, 9):
+            Sale.objects.create(seller=cls.seller, date=date(2025, 6, day), total_amount=Decimal('100.00'))
+
+    def assertNoFullScans(self, name, call):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            result = call()
+            if hasattr(result, '__iter__') and not isinstance(result, (dict, str)):
+                list(result)
+
+        selects = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects, f"{name} não executou nenhum SELECT")
+        for sql in selects:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[3] for row in cursor.fetchall()]
+            scans = [line for line in plan if FULL_SCAN.match(line)]
+            with self.subTest(name):
+                self.assertFalse(scans, f"{name}: varredura completa em {scans}\n{sql}")
+
+    def test_commission_services_use_indexes(self):
+        seller_id = self.seller.id
+        calls = {
+            'get_total_commission_value': lambda: commission_services.get_total_commission_value(seller_id),
+            'get_commission_totals_for_cards': commission_services.get_commission_totals_for_cards,
+            'get_commissions_ready_for_payment': commission_services.get_commissions_ready_for_payment,
+            'get_commissions_ready_for_payment(seller)':
+                lambda: commission_services.get_commissions_ready_for_payment([seller_id]),
+            'get_paid_commissions_history': commission_services.get_paid_commissions_history,
+            'get_paid_commissions_history(filtros)':
+                lambda: commission_services.get_paid_commissions_history(seller_id, '2025-06-01', '2025-06-30'),
+            'get_paid_commissions_totals': commission_services.get_paid_commissions_totals,
+            'get_paid_commissions_summary_page': commission_services.get_paid_commissions_summary_page,
+            'iter_paid_commissions_rows': commission_services.iter_paid_commissions_rows,
+            'recalculate_seller_commissions':
+                lambda: commission_services.recalculate_seller_commissions(seller_id, dry_run=True),
+            'get_payout_batch_summary': lambda: commission_services.get_payout_batch_summary(self.batch),
+            'iter_payout_batch_details': lambda: commission_services.iter_payout_batch_details(self.batch),
+            'get_recent_payout_batches': commission_services.get_recent_payout_batches,
+        }
+        for name, call in calls.items():
+            self.assertNoFullScans(name, call)
+
+    def test_sales_services_use_indexes(self):
+        seller_id = self.seller.id
+        calls = {
+            'get_sellers_by_key': lambda: sales_services.get_sellers_by_key([seller_id], 'id'),
+            'get_sales_by_seller': lambda: sales_services.get_sales_by_seller(seller_id, 2025, 6),
+            'get_sales_totals': lambda: sales_services.get_sales_totals(seller_id, 2025, 6),
+            'get_sales_dashboard_stats': lambda: sales_services.get_sales_dashboard_stats(seller_id, 2025, 6),
+            'get_sales_validator(lista)': lambda: sales_services.get_sales_validator(
+                seller_id, sales_services.sales_list_period('2025', '6')
+            ),
+            'get_sales_validator(painel)': lambda: sales_services.get_sales_validator(
+                seller_id, sales_services.seller_dashboard_period(2025, 6)
+            ),
+            'get_total_sales_amount_for_active_sellers': sales_services.get_total_sales_amount_for_active_sellers,
+            'get_total_sales_amount_for_active_sellers(seller)':
+                lambda: sales_services.get_total_sales_amount_for_active_sellers(seller_id),
+            'upsert_sales_batch': lambda: sales_services.upsert_sales_batch(
+                [{'seller': seller_id, 'date': '2025-06-01', 'total_amount': '100.00'}]
+            ),
+        }
+        for use_rollup in (True, False):
+            with override_settings(DASHBOARD_USE_ROLLUP=use_rollup):
+                for name, call in calls.items():
+                    self.assertNoFullScans(f"{name} (rollup={use_rollup})", call)
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='orcamento@example.com', cpf='91000000000', password='senha-forte-123',
+            first_name='Orcamento', user_type='admin',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_response_reports_queries_and_logs_structured_line(self):
+        with self.assertLogs('apps.core.queries', level='INFO') as logs:
+            response = self.client.get(reverse('dashboard:dashboard_admin'))
+
+        self.assertEqual(response['X-DB-Queries'], '6')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['queries'], record['budget'], record['status']), (6, 6, 200))
+        self.assertEqual(record['view'], 'AdminDashboardView')
+        self.assertLessEqual(len(record['slowest']), 3)
+
+    def test_exceeded_budget_raises_in_strict_mode(self):
+        with mock.patch.object(AdminDashboardView, 'query_budget', 2):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "executou 6 queries (orçamento: 2)"), \
+                    self.assertLogs('django.request', level='ERROR'):
+                self.client.get(reverse('dashboard:dashboard_admin'))
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_exceeded_budget_only_warns_outside_tests(self):
+        with mock.patch.object(AdminDashboardView, 'query_budget', 2):
+            with self.assertLogs('apps.core.queries', level='WARNING') as logs:
+                response = self.client.get(reverse('dashboard:dashboard_admin'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("orçamento: 2", logs.records[-1].getMessage())
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = seed_benchmark_data(sellers=3, days=60, paid_ratio=0.5, end_date=date(2025, 6, 30), seed=1)
+        cls.admin = User.objects.create_user(
+            email='bench-admin@example.com', cpf='92000000000', password='senha-forte-123',
+            first_name='Admin', user_type='admin', is_staff=True,
+        )
+
+    def test_seed_creates_paid_and_unpaid_commissions(self):
+        commissions = Commission.objects.filter(seller__in=benchmark_sellers())
+        self.assertEqual(benchmark_sellers().count(), 3)
+        self.assertEqual(commissions.count(), self.counts['sales'])
+        self.assertEqual(commissions.filter(paid=True).count(), self.counts['paid'])
+        self.assertTrue(self.counts['paid'] and self.counts['unpaid'])
+        # Pagas em lotes mensais com os totais preenchidos; contadores consistentes.
+        self.assertEqual(
+            PayoutBatch.objects.aggregate(total=Sum('commission_count'))['total'], self.counts['paid'],
+        )
+        self.assertEqual(commission_services.reconcile_commission_counters(dry_run=True), [])
+
+    def test_benchmark_covers_urls_without_server_errors(self):
+        results = benchmark_urls(self.admin, benchmark_sellers().first(), repeat=2)
+
+        names = {result['name'] for result in results}
+        self.assertIn('dashboard:dashboard_admin', names)
+        self.assertIn('commissions:payout_batch_csv', names)
+        self.assertNotIn('accounts:sellers_deactivate', names)
+        for result in results:
+            with self.subTest(url=result['url'], role=result['role']):
+                self.assertTrue(all(status < 500 for status in result['status']))
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+    def test_parse_sizes_rejects_zero_sizes(self):
+        self.assertEqual(parse_sizes('10x30, 50x90'), [(10, 30), (50, 90)])
+        for value in ('0x30', '00x30', '10x00'):
+            with self.subTest(value=value), self.assertRaises(CommandError):
+                parse_sizes(value)
+
+
+class StartupBudgetTests(SimpleTestCase):
+    def test_parse_importtime_flags_gui_modules(self):
+        modules = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     _tkinter\n"
+            "import time:      2000 |       2120 |   tkinter\n"
+            "import time:       300 |        300 | apps.accounts.models\n"
+        )
+        self.assertEqual(modules, {'_tkinter': 120, 'tkinter': 2120, 'apps.accounts.models': 300})
+        self.assertEqual([module for module in modules if is_forbidden(module)], ['_tkinter', 'tkinter'])
+
+    def test_django_setup_imports_no_forbidden_module(self):
+        # Só os módulos: o tempo depende da máquina e fica com o comando check_startup.
+        report = measure_startup()
+        self.assertEqual(report['forbidden'], [])
+        self.assertIn('apps.commissions.signals', report['modules'])
+
+
+class SQLiteProfileTests(TestCase):
+    def test_connection_uses_production_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class ReportingRouterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='relatorio@example.com', cpf='93000000000', password='senha-forte-123',
+            first_name='Relatorio', user_type='admin', is_staff=True,
+        )
+
+    def test_only_reporting_blocks_read_from_the_alias(self):
+        router = ReportingRouter()
+        self.assertIsNone(router.db_for_read(Sale))  # alias não configurado: default
+
+        with mock.patch.dict(settings.DATABASES, {'reporting': {}}):
+            self.assertIsNone(router.db_for_read(Sale))
+            with use_reporting_database():
+                self.assertEqual(router.db_for_read(Sale), 'reporting')
+                self.assertIsNone(router.db_for_read(Session))
+                self.assertEqual(router.db_for_write(Sale), 'default')
+            self.assertFalse(router.allow_migrate('reporting', 'sales'))
+
+    def test_data_writes_pin_the_user_to_default(self):
+        seller = User.objects.create_user(
+            email='fixado@example.com', cpf='93000000001', password='senha-forte-123',
+            first_name='Fixado', commission_rate=Decimal('5.00'),
+        )
+        view = ReportingDatabaseMixin()
+
+        with mock.patch('apps.core.mixins.get_reporting_alias', return_value='reporting'), \
+                mock.patch('apps.core.middleware.get_reporting_alias', return_value='reporting'):
+            # O POST do login não grava dados: o usuário continua lendo do snapshot.
+            response = self.client.post(reverse('accounts:login'), {
+                'username': 'fixado@example.com', 'password': 'senha-forte-123',
+            })
+            self.assertEqual(response.status_code, 302)
+            request = RequestFactory().get('/')
+            request.session = self.client.session
+            self.assertTrue(view.use_reporting_database(request))
+
+            # Formulário inválido também não.
+            self.client.post(reverse('sales:sales_create'), {'date': '', 'total_amount': ''})
+            request.session = self.client.session
+            self.assertTrue(view.use_reporting_database(request))
+
+            self.client.post(reverse('sales:sales_create'), {'date': '2025-03-10', 'total_amount': '10.00'})
+            self.assertTrue(Sale.objects.filter(seller=seller).exists())
+            request.session = self.client.session
+            self.assertFalse(view.use_reporting_database(request))
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_only_one_thread_recomputes_a_missing_entry(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'valor'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute('chave', compute, 60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['valor'] * 5)
+
+    def test_expired_entry_is_served_while_another_process_recomputes(self):
+        get_or_compute('chave', lambda: 'antigo', 60)
+        with mock.patch('apps.core.cache.time.time', return_value=time.time() + 120):
+            lock = acquire_lock('chave')  # outro processo já está recalculando
+            self.assertEqual(get_or_compute('chave', lambda: 'novo', 60), 'antigo')
+            release_lock(lock)
+            self.assertEqual(get_or_compute('chave', lambda: 'novo', 60), 'novo')
+
+    def test_lock_is_shared_between_processes(self):
+        def try_lock(queue):
+            lock = acquire_lock('chave')
+            queue.put(lock is not None)
+            if lock is not None:
+                release_lock(lock)
+
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        lock = acquire_lock('chave')
+        context.Process(target=try_lock, args=(queue,)).start()
+        self.assertFalse(queue.get(timeout=10))
+
+        release_lock(lock)
+        context.Process(target=try_lock, args=(queue,)).start()
+        self.assertTrue(queue.get(timeout=10))
+
+
+class CacheVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_versions_are_read_once_per_ttl_and_shared_through_the_database(self):
+        with self.assertNumQueries(1):
+            version = get_cache_version(42)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cache_version(42), version)
+
+        # Outro worker incrementa a versão direto no banco.
+        CacheVersion.objects.create(key='seller:42', version=7)
+        self.assertEqual(get_cache_version(42), version)  # ainda dentro do TTL
+        cache.delete('cacheversion:seller:42')  # TTL vencido
+        self.assertNotEqual(get_cache_version(42), version)
+
+    def test_versions_are_bumped_once_per_transaction_after_commit(self):
+        seller = User.objects.create_user(
+            email='versao@example.com', cpf='96000000000', password='senha-forte-123',
+            first_name='Versao', commission_rate=Decimal('5.00'),
+        )
+        version = get_cache_version(seller.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks, transaction.atomic():
+                Sale.objects.create(seller=seller, date=date(2025, 5, 1), total_amount=Decimal('10.00'))
+                self.assertEqual(get_cache_version(seller.pk), version)  # ainda não commitado
+
+        self.assertTrue(callbacks)
+        writes = [q['sql'] for q in queries if 'core_cacheversion' in q['sql'] and not q['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 2)  # INSERT OR IGNORE + UPDATE, uma vez só
+        self.assertNotEqual(get_cache_version(seller.pk), version)
+
+    def test_user_writes_invalidate_the_seller_directory(self):
+        seller = User.objects.create_user(
+            email='diretorio@example.com', cpf='94000000000', password='senha-forte-123',
+            first_name='Diretorio',
+        )
+        self.assertEqual(get_seller_directory(), [seller])
+        with self.assertNumQueries(0):
+            get_seller_directory()
+
+        seller.first_name = 'Renomeado'
+        with self.captureOnCommitCallbacks(execute=True):
+            seller.save()
+        self.assertEqual(get_seller_directory()[0].first_name, 'Renomeado')
+
+
+class RequestMemoTests(TestCase):
+    def setUp(self):
+        reset_memo_stats()
+
+    def test_repeated_calls_hit_the_memo_only_inside_a_request(self):
+        with request_memo_scope() as memo:
+            with self.assertNumQueries(1):
+                first = commission_services.get_commission_totals_for_cards()
+                self.assertIs(commission_services.get_commission_totals_for_cards(), first)
+            with self.assertNumQueries(1):  # lista de IDs também serve de chave
+                commission_services.get_commissions_ready_for_payment([1, 2])
+                commission_services.get_commissions_ready_for_payment([1, 2])
+
+        with self.assertNumQueries(1):  # fora da requisição não há memo
+            commission_services.get_commission_totals_for_cards()
+
+        name = 'apps.commissions.services.get_commission_totals_for_cards'
+        self.assertEqual(memo.stats[name], {'hits': 1, 'misses': 1})
+        self.assertEqual(
+            get_memo_stats()[name], {'hits': 1, 'misses': 1, 'bypass': 1, 'hit_rate': 0.5}
+        )
+
+    def test_writes_discard_the_memo(self):
+        with request_memo_scope():
+            self.assertEqual(commission_services.get_total_commission_value(), Decimal('0.00'))
+            commission_services.apply_counter_deltas(
+                {commission_services.PENDING_COUNTER: (Decimal('10.00'), 1)}
+            )
+            self.assertEqual(commission_services.get_total_commission_value(), Decimal('10.00'))
+
+    def test_middleware_logs_memo_stats(self):
+        admin = User.objects.create_user(
+            email='memo@example.com', cpf='95000000000', password='senha-forte-123',
+            first_name='Memo', user_type='admin',
+        )
+        self.client.force_login(admin)
+        with self.assertLogs('apps.core.queries', level='INFO') as logs:
+            self.client.get(reverse('commissions:commissions_tracking'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            record['memo']['apps.commissions.services.get_commission_totals_for_cards']['misses'], 1
+        )
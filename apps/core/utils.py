@@ -1,3 +1,7 @@
+import csv
+from datetime import datetime
+from django.core.management.base import CommandError
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 
 def redirect_user_by_type(user):
@@ -9,3 +13,39 @@ def redirect_user_by_type(user):
     }
     # Use reverse (não reverse_lazy) aqui, porque estamos no runtime da request
     return reverse(mapping.get(user.user_type, 'default_dashboard'))
+
+
+def parse_date_argument(value):
+    """Converte um argumento de management command no formato AAAA-MM-DD em date."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Data inválida: {value} (use AAAA-MM-DD).")
+
+
+def parse_month_argument(value):
+    """Converte um argumento AAAA-MM no primeiro dia do mês (date)."""
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f"Mês inválido: {value} (use AAAA-MM).")
+
+
+class Echo:
+    """Pseudo-buffer para o csv.writer: devolve a linha em vez de guardá-la."""
+    def write(self, value):
+        return value
+
+
+def stream_csv_response(filename: str, rows) -> StreamingHttpResponse:
+    """
+    Resposta CSV em streaming: as linhas são escritas conforme o iterável
+    é consumido, então a memória fica constante e o primeiro byte sai logo.
+    """
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import SellerDailyRollup
 
-# Register your models here.
+
+@admin.register(SellerDailyRollup)
+class SellerDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('seller', 'date', 'sales_total', 'sales_count', 'commission_total', 'commission_paid_total')
+    list_filter = ('date', 'seller')
+    ordering = ('-date',)
+    readonly_fields = ('seller', 'date', 'sales_total', 'sales_count', 'commission_total', 'commission_paid_total', 'updated_at')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.utils import parse_date_argument
+from apps.dashboard.services import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o consolidado diário (SellerDailyRollup) a partir das vendas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_date_argument, help="Data inicial (AAAA-MM-DD).")
+        parser.add_argument('--end', type=parse_date_argument, help="Data final (AAAA-MM-DD).")
+        parser.add_argument('--seller', type=int, help="ID do vendedor.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = rebuild_rollup(
+                start_date=options['start'],
+                end_date=options['end'],
+                seller_id=options['seller'],
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(f"{written} dias consolidados."))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:37
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Dia consolidado.')),
+                ('sales_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('commission_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('commission_paid_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('seller', models.ForeignKey(help_text='Vendedor consolidado.', on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Consolidado diário',
+                'verbose_name_plural': 'Consolidados diários',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='rollup_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('seller', 'date'), name='unique_rollup_per_seller_per_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rollup(apps, schema_editor):
+    Sale = apps.get_model('sales', 'Sale')
+    SellerDailyRollup = apps.get_model('dashboard', 'SellerDailyRollup')
+
+    rows = (
+        Sale.objects.order_by()
+        .values('seller_id', 'date')
+        .annotate(
+            sales_total=Sum('total_amount'),
+            sales_count=Count('id'),
+            commission_total=Sum('commission__value'),
+            commission_paid_total=Sum('commission__value', filter=Q(commission__paid=True)),
+        )
+    )
+    SellerDailyRollup.objects.bulk_create(
+        [
+            SellerDailyRollup(
+                seller_id=row['seller_id'],
+                date=row['date'],
+                sales_total=row['sales_total'] or 0,
+                sales_count=row['sales_count'],
+                commission_total=row['commission_total'] or 0,
+                commission_paid_total=row['commission_paid_total'] or 0,
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('sales', '0002_alter_sale_date_alter_sale_total_amount'),
+        ('commissions', '0007_alter_commission_paid'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,43 @@
+from decimal import Decimal
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+
+class SellerDailyRollup(models.Model):
+    """
+    Consolidado diário de vendas e comissões por vendedor.
+
+    É uma tabela derivada: mantida pelos sinais de Sale/Commission e
+    reconstruída pelo comando `rebuild_sales_rollup`. Os dashboards leem
+    daqui para não varrer as vendas brutas do período.
+    """
+
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups',
+        help_text="Vendedor consolidado."
+    )
+    date = models.DateField(help_text="Dia consolidado.")
+    sales_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    sales_count = models.PositiveIntegerField(default=0)
+    commission_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    commission_paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Consolidado diário"
+        verbose_name_plural = "Consolidados diários"
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['seller', 'date'],
+                name='unique_rollup_per_seller_per_day'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='rollup_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.seller_id} - {self.date:%d/%m/%Y} - R$ {self.sales_total:.2f}"
@@ -0,0 +1,315 @@
+# apps/dashboard/services.py
+"""
+CAMADA DE SERVIÇO (Service Layer) do app 'dashboard'.
+
+Concentra as métricas do painel administrativo e a manutenção do
+consolidado diário (SellerDailyRollup). Tudo é calculado com agregações
+agrupadas no banco, então o número de queries é constante, independente
+da quantidade de vendedores ou do tamanho do período.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import router
+from django.db.models import Count, Max, Q, Sum
+
+from apps.accounts.services import get_all_sellers
+from apps.core.cache import bump_cache_versions, get_cache_version, get_or_compute
+from apps.dashboard.models import SellerDailyRollup
+from apps.sales.models import Sale
+
+
+# ==========================
+# CONSOLIDADO DIÁRIO (ROLLUP)
+# ==========================
+ROLLUP_UPDATE_FIELDS = ['sales_total', 'sales_count', 'commission_total', 'commission_paid_total']
+
+
+def rollup_enabled() -> bool:
+    """Indica se os dashboards devem ler do consolidado diário."""
+    return getattr(settings, 'DASHBOARD_USE_ROLLUP', False)
+
+
+def get_sales_source():
+    """
+    Retorna a fonte de leitura dos dashboards e o nome dos campos nela.
+
+    Returns:
+        tuple: (queryset, campo do valor, campo da comissão, campo da contagem).
+               O campo de contagem é None para vendas brutas (usa Count('id')).
+    """
+    if rollup_enabled():
+        return SellerDailyRollup.objects.all(), 'sales_total', 'commission_total', 'sales_count'
+    return Sale.objects.all(), 'total_amount', 'commission__value', None
+
+
+def count_sales(count_field, **extra):
+    """Expressão de contagem de vendas para a fonte retornada por get_sales_source()."""
+    return Sum(count_field, **extra) if count_field else Count('id', **extra)
+
+
+def aggregate_seller_days(queryset):
+    """
+    Agrupa vendas por (vendedor, dia) já com os totais de comissão.
+    """
+    return (
+        queryset.order_by()
+        .values('seller_id', 'date')
+        .annotate(
+            sales_total=Sum('total_amount'),
+            sales_count=Count('id'),
+            commission_total=Sum('commission__value'),
+            commission_paid_total=Sum('commission__value', filter=Q(commission__paid=True)),
+        )
+    )
+
+
+def build_rollup(row) -> SellerDailyRollup:
+    """Monta um SellerDailyRollup a partir de uma linha de aggregate_seller_days()."""
+    return SellerDailyRollup(
+        seller_id=row['seller_id'],
+        date=row['date'],
+        sales_total=row['sales_total'] or Decimal('0.00'),
+        sales_count=row['sales_count'],
+        commission_total=row['commission_total'] or Decimal('0.00'),
+        commission_paid_total=row['commission_paid_total'] or Decimal('0.00'),
+    )
+
+
+def refresh_seller_days(seller_days) -> int:
+    """
+    Recalcula o consolidado dos pares (seller_id, date) informados.
+
+    São no máximo 3 queries para qualquer quantidade de pares: uma agregação
+    das vendas, um upsert dos dias com venda e um delete dos dias que ficaram
+    vazios. Como todo caminho de escrita de vendas e comissões passa por aqui,
+    também invalida o cache dos vendedores afetados.
+
+    Returns:
+        int: quantidade de pares recalculados.
+    """
+    seller_days = {(seller_id, day) for seller_id, day in seller_days if seller_id and day}
+    if not seller_days:
+        return 0
+
+    bump_cache_versions((seller_id for seller_id, _ in seller_days), seller_months=seller_days)
+
+    rows = aggregate_seller_days(Sale.objects.filter(
+        seller_id__in={seller_id for seller_id, _ in seller_days},
+        date__in={day for _, day in seller_days},
+    ))
+    rollups = [build_rollup(row) for row in rows if (row['seller_id'], row['date']) in seller_days]
+
+    if rollups:
+        SellerDailyRollup.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=['seller', 'date'],
+            update_fields=ROLLUP_UPDATE_FIELDS,
+        )
+
+    empty_days = seller_days - {(rollup.seller_id, rollup.date) for rollup in rollups}
+    if empty_days:
+        SellerDailyRollup.objects.filter(
+            reduce(or_, (Q(seller_id=seller_id, date=day) for seller_id, day in empty_days))
+        ).delete()
+
+    return len(seller_days)
+
+
+def rebuild_rollup(start_date=None, end_date=None, seller_id=None, batch_size=1000) -> int:
+    """
+    Reconstrói o consolidado a partir das vendas brutas.
+    Deve ser chamado dentro de uma transação.
+
+    Returns:
+        int: quantidade de linhas (vendedor, dia) gravadas.
+    """
+    sales = Sale.objects.all()
+    rollups = SellerDailyRollup.objects.all()
+    if start_date:
+        sales = sales.filter(date__gte=start_date)
+        rollups = rollups.filter(date__gte=start_date)
+    if end_date:
+        sales = sales.filter(date__lte=end_date)
+        rollups = rollups.filter(date__lte=end_date)
+    if seller_id:
+        sales = sales.filter(seller_id=seller_id)
+        rollups = rollups.filter(seller_id=seller_id)
+
+    rollups.delete()
+    # Versão global: os meses reconstruídos não são conhecidos de antemão.
+    bump_cache_versions([seller_id], everything=True)
+
+    written = 0
+    batch = []
+    for row in aggregate_seller_days(sales).iterator(chunk_size=batch_size):
+        batch.append(build_rollup(row))
+        if len(batch) >= batch_size:
+            SellerDailyRollup.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        SellerDailyRollup.objects.bulk_create(batch)
+        written += len(batch)
+
+    return written
+
+
+# ==========================
+# MÉTRICAS DO ADMIN
+# ==========================
+# Escritas já invalidam o cache pela versão; o prazo só limita a memória usada.
+ADMIN_DASHBOARD_CACHE_TIMEOUT = 5 * 60
+
+def get_previous_period(start_date, end_date):
+    """
+    Retorna o período imediatamente anterior, com o mesmo número de dias.
+    """
+    previous_start = start_date - (end_date - start_date + timedelta(days=1))
+    previous_end = start_date - timedelta(days=1)
+    return previous_start, previous_end
+
+
+def get_sellers_count() -> dict:
+    """
+    Conta vendedores cadastrados e ativos em uma única query.
+    """
+    counts = get_all_sellers().aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+    )
+    return {
+        'total_sellers': counts['total'] or 0,
+        'active_sellers': counts['active'] or 0,
+    }
+
+
+def get_period_totals(start_date, end_date) -> dict:
+    """
+    Totais gerais do período e total do período anterior em uma única query.
+
+    O período anterior é contíguo ao atual, então basta filtrar o intervalo
+    completo e separar os dois lados com agregações condicionais. Como há no
+    máximo uma venda por vendedor por dia, a maior venda é o maior valor diário
+    e o resultado é o mesmo lendo do consolidado ou das vendas brutas.
+    """
+    queryset, amount, commission, count_field = get_sales_source()
+    previous_start, previous_end = get_previous_period(start_date, end_date)
+    current = Q(date__gte=start_date, date__lte=end_date)
+    previous = Q(date__gte=previous_start, date__lte=previous_end)
+
+    totals = queryset.filter(
+        date__gte=previous_start,
+        date__lte=end_date,
+    ).aggregate(
+        total_sales=Sum(amount, filter=current),
+        sales_count=count_sales(count_field, filter=current),
+        top_sale_value=Max(amount, filter=current),
+        total_commission=Sum(commission, filter=current),
+        previous_total=Sum(amount, filter=previous),
+    )
+
+    total_sales = totals['total_sales'] or Decimal('0.00')
+    sales_count = totals['sales_count'] or 0
+
+    return {
+        'total_sales': total_sales,
+        'sales_count': sales_count,
+        'avg_ticket': total_sales / sales_count if sales_count else Decimal('0.00'),
+        'top_sale_value': totals['top_sale_value'] or Decimal('0.00'),
+        'total_commission': totals['total_commission'] or Decimal('0.00'),
+        'previous_total': totals['previous_total'] or Decimal('0.00'),
+    }
+
+
+def get_sellers_breakdown(start_date, end_date) -> list[dict]:
+    """
+    Totais de vendas e comissões por vendedor no período, em uma única query
+    agrupada. Inclui todos os vendedores com vendas (ativos ou não), ordenados
+    pelo total vendido.
+    """
+    queryset, amount, commission, count_field = get_sales_source()
+    rows = (
+        queryset.filter(date__gte=start_date, date__lte=end_date)
+        .values(
+            'seller_id',
+            'seller__first_name',
+            'seller__last_name',
+            'seller__email',
+            'seller__is_active',
+            'seller__user_type',
+        )
+        .annotate(
+            sales_total=Sum(amount),
+            sales_count=count_sales(count_field),
+            commission_total=Sum(commission),
+        )
+        .order_by('-sales_total', 'seller__first_name', 'seller__last_name')
+    )
+
+    return [
+        {
+            'id': row['seller_id'],
+            'first_name': row['seller__first_name'],
+            'last_name': row['seller__last_name'],
+            'email': row['seller__email'],
+            'is_active': row['seller__is_active'],
+            'user_type': row['seller__user_type'],
+            'sales_total': row['sales_total'] or Decimal('0.00'),
+            'sales_count': row['sales_count'],
+            'commission_total': row['commission_total'] or Decimal('0.00'),
+        }
+        for row in rows
+    ]
+
+
+def get_admin_dashboard_metrics(start_date, end_date) -> dict:
+    """
+    Calcula todas as métricas do painel do admin em 3 queries fixas:
+    contagem de vendedores, totais do período (com o período anterior)
+    e o ranking agrupado por vendedor.
+
+    Returns:
+        dict: valores brutos (Decimal/int); a formatação fica na view.
+    """
+    metrics = get_sellers_count()
+    metrics.update(get_period_totals(start_date, end_date))
+
+    breakdown = get_sellers_breakdown(start_date, end_date)
+
+    # O "top vendedor" considera todas as vendas do período;
+    # o ranking exibe apenas vendedores ativos.
+    top_seller = breakdown[0] if breakdown else None
+    metrics['top_seller_name'] = (
+        f"{top_seller['first_name']} {top_seller['last_name']}" if top_seller else "—"
+    )
+    metrics['sellers'] = [
+        seller for seller in breakdown
+        if seller['is_active'] and seller['user_type'] == 'sellers'
+    ]
+
+    return metrics
+
+
+def get_cached_admin_dashboard_metrics(period: str, start_date, end_date) -> dict:
+    """
+    get_admin_dashboard_metrics() em cache por (período, início, fim).
+
+    A chave usa a versão "qualquer vendedor", que muda a cada escrita de vendas
+    ou comissões, a versão dos usuários (contagem e nomes dos vendedores) e o
+    banco de leitura (default ou relatórios), para que o snapshot de
+    relatórios e o default não compartilhem entradas.
+    """
+    alias = router.db_for_read(Sale)
+    version = get_cache_version(users=True)
+    key = f"dashboard:admin:{alias}:{period}:{start_date}:{end_date}:{version}"
+    return get_or_compute(
+        key,
+        lambda: get_admin_dashboard_metrics(start_date, end_date),
+        ADMIN_DASHBOARD_CACHE_TIMEOUT,
+    )
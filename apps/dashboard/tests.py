@@ -1,3 +1,226 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.accounts.models import User
+from apps.commissions.services import mark_commissions_as_paid
+from apps.dashboard.models import SellerDailyRollup
+from apps.dashboard.services import get_admin_dashboard_metrics
+from apps.sales.models import Sale
+
+
+class AdminDashboardMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', cpf='00000000000', password='senha-forte-123',
+            first_name='Admin', user_type='admin',
+        )
+        cls.sellers = [
+            User.objects.create_user(
+                email=f'seller{i}@example.com', cpf=f'1000000000{i}', password='senha-forte-123',
+                first_name=f'Vendedor{i}', last_name='Teste', commission_rate=Decimal('2.00'),
+            )
+            for i in range(5)
+        ]
+        for i, seller in enumerate(cls.sellers):
+            Sale.objects.create(seller=seller, date=date(2025, 3, 10), total_amount=Decimal(100 * (i + 1)))
+            Sale.objects.create(seller=seller, date=date(2025, 3, 11), total_amount=Decimal('50.00'))
+            # Período anterior (fevereiro tem 28 dias = mesmo tamanho do intervalo)
+            Sale.objects.create(seller=seller, date=date(2025, 2, 5), total_amount=Decimal('10.00'))
+
+        inactive = cls.sellers[0]
+        inactive.is_active = False
+        inactive.save(update_fields=['is_active'])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_metrics_run_in_constant_queries(self):
+        with self.assertNumQueries(3):
+            metrics = get_admin_dashboard_metrics(date(2025, 3, 1), date(2025, 3, 28))
+
+        self.assertEqual(metrics['total_sellers'], 5)
+        self.assertEqual(metrics['active_sellers'], 4)
+        self.assertEqual(metrics['total_sales'], Decimal('1750.00'))
+        self.assertEqual(metrics['sales_count'], 10)
+        self.assertEqual(metrics['top_sale_value'], Decimal('500.00'))
+        self.assertEqual(metrics['total_commission'], Decimal('35.00'))
+        self.assertEqual(metrics['previous_total'], Decimal('50.00'))
+        self.assertEqual(metrics['top_seller_name'], 'Vendedor4 Teste')
+
+    def test_breakdown_lists_only_active_sellers_ordered_by_total(self):
+        metrics = get_admin_dashboard_metrics(date(2025, 3, 1), date(2025, 3, 28))
+
+        ranking = [(s['first_name'], s['sales_total'], s['sales_count'], s['commission_total'])
+                   for s in metrics['sellers']]
+        self.assertEqual(ranking, [
+            ('Vendedor4', Decimal('550.00'), 2, Decimal('11.00')),
+            ('Vendedor3', Decimal('450.00'), 2, Decimal('9.00')),
+            ('Vendedor2', Decimal('350.00'), 2, Decimal('7.00')),
+            ('Vendedor1', Decimal('250.00'), 2, Decimal('5.00')),
+        ])
+
+    def test_view_query_count_does_not_grow_with_sellers(self):
+        self.client.force_login(self.admin)
+        url = reverse('dashboard:dashboard_admin')
+        params = {'period': 'custom', 'start': '2025-03-01', 'end': '2025-03-28'}
+
+        # sessão + usuário + versões de cache + 3 queries de métricas
+        with self.assertNumQueries(6):
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_vendas'], Decimal('1750.00'))
+        self.assertEqual(response.context['sales_variation'], Decimal('3400.0'))
+        self.assertEqual(len(response.context['sellers']), 4)
+
+    def test_view_is_cached_until_a_sale_is_written(self):
+        self.client.force_login(self.admin)
+        url = reverse('dashboard:dashboard_admin')
+        params = {'period': 'custom', 'start': '2025-03-01', 'end': '2025-03-28'}
+        self.client.get(url, params)
+
+        # sessão + usuário
+        with self.assertNumQueries(2):
+            response = self.client.get(url, params)
+        self.assertEqual(response.context['total_vendas'], Decimal('1750.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(seller=self.sellers[1], date=date(2025, 3, 12), total_amount=Decimal('250.00'))
+        response = self.client.get(url, params)
+        self.assertEqual(response.context['total_vendas'], Decimal('2000.00'))
+
+
+class SellerDailyRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='rollup@example.com', cpf='20000000000', password='senha-forte-123',
+            first_name='Rollup', commission_rate=Decimal('10.00'),
+        )
+
+    def rollup(self, day):
+        return SellerDailyRollup.objects.filter(seller=self.seller, date=day).first()
+
+    def test_rollup_follows_sale_writes(self):
+        sale = Sale.objects.create(seller=self.seller, date=date(2025, 5, 1), total_amount=Decimal('200.00'))
+        rollup = self.rollup(date(2025, 5, 1))
+        self.assertEqual((rollup.sales_total, rollup.sales_count, rollup.commission_total),
+                         (Decimal('200.00'), 1, Decimal('20.00')))
+
+        sale.total_amount = Decimal('300.00')
+        sale.date = date(2025, 5, 2)
+        sale.save()
+        self.assertIsNone(self.rollup(date(2025, 5, 1)))
+        self.assertEqual(self.rollup(date(2025, 5, 2)).commission_total, Decimal('30.00'))
+
+        mark_commissions_as_paid([sale.commission.id])
+        self.assertEqual(self.rollup(date(2025, 5, 2)).commission_paid_total, Decimal('30.00'))
+
+        sale.delete()
+        self.assertFalse(SellerDailyRollup.objects.exists())
+
+    def test_new_sale_refreshes_its_day_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            Sale.objects.create(seller=self.seller, date=date(2025, 5, 3), total_amount=Decimal('100.00'))
+
+        upserts = [q for q in queries if q['sql'].startswith('INSERT INTO "dashboard_sellerdailyrollup"')]
+        self.assertEqual(len(upserts), 1)
+        self.assertEqual(self.rollup(date(2025, 5, 3)).commission_total, Decimal('10.00'))
+
+    def test_rebuild_command_matches_incremental_rollup(self):
+        for day in range(1, 6):
+            Sale.objects.create(seller=self.seller, date=date(2025, 6, day), total_amount=Decimal(day * 10))
+        expected = list(SellerDailyRollup.objects.order_by('date').values_list(
+            'date', 'sales_total', 'sales_count', 'commission_total'))
+
+        SellerDailyRollup.objects.all().delete()
+        call_command('rebuild_sales_rollup', stdout=StringIO())
+
+        rebuilt = list(SellerDailyRollup.objects.order_by('date').values_list(
+            'date', 'sales_total', 'sales_count', 'commission_total'))
+        self.assertEqual(rebuilt, expected)
+
+    def test_metrics_match_between_rollup_and_raw_sales(self):
+        for day in range(1, 4):
+            Sale.objects.create(seller=self.seller, date=date(2025, 7, day), total_amount=Decimal('99.90'))
+
+        with override_settings(DASHBOARD_USE_ROLLUP=True):
+            from_rollup = get_admin_dashboard_metrics(date(2025, 7, 1), date(2025, 7, 31))
+        with override_settings(DASHBOARD_USE_ROLLUP=False):
+            from_sales = get_admin_dashboard_metrics(date(2025, 7, 1), date(2025, 7, 31))
+
+        self.assertEqual(from_rollup, from_sales)
+
+
+class SellerDashboardViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='painel@example.com', cpf='70000000000', password='senha-forte-123',
+            first_name='Painel', commission_rate=Decimal('5.00'),
+        )
+        for day in range(1, 29):
+            Sale.objects.create(seller=cls.seller, date=date(2025, 2, day), total_amount=Decimal('40.00'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_dashboard_runs_fixed_number_of_queries(self):
+        self.client.force_login(self.seller)
+
+        # sessão + usuário + validador + versões de cache + agregação de stats + lista de vendas
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('dashboard:dashboard_sellers'), {'year': '2025', 'month': '2'})
+
+        recent_sales = response.context['recent_sales']
+        self.assertEqual(len(recent_sales), 28)
+        self.assertTrue(all(sale.calculated_commission == Decimal('2.00') for sale in recent_sales))
+
+    def test_dashboard_cache_is_per_seller(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = User.objects.create_user(
+                email='outro-painel@example.com', cpf='70000000001', password='senha-forte-123',
+                first_name='Outro', commission_rate=Decimal('5.00'),
+            )
+        self.client.force_login(self.seller)
+        url = reverse('dashboard:dashboard_sellers')
+        params = {'year': '2025', 'month': '2'}
+        self.client.get(url, params)
+
+        # Venda de outro vendedor não invalida o painel deste.
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(seller=other, date=date(2025, 2, 1), total_amount=Decimal('10.00'))
+        with self.assertNumQueries(3):
+            self.client.get(url, params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.filter(seller=self.seller, date=date(2025, 2, 1)).get().delete()
+        response = self.client.get(url, params)
+        self.assertEqual(len(response.context['recent_sales']), 27)
+
+    def test_unchanged_dashboard_answers_not_modified(self):
+        self.client.force_login(self.seller)
+        url = reverse('dashboard:dashboard_sellers')
+        params = {'year': '2025', 'month': '2'}
+        etag = self.client.get(url, params)['ETag']
+
+        # sessão + usuário + validador: sem serviços nem template
+        with self.assertNumQueries(3):
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        sale = Sale.objects.get(seller=self.seller, date=date(2025, 2, 10))
+        sale.total_amount = Decimal('80.00')
+        sale.save()
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
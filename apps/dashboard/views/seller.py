@@ -1,29 +1,42 @@
 from .base import BaseDashboardView
-from apps.sales.services import get_sales_dashboard_stats, get_sales_by_seller
-from apps.commissions.models import Commission
+from apps.core.mixins import ConditionalGetMixin
+from apps.sales.services import get_sales_validator, get_seller_dashboard_data, seller_dashboard_period
 from django.utils import timezone
 from datetime import date
 from decimal import Decimal
 from dateutil.relativedelta import relativedelta
 
 
-class SellerDashboardView(BaseDashboardView):
+class SellerDashboardView(ConditionalGetMixin, BaseDashboardView):
     template_name = 'dashboard/sellers/dashboard_sellers.html'
+    # sessão + usuário + validador (GET condicional) + versões de cache
+    # + estatísticas + vendas recentes (sem cache)
+    query_budget = 6
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        user = self.get_user()
+    def get_selected_month(self):
+        """ Ano/mês da URL (ex: ?year=2025&month=10) ou o mês atual. """
         today = timezone.localdate()
-
-        # 1. Tenta pegar ano/mês da URL (ex: ?year=2025&month=10)
         try:
             year = int(self.request.GET.get('year', today.year))
             month = int(self.request.GET.get('month', today.month))
-            selected_period_start = date(year, month, 1)
+            date(year, month, 1)
         except (ValueError, TypeError):
             year = today.year
             month = today.month
-            selected_period_start = date(year, month, 1)
+        return year, month
+
+    def get_validator(self):
+        year, month = self.get_selected_month()
+        return get_sales_validator(self.get_user().id, seller_dashboard_period(year, month))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user = self.get_user()
+        today = timezone.localdate()
+
+        # 1. Ano/mês selecionados na URL
+        year, month = self.get_selected_month()
+        selected_period_start = date(year, month, 1)
 
         # 2. URLs de navegação entre meses
         prev_month_date = selected_period_start - relativedelta(months=1)
@@ -36,16 +49,12 @@ class SellerDashboardView(BaseDashboardView):
         if next_month_date <= today.replace(day=1):
             next_month_url = f"{base_url}?year={next_month_date.year}&month={next_month_date.month}"
 
-        # 3. Dados via services
-        stats = get_sales_dashboard_stats(user.id, year, month)
-        recent_sales_list = get_sales_by_seller(user.id, year, month)
+        # 3. Dados via services (em cache por vendedor/ano/mês)
+        data = get_seller_dashboard_data(user.id, year, month)
+        stats = data['stats']
 
-        # 4. Busca a comissão real de cada venda no banco
-        sales_with_commission = []
-        for sale in recent_sales_list:
-            commission = Commission.objects.filter(sale=sale).first()
-            sale.calculated_commission = commission.value if commission else Decimal('0.00')
-            sales_with_commission.append(sale)
+        # 4. A comissão real de cada venda já vem anotada pelo serviço
+        sales_with_commission = data['recent_sales']
 
         # 5. Monta o contexto
         context.update({
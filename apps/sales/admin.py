@@ -1,8 +1,38 @@
 from django.contrib import admin
+from apps.core.mixins import mark_data_written
+from apps.commissions.models import Commission
 from .models import Sale
+from .services import delete_sale, delete_sales
+
+
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
     list_display = ('id', 'seller', 'date', 'total_amount', 'created_at', 'updated_at')
     list_filter = ('date', 'seller')
     search_fields = ('seller__username', 'seller__email')
-    ordering = ('-date',)
\ No newline at end of file
+    ordering = ('-date',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        mark_data_written(request)
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Vendas com comissão paga entram como protegidas: a confirmação e a
+        ação em massa recusam a exclusão antes de chegar a delete_model.
+        """
+        to_delete, model_count, perms_needed, protected = super().get_deleted_objects(objs, request)
+        # A comissão não se exclui sozinha no admin, mas sai junto com a venda.
+        perms_needed.discard(Commission._meta.verbose_name)
+        paid = Sale.objects.filter(pk__in=[obj.pk for obj in objs], commission__paid=True)
+        protected += [f"{sale} (comissão já paga)" for sale in paid.select_related('seller')]
+        return to_delete, model_count, perms_needed, protected
+
+    # Exclusões pelo admin também são lógicas, como na tela de vendas.
+    def delete_model(self, request, obj):
+        delete_sale(obj)
+        mark_data_written(request)
+
+    def delete_queryset(self, request, queryset):
+        delete_sales(queryset)
+        mark_data_written(request)
@@ -0,0 +1,82 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sales.services import SELLER_LOOKUP_FIELDS, import_sales_chunk
+
+
+def read_csv(handle):
+    for line, row in enumerate(csv.DictReader(handle), start=2):  # linha 1 = cabeçalho
+        yield line, row
+
+
+def read_jsonl(handle):
+    for line, text in enumerate(handle, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except json.JSONDecodeError as e:
+            row = {'_error': f"JSON inválido: {e.msg}"}
+        yield line, row if isinstance(row, dict) else {'_error': "a linha deve ser um objeto JSON"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa vendas em lote de um arquivo CSV ou JSONL (colunas seller, date, total_amount). "
+        "O arquivo é lido em lotes e cada lote é gravado em uma transação, com as comissões."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Arquivo .csv ou .jsonl.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Formato do arquivo (padrão: pela extensão).")
+        parser.add_argument('--seller-field', choices=SELLER_LOOKUP_FIELDS, default='id',
+                            help="Campo usado para localizar o vendedor (padrão: id).")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f"Arquivo não encontrado: {path}")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size deve ser maior que zero.")
+
+        file_format = options['format'] or ('jsonl' if path.suffix.lower() in ('.jsonl', '.ndjson') else 'csv')
+        reader = read_jsonl if file_format == 'jsonl' else read_csv
+
+        imported = 0
+        rejected = []
+        processed = 0
+        started = time.perf_counter()
+
+        with path.open(newline='', encoding='utf-8-sig') as handle:
+            rows = reader(handle)
+            while chunk := list(islice(rows, options['chunk_size'])):
+                valid = []
+                for line, row in chunk:
+                    if '_error' in row:
+                        rejected.append((line, row['_error']))
+                    else:
+                        valid.append((line, row))
+
+                created, chunk_rejected = import_sales_chunk(valid, seller_field=options['seller_field'])
+                imported += created
+                rejected.extend(chunk_rejected)
+                processed += len(chunk)
+
+                self.stdout.write(f"{processed} linhas processadas ({imported} importadas)...")
+
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed > 0 else 0
+
+        for line, reason in rejected:
+            self.stderr.write(f"Linha {line}: {reason}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{imported} vendas importadas, {len(rejected)} rejeitadas, "
+            f"{processed} linhas em {elapsed:.2f}s ({rate:.0f} linhas/s)."
+        ))
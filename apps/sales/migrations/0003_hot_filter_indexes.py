@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_alter_sale_date_alter_sale_total_amount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sale',
+            name='date',
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['date', 'seller', 'total_amount'], name='sale_date_seller_amount_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0003_hot_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='sale',
+            name='unique_sale_per_seller_per_day',
+        ),
+        migrations.RemoveIndex(
+            model_name='sale',
+            name='sale_date_seller_amount_idx',
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['date', 'seller', 'total_amount'], name='sale_date_seller_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='sale_deleted_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sale',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False)), fields=('seller', 'date'), name='unique_sale_per_seller_per_day'),
+        ),
+    ]
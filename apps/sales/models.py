@@ -1,7 +1,13 @@
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from apps.core.models import BaseModel
+from apps.core.models import BaseModel, SoftDeleteManager, SoftDeleteQuerySet
+
+
+class SaleQuerySet(SoftDeleteQuerySet):
+    def purgeable(self, moment):
+        # A cascata levaria junto a comissão de um lote de pagamento.
+        return super().purgeable(moment).exclude(commission__payout_batch__isnull=False)
 
 
 class Sale(BaseModel):
@@ -11,19 +17,42 @@ class Sale(BaseModel):
         limit_choices_to={'user_type': 'sellers'},
         related_name='sales'
     )
-    date = models.DateField(db_index=True)
+    date = models.DateField()
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    # Exclusão lógica (apps.sales.services.delete_sales): `objects` só vê as
+    # vendas vivas; as excluídas ficam em `all_objects` até o purge_deleted.
+    objects = SoftDeleteManager.from_queryset(SaleQuerySet)()
+    all_objects = SaleQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Venda"
         verbose_name_plural = "Vendas"
         ordering = ['-date']
         constraints = [
+            # Só entre vendas vivas: excluir uma venda libera o dia para outra.
             models.UniqueConstraint(
                 fields=['seller', 'date'],
+                condition=models.Q(is_deleted=False),
                 name='unique_sale_per_seller_per_day'
             )
         ]
+        indexes = [
+            # Filtros por período de todos os vendedores; cobre também a soma
+            # por vendedor (seller, total_amount) sem ler a tabela. Parcial:
+            # as vendas excluídas não ocupam o índice.
+            models.Index(
+                fields=['date', 'seller', 'total_amount'],
+                condition=models.Q(is_deleted=False),
+                name='sale_date_seller_amount_idx',
+            ),
+            # Só as excluídas, para o purge_deleted achar as antigas.
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(is_deleted=True),
+                name='sale_deleted_at_idx',
+            ),
+        ]
 
     def clean(self):
         # Impede vendas duplicadas no mesmo dia por vendedor
@@ -1,11 +1,21 @@
-from django.db import models
+import re
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Lower
+from django.utils import timezone
 from django.utils.timezone import localdate
 from django.core.exceptions import ValidationError
-from datetime import timedelta, date
-from decimal import Decimal
+from datetime import datetime, timedelta, date
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
 from apps.sales.models import Sale
 from apps.accounts.models import User
 from apps.commissions.models import Commission
+from apps.core.cache import get_or_compute, get_seller_month_versions
+from apps.core.memo import request_memoize
+from apps.commissions.services import bulk_create_commissions, recalculate_commissions, soft_delete_commissions
+from apps.dashboard.services import get_sales_source, count_sales, refresh_seller_days
 
 
 # ==========================
@@ -16,81 +26,502 @@ def create_sale(user, form):
         raise ValidationError("Apenas vendedores podem criar vendas.")
     sale = form.save(commit=False)
     sale.seller = user
-    sale.save()
+    # Venda, comissão (sinal), consolidado e contadores em uma só transação de escrita.
+    with transaction.atomic():
+        sale.save()
     return sale
 
 
+# ==========================
+# EXCLUSÃO (LÓGICA)
+# ==========================
+def delete_sales(queryset) -> int:
+    """
+    Exclusão lógica das vendas do queryset e das suas comissões: um UPDATE
+    por tabela em vez do DELETE em cascata. Contadores, consolidado e cache
+    são ajustados na mesma transação. O comando purge_deleted remove as
+    linhas depois.
+
+    Vendas com comissão já paga não podem ser excluídas: o histórico de
+    pagamentos e os lotes precisam continuar batendo.
+
+    Returns:
+        int: quantidade de vendas excluídas.
+
+    Raises:
+        ValidationError: se alguma das vendas tiver comissão paga.
+    """
+    with transaction.atomic():
+        sales = list(queryset.values_list('pk', 'seller_id', 'date'))
+        if not sales:
+            return 0
+        sale_ids = [pk for pk, _, _ in sales]
+        if Commission.objects.filter(sale_id__in=sale_ids, paid=True).exists():
+            raise ValidationError("Vendas com comissão já paga não podem ser excluídas.")
+        deleted = Sale.objects.filter(pk__in=sale_ids).soft_delete()
+        soft_delete_commissions(Commission.objects.filter(sale_id__in=sale_ids))
+        refresh_seller_days((seller_id, sale_date) for _, seller_id, sale_date in sales)
+    return deleted
+
+
+def delete_sale(sale: Sale) -> None:
+    """Exclusão lógica de uma venda (ver delete_sales; ValidationError se já paga)."""
+    delete_sales(Sale.objects.filter(pk=sale.pk))
+
+
+# ==========================
+# IMPORTAÇÃO EM LOTE
+# ==========================
+SELLER_LOOKUP_FIELDS = ('id', 'email', 'cpf')
+MAX_SALE_AMOUNT = Decimal('99999999.99')  # max_digits=10, decimal_places=2
+
+
+def parse_sale_date(value) -> date:
+    """Aceita AAAA-MM-DD ou DD/MM/AAAA."""
+    value = str(value or '').strip()
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"data inválida: {value!r}")
+
+
+def parse_sale_amount(value) -> Decimal:
+    """Aceita ponto ou vírgula como separador decimal."""
+    text = str(value if value is not None else '').strip()
+    if ',' in text and '.' not in text:
+        text = text.replace(',', '.')
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"valor inválido: {value!r}")
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError("o valor total deve ser maior que zero")
+    if amount > MAX_SALE_AMOUNT:
+        raise ValueError("o valor total excede o limite permitido")
+    return amount.quantize(Decimal('0.01'))
+
+
+def normalize_seller_key(value, seller_field: str):
+    """Normaliza o identificador do vendedor conforme o campo de busca."""
+    value = str(value if value is not None else '').strip()
+    if seller_field == 'cpf':
+        value = re.sub(r'\D', '', value)
+    elif seller_field == 'email':
+        value = value.lower()
+    elif value.isdigit():
+        value = int(value)
+    else:
+        value = ''
+
+    if not value:
+        raise ValueError("vendedor não informado ou inválido")
+    return value
+
+
+def parse_sale_record(row, seller_field: str) -> tuple:
+    """
+    Valida um registro {seller, date, total_amount} vindo de arquivo ou API.
+
+    Returns:
+        tuple: (chave do vendedor, data, valor).
+
+    Raises:
+        ValueError: com o motivo da rejeição.
+    """
+    if not isinstance(row, dict):
+        raise ValueError("o registro deve ser um objeto com seller, date e total_amount")
+    return (
+        normalize_seller_key(row.get('seller'), seller_field),
+        parse_sale_date(row.get('date')),
+        parse_sale_amount(row.get('total_amount')),
+    )
+
+
+def get_sellers_by_key(seller_keys, seller_field: str) -> dict:
+    """
+    Busca vendedores em uma única query, indexados pelo campo de busca.
+    E-mails são comparados sem diferenciar maiúsculas: as chaves já vêm em
+    minúsculas, mas o e-mail gravado mantém a caixa da parte local.
+    """
+    if seller_field not in SELLER_LOOKUP_FIELDS:
+        raise ValueError(f"Campo de vendedor inválido: {seller_field}")
+    sellers = User.objects.filter(user_type='sellers')
+    if seller_field == 'email':
+        sellers = sellers.annotate(email_lower=Lower('email')).filter(email_lower__in=set(seller_keys))
+        return {seller.email.lower(): seller for seller in sellers}
+    return {
+        getattr(seller, seller_field): seller
+        for seller in sellers.filter(**{f'{seller_field}__in': set(seller_keys)})
+    }
+
+
+def import_sales_chunk(rows, seller_field: str = 'id') -> tuple[int, list[tuple[int, str]]]:
+    """
+    Importa um lote de vendas em uma única transação.
+
+    Todas as validações são feitas em conjunto: uma query para os vendedores,
+    uma para as vendas já existentes (unique_sale_per_seller_per_day) e
+    INSERTs em lote para vendas e comissões, sem sinais por linha.
+
+    Args:
+        rows: lista de (número da linha, dict com seller, date e total_amount).
+        seller_field: campo usado para localizar o vendedor ('id', 'email' ou 'cpf').
+
+    Returns:
+        tuple: (quantidade importada, lista de (linha, motivo) rejeitadas).
+    """
+    if seller_field not in SELLER_LOOKUP_FIELDS:
+        raise ValueError(f"Campo de vendedor inválido: {seller_field}")
+
+    rejected = []
+    parsed = []
+    for line, row in rows:
+        try:
+            parsed.append((line, *parse_sale_record(row, seller_field)))
+        except ValueError as e:
+            rejected.append((line, str(e)))
+
+    if not parsed:
+        return 0, rejected
+
+    with transaction.atomic():
+        sellers = get_sellers_by_key((seller_key for _, seller_key, _, _ in parsed), seller_field)
+        existing = set(
+            Sale.objects.filter(
+                seller_id__in=[seller.id for seller in sellers.values()],
+                date__in={sale_date for _, _, sale_date, _ in parsed},
+            ).values_list('seller_id', 'date')
+        )
+
+        sales = []
+        for line, seller_key, sale_date, amount in parsed:
+            seller = sellers.get(seller_key)
+            if seller is None:
+                rejected.append((line, f"vendedor não encontrado: {seller_key}"))
+                continue
+            if (seller.id, sale_date) in existing:
+                rejected.append((line, "já existe uma venda registrada para este vendedor nesta data"))
+                continue
+            existing.add((seller.id, sale_date))
+            sales.append(Sale(seller=seller, date=sale_date, total_amount=amount))
+
+        if sales:
+            Sale.objects.bulk_create(sales)
+            bulk_create_commissions(sales)
+            refresh_seller_days((sale.seller_id, sale.date) for sale in sales)
+
+    return len(sales), sorted(rejected)
+
+
+def upsert_sales_batch(records, seller_field: str = 'id') -> list[dict]:
+    """
+    Cria ou atualiza vendas em lote pela chave (vendedor, data), a mesma do
+    unique_sale_per_seller_per_day. Usado pela integração com os PDVs.
+
+    Tudo roda em uma transação com um número fixo de queries: vendas novas e
+    suas comissões entram com bulk_create, vendas alteradas com bulk_update e
+    as comissões delas são recalculadas com um único UPDATE no banco.
+
+    Vendas com comissão já paga não são alteradas: o registro volta com erro.
+
+    Returns:
+        list[dict]: um status por registro, na mesma ordem da entrada
+                    ('created', 'updated', 'unchanged' ou 'error').
+    """
+    if seller_field not in SELLER_LOOKUP_FIELDS:
+        raise ValueError(f"Campo de vendedor inválido: {seller_field}")
+
+    results = [{'index': index} for index in range(len(records))]
+    parsed = {}
+    for index, record in enumerate(records):
+        try:
+            seller_key, sale_date, amount = parse_sale_record(record, seller_field)
+        except ValueError as e:
+            results[index].update(status='error', error=str(e))
+            continue
+        if (seller_key, sale_date) in parsed:
+            results[index].update(status='error', error="registro duplicado no lote")
+            continue
+        parsed[(seller_key, sale_date)] = (index, amount)
+
+    if not parsed:
+        return results
+
+    with transaction.atomic():
+        sellers = get_sellers_by_key((seller_key for seller_key, _ in parsed), seller_field)
+        existing = {
+            (sale.seller_id, sale.date): sale
+            for sale in Sale.objects.select_for_update(of=('self',)).filter(
+                seller_id__in=[seller.id for seller in sellers.values()],
+                date__in={sale_date for _, sale_date in parsed},
+            ).annotate(commission_paid=models.F('commission__paid'))
+        }
+
+        to_create, to_update = [], []
+        for (seller_key, sale_date), (index, amount) in parsed.items():
+            seller = sellers.get(seller_key)
+            if seller is None:
+                results[index].update(status='error', error=f"vendedor não encontrado: {seller_key}")
+                continue
+
+            sale = existing.get((seller.id, sale_date))
+            if sale is None:
+                sale = Sale(seller=seller, date=sale_date, total_amount=amount)
+                to_create.append((index, sale))
+            elif sale.total_amount != amount and sale.commission_paid:
+                # Mesma regra da exclusão: o lote de pagamento precisa continuar batendo.
+                results[index].update(
+                    status='error', sale_id=sale.pk, error="comissão já paga; a venda não pode ser alterada",
+                )
+            elif sale.total_amount != amount:
+                sale.seller = seller
+                sale.total_amount = amount
+                to_update.append((index, sale))
+            else:
+                results[index].update(status='unchanged', sale_id=sale.pk)
+
+        if to_create:
+            created = [sale for _, sale in to_create]
+            Sale.objects.bulk_create(created)
+            bulk_create_commissions(created)
+
+        if to_update:
+            updated = [sale for _, sale in to_update]
+            now = timezone.now()
+            for sale in updated:
+                sale.updated_at = now
+            Sale.objects.bulk_update(updated, ['total_amount', 'updated_at'])
+
+            updated_ids = [sale.pk for sale in updated]
+            recalculate_commissions(Commission.objects.filter(sale_id__in=updated_ids))
+            with_commission = set(
+                Commission.objects.filter(sale_id__in=updated_ids).values_list('sale_id', flat=True)
+            )
+            bulk_create_commissions([sale for sale in updated if sale.pk not in with_commission])
+
+        refresh_seller_days(
+            (sale.seller_id, sale.date) for _, sale in to_create + to_update
+        )
+
+    for status, items in (('created', to_create), ('updated', to_update)):
+        for index, sale in items:
+            results[index].update(status=status, sale_id=sale.pk)
+
+    return results
+
+
 # ==========================
 # CONSULTAS DE VENDAS
 # ==========================
 def get_sales_by_seller(seller_id: int, year: int = None, month: int = None):
-    queryset = Sale.objects.filter(seller_id=seller_id)
+    """
+    Vendas do vendedor, já com o valor real da comissão em
+    `calculated_commission` (LEFT JOIN na comissão, sem query por venda).
+    """
+    queryset = Sale.objects.filter(seller_id=seller_id).annotate(
+        calculated_commission=Coalesce(
+            'commission__value',
+            models.Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
     if year and month:
         queryset = queryset.filter(date__year=year, date__month=month)
     return queryset.order_by('-date', '-created_at')
 
 
+@request_memoize
+def get_sales_totals(seller_id: int, year=None, month=None, day=None) -> dict:
+    """
+    Soma vendas e comissões de um vendedor com os mesmos filtros de data
+    da listagem de vendas (ano, mês e dia opcionais).
+    """
+    queryset, amount, commission, _ = get_sales_source()
+    queryset = queryset.filter(seller_id=seller_id)
+    if year:
+        queryset = queryset.filter(date__year=year)
+    if month:
+        queryset = queryset.filter(date__month=month)
+    if day:
+        queryset = queryset.filter(date__day=day)
+
+    totals = queryset.aggregate(
+        total_sales=models.Sum(amount),
+        total_commission=models.Sum(commission),
+    )
+    return {
+        "total_sales": totals["total_sales"] or Decimal("0.00"),
+        "total_commission": totals["total_commission"] or Decimal("0.00"),
+    }
+
+
 # ==========================
 # DASHBOARD DO VENDEDOR
 # ==========================
+DASHBOARD_STATS_TIMEOUT = 60 * 60 * 24  # 1 dia (mês aberto e dados do dia)
+
+
+def format_amount(value: Decimal) -> str:
+    return f"{value:.2f}".replace(".", ",")
+
+
+@request_memoize
 def get_sales_dashboard_stats(seller_id: int, year: int, month: int):
+    """
+    Estatísticas do painel do vendedor (hoje, ontem e mês selecionado).
+
+    O resultado fica em cache em dois blocos, cada um com a versão dos meses
+    de que depende (ver apps.core.cache.get_seller_month_versions): o bloco
+    do mês, por (vendedor, ano, mês), e o bloco do dia, por (vendedor, data
+    de hoje). Só os blocos ausentes são calculados, em uma única query com
+    agregações filtradas. Meses fechados não expiram e só são recalculados
+    quando uma venda ou comissão do próprio mês muda.
+    """
     selected_period_start = date(year, month, 1)
     today = localdate()
 
-    if month == today.month and year == today.year:
+    month_is_open = month == today.month and year == today.year
+    if month_is_open:
         selected_period_end = today
     else:
         next_month_start = (selected_period_start + timedelta(days=32)).replace(day=1)
         selected_period_end = next_month_start - timedelta(days=1)
 
     yesterday = today - timedelta(days=1)
-    user_sales = Sale.objects.filter(seller_id=seller_id)
 
-    today_stats = user_sales.filter(date=today).aggregate(
-        count=models.Count("id"),
-        total=models.Sum("total_amount"),
-    )
-    yesterday_stats = user_sales.filter(date=yesterday).aggregate(
-        count=models.Count("id"),
-        total=models.Sum("total_amount"),
-    )
-    month_sales = user_sales.filter(
-        date__gte=selected_period_start,
-        date__lte=selected_period_end
+    month_version, today_version, yesterday_version = get_seller_month_versions(
+        seller_id, selected_period_start, today, yesterday,
     )
-    month_stats = month_sales.aggregate(
-        count=models.Count("id"),
-        total=models.Sum("total_amount"),
-        average=models.Avg("total_amount"),
+    month_key = f"sales:month_stats:{seller_id}:{selected_period_start}:{selected_period_end}:{month_version}"
+    day_key = f"sales:day_stats:{seller_id}:{today}:{today_version}:{yesterday_version}"
+    cached = cache.get_many([month_key, day_key])
+    month_stats = cached.get(month_key)
+    day_stats = cached.get(day_key)
+
+    if month_stats is None or day_stats is None:
+        queryset, amount, commission, count_field = get_sales_source()
+        in_month = models.Q(date__gte=selected_period_start, date__lte=selected_period_end)
+        is_today = models.Q(date=today)
+        is_yesterday = models.Q(date=yesterday)
+
+        periods = []
+        aggregates = {}
+        if day_stats is None:
+            periods += [is_today, is_yesterday]
+            aggregates.update(
+                today_count=count_sales(count_field, filter=is_today),
+                today_total=models.Sum(amount, filter=is_today),
+                yesterday_count=count_sales(count_field, filter=is_yesterday),
+                yesterday_total=models.Sum(amount, filter=is_yesterday),
+            )
+        if month_stats is None:
+            periods.append(in_month)
+            aggregates.update(
+                month_count=count_sales(count_field, filter=in_month),
+                month_total=models.Sum(amount, filter=in_month),
+                month_commission=models.Sum(commission, filter=in_month),
+            )
+
+        stats = queryset.filter(seller_id=seller_id).filter(reduce(or_, periods)).aggregate(**aggregates)
+
+        if month_stats is None:
+            month_amount = stats["month_total"] or Decimal("0.00")
+            month_count = stats["month_count"] or 0
+            average_ticket = month_amount / month_count if month_count else Decimal("0.00")
+            month_stats = {
+                "month_count": month_count,
+                "month_amount": format_amount(month_amount),
+                "average_ticket": format_amount(average_ticket),
+                "month_commission": format_amount(stats["month_commission"] or Decimal("0.00")),
+            }
+            cache.set(month_key, month_stats, DASHBOARD_STATS_TIMEOUT if month_is_open else None)
+        if day_stats is None:
+            day_stats = {
+                "today_count": stats["today_count"] or 0,
+                "today_amount": format_amount(stats["today_total"] or Decimal("0.00")),
+                "yesterday_count": stats["yesterday_count"] or 0,
+                "yesterday_amount": format_amount(stats["yesterday_total"] or Decimal("0.00")),
+            }
+            cache.set(day_key, day_stats, DASHBOARD_STATS_TIMEOUT)
+
+    return {**day_stats, **month_stats}
+
+
+@request_memoize
+def get_seller_dashboard_data(seller_id: int, year: int, month: int) -> dict:
+    """
+    Estatísticas e vendas do mês para o painel do vendedor, em cache por
+    (vendedor, ano, mês) e pelas versões dos meses exibidos (o selecionado e
+    os de hoje e ontem). Inclui o dia de hoje na chave porque os cards de
+    hoje/ontem mudam na virada do dia.
+    """
+    today = localdate()
+    version = '.'.join(get_seller_month_versions(
+        seller_id, date(year, month, 1), today, today - timedelta(days=1),
+    ))
+    key = f"dashboard:seller:{seller_id}:{year}:{month}:{today}:{version}"
+    return get_or_compute(
+        key,
+        lambda: {
+            'stats': get_sales_dashboard_stats(seller_id, year, month),
+            'recent_sales': list(get_sales_by_seller(seller_id, year, month)),
+        },
+        DASHBOARD_STATS_TIMEOUT,
     )
 
-    today_amount = today_stats["total"] or Decimal("0.00")
-    yesterday_amount = yesterday_stats["total"] or Decimal("0.00")
-    month_amount = month_stats["total"] or Decimal("0.00")
-    average_ticket = month_stats["average"] or Decimal("0.00")
 
-    month_commission = (
-        Commission.objects.filter(sale__in=month_sales)
-        .aggregate(total=models.Sum("value"))
-        .get("total")
-        or Decimal("0.00")
+# ==========================
+# VALIDADORES (GET CONDICIONAL)
+# ==========================
+@request_memoize
+def get_sales_validator(seller_id: int, period) -> tuple:
+    """
+    Validador barato das telas do vendedor: última alteração das vendas e
+    comissões do período e a quantidade de vendas (que muda em exclusões),
+    em uma única query pelo índice (vendedor, data).
+
+    Args:
+        period: Q com o filtro de datas da tela.
+
+    Returns:
+        tuple: (última alteração ou None, quantidade de vendas).
+    """
+    row = Sale.objects.filter(period, seller_id=seller_id).aggregate(
+        last_sale=models.Max('updated_at'),
+        last_commission=models.Max('commission__updated_at'),
+        count=models.Count('id'),
     )
+    changes = [value for value in (row['last_sale'], row['last_commission']) if value]
+    return max(changes, default=None), row['count']
 
-    return {
-        "today_count": today_stats["count"] or 0,
-        "today_amount": f"{today_amount:.2f}".replace(".", ","),
-        "yesterday_count": yesterday_stats["count"] or 0,
-        "yesterday_amount": f"{yesterday_amount:.2f}".replace(".", ","),
-        "month_count": month_stats["count"] or 0,
-        "month_amount": f"{month_amount:.2f}".replace(".", ","),
-        "average_ticket": f"{average_ticket:.2f}".replace(".", ","),
-        "month_commission": f"{month_commission:.2f}".replace(".", ","),
-    }
+
+def sales_list_period(year=None, month=None, day=None) -> models.Q:
+    """Filtro de datas da listagem de vendas (ano, mês e dia opcionais)."""
+    period = models.Q()
+    if year:
+        period &= models.Q(date__year=year)
+    if month:
+        period &= models.Q(date__month=month)
+    if day:
+        period &= models.Q(date__day=day)
+    return period
+
+
+def seller_dashboard_period(year: int, month: int) -> models.Q:
+    """Filtro de datas do painel do vendedor: o mês selecionado, hoje e ontem."""
+    today = localdate()
+    return (
+        models.Q(date__year=year, date__month=month)
+        | models.Q(date__gte=today - timedelta(days=1), date__lte=today)
+    )
 
 
 # ==========================
 # TOTAIS GERAIS (ADMIN OU SELLER)
 # ==========================
+@request_memoize
 def get_total_sales_amount_for_active_sellers(seller_id: int = None) -> Decimal:
     """
     Retorna o valor total de vendas de todos os vendedores ativos
@@ -1,3 +1,392 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.timezone import localdate
+
+from apps.accounts.models import User
+from apps.commissions.models import Commission
+from apps.commissions.services import (
+    create_payout_batch, get_payout_batch_summary, get_total_commission_value, iter_payout_batch_details,
+    reconcile_commission_counters,
+)
+from apps.dashboard.models import SellerDailyRollup
+from apps.sales.models import Sale
+from apps.sales.services import get_sales_dashboard_stats
+
+
+class ImportSalesCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='import@example.com', cpf='30000000000', password='senha-forte-123',
+            first_name='Import', commission_rate=Decimal('5.00'),
+        )
+        Sale.objects.create(seller=cls.seller, date=date(2025, 1, 1), total_amount=Decimal('10.00'))
+
+    def write_file(self, name, content):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / name
+        path.write_text(content, encoding='utf-8')
+        return str(path)
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_sales', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_creates_sales_commissions_and_rollup(self):
+        path = self.write_file('vendas.csv', (
+            "seller,date,total_amount\n"
+            f"{self.seller.id},2025-01-02,100.00\n"
+            f"{self.seller.id},03/01/2025,\"50,40\"\n"
+            f"{self.seller.id},2025-01-01,20.00\n"   # já existe no banco
+            f"{self.seller.id},2025-01-02,30.00\n"   # repetida no arquivo
+            "999999,2025-01-04,10.00\n"             # vendedor inexistente
+            f"{self.seller.id},2025-01-05,-1\n"     # valor inválido
+        ))
+
+        # Inclui o incremento das versões de cache, feito após o commit.
+        with self.assertNumQueries(12), self.captureOnCommitCallbacks(execute=True):
+            out, err = self.run_import(path, '--chunk-size', '100')
+
+        self.assertIn("2 vendas importadas, 4 rejeitadas", out)
+        self.assertIn("Linha 4: já existe", err)
+        self.assertIn("Linha 5: já existe", err)
+        self.assertIn("Linha 6: vendedor não encontrado", err)
+        self.assertIn("Linha 7: o valor total deve ser maior que zero", err)
+
+        commission = Commission.objects.get(sale__date=date(2025, 1, 2))
+        self.assertEqual((commission.percentage, commission.value), (Decimal('5.00'), Decimal('5.00')))
+        self.assertEqual(commission.seller_id, self.seller.id)
+        self.assertEqual(
+            SellerDailyRollup.objects.get(seller=self.seller, date=date(2025, 1, 3)).commission_total,
+            Decimal('2.52'),
+        )
+
+    def test_jsonl_import_in_several_chunks_by_email(self):
+        lines = [
+            f'{{"seller": "IMPORT@example.com", "date": "2025-02-{day:02d}", "total_amount": "10"}}'
+            for day in range(1, 11)
+        ]
+        lines.append('não é json')
+        path = self.write_file('vendas.jsonl', "\n".join(lines))
+
+        out, err = self.run_import(path, '--seller-field', 'email', '--chunk-size', '3')
+
+        self.assertIn("10 vendas importadas, 1 rejeitadas", out)
+        self.assertIn("Linha 11: JSON inválido", err)
+        self.assertEqual(Commission.objects.filter(sale__date__month=2).count(), 10)
+
+    def test_email_import_ignores_case_of_the_stored_email(self):
+        User.objects.create_user(
+            email='Joao@loja.com', cpf='31000000000', password='senha-forte-123',
+            first_name='Joao', commission_rate=Decimal('5.00'),
+        )
+        path = self.write_file('vendas.jsonl', '{"seller": "joao@LOJA.com", "date": "2025-03-01", "total_amount": "10"}')
+
+        out, _ = self.run_import(path, '--seller-field', 'email')
+
+        self.assertIn("1 vendas importadas, 0 rejeitadas", out)
+        self.assertTrue(Sale.objects.filter(seller__email='Joao@loja.com', date=date(2025, 3, 1)).exists())
+
+
+@override_settings(SALES_API_TOKEN='token-pdv')
+class SaleBatchUpsertViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='pdv@example.com', cpf='40000000000', password='senha-forte-123',
+            first_name='Pdv', commission_rate=Decimal('10.00'),
+        )
+        cls.existing = Sale.objects.create(seller=cls.seller, date=date(2025, 3, 1), total_amount=Decimal('100.00'))
+        cls.same = Sale.objects.create(seller=cls.seller, date=date(2025, 3, 2), total_amount=Decimal('50.00'))
+
+    def post(self, payload, token='token-pdv'):
+        return self.client.post(
+            reverse('sales:sales_batch_upsert'),
+            data=json.dumps(payload),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+
+    def test_requires_token(self):
+        response = self.post({'records': []}, token='errado')
+        self.assertEqual(response.status_code, 401)
+
+    def test_upsert_reports_status_per_record(self):
+        records = [
+            {'seller': self.seller.id, 'date': '2025-03-01', 'total_amount': '200.00'},
+            {'seller': self.seller.id, 'date': '2025-03-02', 'total_amount': '50.00'},
+            {'seller': self.seller.id, 'date': '2025-03-03', 'total_amount': '30.00'},
+            {'seller': self.seller.id, 'date': '2025-03-03', 'total_amount': '31.00'},
+            {'seller': self.seller.id, 'date': 'ontem', 'total_amount': '1'},
+        ]
+
+        response = self.post({'records': records})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['summary'], {'created': 1, 'updated': 1, 'unchanged': 1, 'error': 2})
+        self.assertEqual([r['status'] for r in body['results']],
+                         ['updated', 'unchanged', 'created', 'error', 'error'])
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.total_amount, Decimal('200.00'))
+        self.assertEqual(self.existing.commission.value, Decimal('20.00'))
+        created = Sale.objects.get(pk=body['results'][2]['sale_id'])
+        self.assertEqual(created.commission.value, Decimal('3.00'))
+        self.assertEqual(
+            SellerDailyRollup.objects.get(seller=self.seller, date=date(2025, 3, 1)).commission_total,
+            Decimal('20.00'),
+        )
+
+    def test_paid_sale_is_not_rewritten(self):
+        batch, _ = create_payout_batch([self.seller.pk], idempotency_key='upsert-pago')
+
+        response = self.post({'records': [
+            {'seller': self.seller.id, 'date': '2025-03-01', 'total_amount': '300.00'},
+        ]})
+
+        result = response.json()['results'][0]
+        self.assertEqual((result['status'], result['sale_id']), ('error', self.existing.pk))
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.commission.value, Decimal('10.00'))
+        rows = list(get_payout_batch_summary(batch))
+        self.assertEqual(sum(row['total_commission'] for row in rows), batch.total_commission)
+        self.assertEqual(reconcile_commission_counters(dry_run=True), [])
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        records = [
+            {'seller': self.seller.id, 'date': f'2025-04-{day:02d}', 'total_amount': '10.00'}
+            for day in range(1, 31)
+        ]
+        with self.assertNumQueries(12), self.captureOnCommitCallbacks(execute=True):
+            response = self.post({'records': records})
+        self.assertEqual(response.json()['summary']['created'], 30)
+
+
+class SaleListViewQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='lista@example.com', cpf='60000000000', password='senha-forte-123',
+            first_name='Lista', commission_rate=Decimal('2.00'),
+        )
+        for day in range(1, 26):
+            Sale.objects.create(seller=cls.seller, date=date(2025, 1, day), total_amount=Decimal('100.00'))
+
+    def test_list_runs_fixed_number_of_queries(self):
+        self.client.force_login(self.seller)
+
+        # sessão + usuário + validador + count da paginação + página + totais
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('sales:sales_list'), {'year': '2025', 'month': '1'})
+
+        sales = response.context['sales']
+        self.assertEqual(len(sales), 20)
+        self.assertTrue(all(sale.calculated_commission == Decimal('2.00') for sale in sales))
+        self.assertEqual(response.context['total_commission_filtered'], '50,00')
+
+    def test_unchanged_list_answers_not_modified_until_a_sale_is_deleted(self):
+        self.client.force_login(self.seller)
+        url = reverse('sales:sales_list')
+        params = {'year': '2025', 'month': '1'}
+        first = self.client.get(url, params)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        # Excluir uma venda antiga não muda a última alteração, mas muda a contagem.
+        Sale.objects.get(seller=self.seller, date=date(2025, 1, 1)).delete()
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+class SalesDashboardStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='stats@example.com', cpf='80000000000', password='senha-forte-123',
+            first_name='Stats', commission_rate=Decimal('10.00'),
+        )
+        for day in (1, 15, 28):
+            Sale.objects.create(seller=cls.seller, date=date(2024, 2, day), total_amount=Decimal('100.00'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stats_come_from_one_query_and_are_cached(self):
+        # versões de cache + agregação
+        with self.assertNumQueries(2):
+            stats = get_sales_dashboard_stats(self.seller.id, 2024, 2)
+        self.assertEqual(stats['month_count'], 3)
+        self.assertEqual(stats['month_amount'], '300,00')
+        self.assertEqual(stats['average_ticket'], '100,00')
+        self.assertEqual(stats['month_commission'], '30,00')
+        self.assertEqual(stats['today_count'], 0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_sales_dashboard_stats(self.seller.id, 2024, 2), stats)
+
+    def test_cache_is_invalidated_by_seller_writes(self):
+        get_sales_dashboard_stats(self.seller.id, 2024, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(seller=self.seller, date=date(2024, 2, 20), total_amount=Decimal('50.00'))
+            Sale.objects.create(seller=self.seller, date=localdate(), total_amount=Decimal('7.00'))
+
+        stats = get_sales_dashboard_stats(self.seller.id, 2024, 2)
+        self.assertEqual(stats['month_count'], 4)
+        self.assertEqual(stats['month_commission'], '35,00')
+        self.assertEqual((stats['today_count'], stats['today_amount']), (1, '7,00'))
+
+
+    def test_closed_month_survives_todays_sale(self):
+        get_sales_dashboard_stats(self.seller.id, 2024, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(seller=self.seller, date=localdate(), total_amount=Decimal('7.00'))
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = get_sales_dashboard_stats(self.seller.id, 2024, 2)
+        self.assertEqual((stats['today_count'], stats['month_count']), (1, 3))
+        # Só o bloco do dia é recalculado; o mês fechado vem do cache.
+        self.assertFalse(any('month_total' in query['sql'] for query in queries))
+
+
+class SoftDeleteTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            email='exclusao@example.com', cpf='56000000000', password='senha-forte-123',
+            first_name='Exclusao', commission_rate=Decimal('10.00'),
+        )
+        self.sale = Sale.objects.create(seller=self.seller, date=date(2025, 1, 1), total_amount=Decimal('100.00'))
+        self.client.force_login(self.seller)
+
+    def test_delete_flags_sale_and_commission_and_frees_the_day(self):
+        response = self.client.post(reverse('sales:sales_delete', args=[self.sale.pk]))
+
+        self.assertRedirects(response, reverse('sales:sales_list'), fetch_redirect_response=False)
+        self.assertFalse(Sale.objects.filter(pk=self.sale.pk).exists())
+        self.assertTrue(Sale.all_objects.get(pk=self.sale.pk).is_deleted)
+        self.assertTrue(Commission.all_objects.get(sale_id=self.sale.pk).is_deleted)
+        self.assertFalse(SellerDailyRollup.objects.filter(seller=self.seller).exists())
+        self.assertEqual(get_total_commission_value(), Decimal('0.00'))
+        self.assertEqual(reconcile_commission_counters(dry_run=True), [])
+
+        # O dia fica livre para uma nova venda (unicidade só entre as vivas).
+        Sale.objects.create(seller=self.seller, date=date(2025, 1, 1), total_amount=Decimal('50.00'))
+        self.assertEqual(get_total_commission_value(), Decimal('5.00'))
+
+    def test_purge_removes_only_old_tombstones_in_batches(self):
+        recent = Sale.objects.create(seller=self.seller, date=date(2025, 1, 2), total_amount=Decimal('10.00'))
+        Sale.objects.create(seller=self.seller, date=date(2025, 1, 3), total_amount=Decimal('20.00'))
+        for sale in (self.sale, recent):
+            self.client.post(reverse('sales:sales_delete', args=[sale.pk]))
+        long_ago = timezone.now() - timedelta(days=60)
+        Sale.all_objects.filter(pk=self.sale.pk).update(deleted_at=long_ago)
+        Commission.all_objects.filter(sale_id=self.sale.pk).update(deleted_at=long_ago)
+
+        call_command('purge_deleted', days=30, batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            list(Sale.all_objects.order_by('date').values_list('date', 'is_deleted')),
+            [(date(2025, 1, 2), True), (date(2025, 1, 3), False)],
+        )
+        self.assertFalse(Commission.all_objects.filter(sale_id=self.sale.pk).exists())
+        self.assertEqual(get_total_commission_value(), Decimal('2.00'))
+        self.assertEqual(reconcile_commission_counters(dry_run=True), [])
+
+    def test_sale_with_paid_commission_cannot_be_deleted(self):
+        create_payout_batch([self.seller.pk], idempotency_key='exclusao-paga')
+
+        response = self.client.post(reverse('sales:sales_delete', args=[self.sale.pk]), follow=True)
+
+        self.assertContains(response, "Vendas com comissão já paga não podem ser excluídas.")
+        self.assertTrue(Sale.objects.filter(pk=self.sale.pk).exists())
+        self.assertFalse(Commission.all_objects.get(sale_id=self.sale.pk).is_deleted)
+        self.assertEqual(reconcile_commission_counters(dry_run=True), [])
+
+    def test_purge_keeps_commissions_of_payout_batches(self):
+        batch, _ = create_payout_batch([self.seller.pk], idempotency_key='purge-lote')
+        # Exclusão gravada antes da regra que bloqueia vendas pagas.
+        long_ago = timezone.now() - timedelta(days=60)
+        Sale.all_objects.filter(pk=self.sale.pk).update(is_deleted=True, deleted_at=long_ago)
+        Commission.all_objects.filter(sale_id=self.sale.pk).update(is_deleted=True, deleted_at=long_ago)
+
+        call_command('purge_deleted', days=30, stdout=StringIO())
+
+        self.assertTrue(Sale.all_objects.filter(pk=self.sale.pk).exists())
+        rows = list(get_payout_batch_summary(batch))
+        self.assertEqual(sum(row['total_commission'] for row in rows), batch.total_commission)
+        self.assertEqual(sum(row['commission_count'] for row in rows), batch.commission_count)
+        self.assertEqual(len(list(iter_payout_batch_details(batch))), batch.commission_count)
+
+
+class SaleAdminDeleteTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin-exclusao@example.com', cpf='57000000000', password='senha-forte-123',
+            first_name='Admin', user_type='admin', is_staff=True, is_superuser=True,
+        )
+        self.seller = User.objects.create_user(
+            email='admin-vendedor@example.com', cpf='57000000001', password='senha-forte-123',
+            first_name='Vendedor', commission_rate=Decimal('10.00'),
+        )
+        self.paid = Sale.objects.create(seller=self.seller, date=date(2025, 1, 1), total_amount=Decimal('100.00'))
+        create_payout_batch([self.seller.pk], idempotency_key='admin-exclusao')
+        self.open = Sale.objects.create(seller=self.seller, date=date(2025, 1, 2), total_amount=Decimal('50.00'))
+        self.client.force_login(self.admin)
+
+    def test_delete_view_soft_deletes_an_open_sale(self):
+        url = reverse('admin:sales_sale_delete', args=[self.open.pk])
+        response = self.client.get(url)
+        self.assertContains(response, "Vendedor - 02/01/2025")
+        self.assertNotContains(response, "(comissão já paga)")
+
+        self.client.post(url, {'post': 'yes'})
+
+        self.assertTrue(Sale.all_objects.get(pk=self.open.pk).is_deleted)
+        self.assertTrue(Commission.all_objects.get(sale_id=self.open.pk).is_deleted)
+        self.assertEqual(reconcile_commission_counters(dry_run=True), [])
+
+    def test_delete_view_refuses_a_paid_sale(self):
+        url = reverse('admin:sales_sale_delete', args=[self.paid.pk])
+
+        response = self.client.post(url, {'post': 'yes'}, follow=True)
+
+        self.assertContains(response, "(comissão já paga)")
+        self.assertEqual(list(response.context['messages']), [])
+        self.assertFalse(Sale.all_objects.get(pk=self.paid.pk).is_deleted)
+
+    def test_bulk_delete_refuses_a_selection_with_paid_sales(self):
+        response = self.client.post(reverse('admin:sales_sale_changelist'), {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': [self.paid.pk, self.open.pk],
+        }, follow=True)
+
+        self.assertContains(response, "(comissão já paga)")
+        self.assertEqual(list(response.context['messages']), [])
+        self.assertEqual(Sale.objects.count(), 2)
+
+    def test_commissions_cannot_be_deleted_in_the_admin(self):
+        commission = Commission.objects.get(sale=self.open)
+
+        response = self.client.post(reverse('admin:commissions_commission_delete', args=[commission.pk]), {'post': 'yes'})
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Commission.all_objects.get(pk=commission.pk).is_deleted)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import SaleCreateView, SaleListView, SaleDeleteView, SaleUpdateView
+from .views import SaleCreateView, SaleListView, SaleDeleteView, SaleUpdateView, SaleBatchUpsertView
 
 app_name = 'sales'
 
@@ -8,5 +8,6 @@ urlpatterns = [
     path('list/', SaleListView.as_view(), name='sales_list'),
     path('sale/<int:pk>/update/', SaleUpdateView.as_view(), name='sales_update'),
     path('sale/<int:pk>/delete/', SaleDeleteView.as_view(), name='sales_delete'),
+    path('batch/', SaleBatchUpsertView.as_view(), name='sales_batch_upsert'),
     #path('dashboard/', sale_dashboard, name='sales_dashboard'),
 ]
\ No newline at end of file
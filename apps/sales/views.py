@@ -2,19 +2,26 @@
 from django.shortcuts import redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
+from django.views import View
 from django.views.generic import CreateView, ListView, DeleteView, UpdateView
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
+from django.http import JsonResponse
+from django.conf import settings
 from django.urls import reverse_lazy
 from django.core.exceptions import ValidationError
 from decimal import Decimal
 import datetime
-
-from django.db.models import Sum
-from django.db.models.functions import Coalesce
+import hmac
+import json
 
 from .models import Sale
 from .forms import SaleForm
-from .services import create_sale, get_sales_by_seller
-from apps.commissions.models import Commission  # 👈 Import correto
+from apps.core.mixins import ConditionalGetMixin, DataWriteMixin, mark_data_written
+from .services import (
+    SELLER_LOOKUP_FIELDS, create_sale, delete_sale, get_sales_by_seller, get_sales_totals, get_sales_validator,
+    sales_list_period, upsert_sales_batch,
+)
 
 # ============================================================
 # CREATE VIEW
@@ -29,6 +36,7 @@ class SaleCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         try:
             self.object = create_sale(self.request.user, form)
+            mark_data_written(self.request)
             messages.success(self.request, "Venda criada com sucesso!", extra_tags='success')
             return redirect(self.get_success_url())
 
@@ -41,21 +49,17 @@ class SaleCreateView(LoginRequiredMixin, CreateView):
 # ============================================================
 # LIST VIEW (com correção de comissão e filtros)
 # ============================================================
-class SaleListView(LoginRequiredMixin, ListView):
+class SaleListView(LoginRequiredMixin, ConditionalGetMixin, ListView):
     model = Sale
     template_name = 'sales/sale_list.html'
     context_object_name = 'sales'
     paginate_by = 20
     login_url = 'accounts:login'
+    # sessão + usuário + validador (GET condicional) + count da paginação + página + totais
+    query_budget = 6
 
-    def get_queryset(self):
-        user = self.request.user
-        if getattr(user, 'user_type', None) != 'sellers':
-            return Sale.objects.none()
-
-        queryset = get_sales_by_seller(user.id)
-
-        # Lógica de filtro
+    def select_filters(self):
+        """ Lê os filtros da URL (os valores selecionados também vão para o contexto). """
         if any(k in self.request.GET for k in ['year', 'month', 'day']):
             self.selected_year = self.request.GET.get('year', '')
             self.selected_month = self.request.GET.get('month', '')
@@ -66,14 +70,26 @@ class SaleListView(LoginRequiredMixin, ListView):
             self.selected_month = str(today.month)
             self.selected_day = ''
 
-        if self.selected_year:
-            queryset = queryset.filter(date__year=self.selected_year)
-        if self.selected_month:
-            queryset = queryset.filter(date__month=self.selected_month)
-        if self.selected_day:
-            queryset = queryset.filter(date__day=self.selected_day)
+    def is_seller(self):
+        return getattr(self.request.user, 'user_type', None) == 'sellers'
+
+    def get_validator(self):
+        self.select_filters()
+        if not self.is_seller():
+            return None, 0
+        return get_sales_validator(
+            self.request.user.id,
+            sales_list_period(self.selected_year, self.selected_month, self.selected_day),
+        )
+
+    def get_queryset(self):
+        self.select_filters()
+        if not self.is_seller():
+            return Sale.objects.none()
 
-        return queryset
+        return get_sales_by_seller(self.request.user.id).filter(
+            sales_list_period(self.selected_year, self.selected_month, self.selected_day)
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -82,32 +98,24 @@ class SaleListView(LoginRequiredMixin, ListView):
         # Comissão padrão do usuário (fallback, se necessário)
         commission_rate = getattr(user, 'commission_rate', Decimal('0.00'))
 
-        # 1️⃣ Totais gerais filtrados
-        totals = self.object_list.aggregate(
-            total_vendas=Coalesce(Sum('total_amount'), Decimal('0.00'))
-        )
-        total_sales_amount = totals['total_vendas']
-
-        # Somar comissões REAIS do banco (não recalculadas)
-        total_commission_amount = Commission.objects.filter(
-            sale__in=self.object_list
-        ).aggregate(
-            total_comissoes=Coalesce(Sum('value'), Decimal('0.00'))
-        )['total_comissoes']
+        # 1️⃣ Totais gerais filtrados (vendas e comissões REAIS do banco)
+        if self.is_seller():
+            totals = get_sales_totals(
+                user.id,
+                year=self.selected_year,
+                month=self.selected_month,
+                day=self.selected_day,
+            )
+        else:
+            totals = {'total_sales': Decimal('0.00'), 'total_commission': Decimal('0.00')}
+        total_sales_amount = totals['total_sales']
+        total_commission_amount = totals['total_commission']
 
         context['total_sales_filtered'] = f"{total_sales_amount:.2f}".replace(".", ",")
         context['total_commission_filtered'] = f"{total_commission_amount:.2f}".replace(".", ",")
 
-        # 2️⃣ Atribuir comissão real de cada venda
-        sales_list = context.get('sales', [])
-        sales_with_commission = []
-
-        for sale in sales_list:
-            commission = Commission.objects.filter(sale=sale).first()
-            sale.calculated_commission = commission.value if commission else Decimal('0.00')
-            sales_with_commission.append(sale)
-
-        context['sales'] = sales_with_commission
+        # 2️⃣ A comissão real de cada venda já vem anotada pelo serviço
+        #    (sale.calculated_commission), sem query extra por venda.
 
         # 3️⃣ Filtros disponíveis
         context['selected_year'] = self.selected_year
@@ -139,14 +147,21 @@ class SaleDeleteView(LoginRequiredMixin, DeleteView):
         return super().get_queryset().filter(seller=self.request.user)
 
     def form_valid(self, form):
+        # Exclusão lógica; vendas com comissão paga não podem ser excluídas.
+        try:
+            delete_sale(self.object)
+        except ValidationError as e:
+            messages.error(self.request, e.messages[0], extra_tags='danger')
+            return redirect(self.get_success_url())
+        mark_data_written(self.request)
         messages.success(self.request, "Venda excluída com sucesso.", extra_tags='success')
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
 
 
 # ============================================================
 # UPDATE VIEW
 # ============================================================
-class SaleUpdateView(LoginRequiredMixin, UpdateView):
+class SaleUpdateView(LoginRequiredMixin, DataWriteMixin, UpdateView):
     model = Sale
     form_class = SaleForm
     template_name = 'sales/sale_update.html'
@@ -160,3 +175,48 @@ class SaleUpdateView(LoginRequiredMixin, UpdateView):
     def form_valid(self, form):
         messages.success(self.request, "Venda atualizada com sucesso.", extra_tags='success')
         return super().form_valid(form)
+
+
+# ============================================================
+# BATCH UPSERT (INTEGRAÇÃO COM PDV)
+# ============================================================
+@method_decorator(csrf_exempt, name='dispatch')
+class SaleBatchUpsertView(View):
+    """
+    Recebe os fechamentos diários dos PDVs em lote (JSON) e cria ou
+    atualiza as vendas pela chave (vendedor, data).
+
+    Autenticação por token: cabeçalho `Authorization: Bearer <SALES_API_TOKEN>`.
+
+    Corpo: {"seller_field": "id", "records": [{"seller": 1, "date": "2025-01-31", "total_amount": "123.45"}]}
+    """
+    max_records = 1000
+
+    def post(self, request, *args, **kwargs):
+        token = getattr(settings, 'SALES_API_TOKEN', '')
+        provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not token or not hmac.compare_digest(provided, token):
+            return JsonResponse({'error': "Token inválido."}, status=401)
+
+        try:
+            payload = json.loads(request.body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return JsonResponse({'error': "JSON inválido."}, status=400)
+
+        records = payload.get('records') if isinstance(payload, dict) else payload
+        seller_field = payload.get('seller_field', 'id') if isinstance(payload, dict) else 'id'
+
+        if not isinstance(records, list) or not records:
+            return JsonResponse({'error': "Envie uma lista 'records' com ao menos um registro."}, status=400)
+        if len(records) > self.max_records:
+            return JsonResponse({'error': f"Máximo de {self.max_records} registros por requisição."}, status=400)
+        if seller_field not in SELLER_LOOKUP_FIELDS:
+            return JsonResponse({'error': f"seller_field deve ser um de: {', '.join(SELLER_LOOKUP_FIELDS)}."}, status=400)
+
+        results = upsert_sales_batch(records, seller_field=seller_field)
+
+        summary = {status: 0 for status in ('created', 'updated', 'unchanged', 'error')}
+        for result in results:
+            summary[result['status']] += 1
+
+        return JsonResponse({'summary': summary, 'results': results})
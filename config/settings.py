@@ -1,3 +1,5 @@
+import sys
+import tempfile
 from pathlib import Path
 from decouple import config
 from django.contrib.messages import constants as messages
@@ -35,10 +37,13 @@ INSTALLED_APPS = [
 # Middleware
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.QueryBudgetMiddleware',
+    'apps.core.middleware.RequestMemoMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.middleware.ReportingPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,9 +78,80 @@ DATABASES = {
         'PASSWORD': None if DEBUG else config('DB_PASSWORD', default=''),
         'HOST': None if DEBUG else config('DB_HOST', default=''),
         'PORT': None if DEBUG else config('DB_PORT', default=''),
+        # Conexões persistentes, validadas antes de cada requisição.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0 if DEBUG else 600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # BEGIN IMMEDIATE: a transação pega o lock de escrita logo no início, em vez
+    # de falhar com "database is locked" ao promover um lock de leitura.
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+
+# Banco de relatórios (apps.core.routers): dashboard do admin, histórico e
+# exportações leem deste alias. Pode ser uma réplica ou um snapshot SQLite
+# atualizado com `manage.py refresh_reporting_snapshot`. Sem REPORTING_DB_NAME,
+# tudo lê do default. Depois de uma escrita, o usuário lê do default por
+# REPORTING_PIN_SECONDS (use pelo menos o intervalo de atualização do snapshot).
+REPORTING_DATABASE_ALIAS = 'reporting'
+REPORTING_PIN_SECONDS = config('REPORTING_PIN_SECONDS', default=300, cast=int)
+if config('REPORTING_DB_NAME', default=''):
+    DATABASES[REPORTING_DATABASE_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': config('REPORTING_DB_NAME'),
+        'HOST': config('REPORTING_DB_HOST', default=DATABASES['default']['HOST']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['apps.core.routers.ReportingRouter']
+
+# Cache dos dashboards (apps.core.cache). Com vários workers na mesma máquina,
+# use o backend filebased: com locmem cada processo tem o seu cache (e os seus
+# contadores de versão).
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': config('CACHE_LOCATION', default=str(Path(tempfile.gettempdir()) / 'bibipay-cache')),
+        'TIMEOUT': 300,
+    }
+}
+
+# Arquivos de lock do recálculo de cache (apps.core.cache.acquire_lock).
+CACHE_LOCK_DIR = config('CACHE_LOCK_DIR', default=str(Path(tempfile.gettempdir()) / 'bibipay-locks'))
+
+# Por quanto tempo (s) cada processo reaproveita as versões lidas da tabela
+# CacheVersion; é o atraso máximo para a invalidação chegar aos outros workers.
+CACHE_VERSION_TTL = config('CACHE_VERSION_TTL', default=2, cast=int)
+
+# PRAGMAs aplicados em cada conexão SQLite nova (apps.core.db). WAL deixa
+# leitores e o escritor trabalharem ao mesmo tempo; com ele, synchronous=NORMAL
+# continua seguro contra corrupção e evita um fsync por commit.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),
+    'cache_size': -config('SQLITE_CACHE_SIZE_KB', default=20000, cast=int),  # negativo = KiB
+}
+
+# Dashboards leem do consolidado diário (SellerDailyRollup) em vez das vendas brutas
+DASHBOARD_USE_ROLLUP = config('DASHBOARD_USE_ROLLUP', default=True, cast=bool)
+
+# Token da integração com os PDVs (POST /vendas/batch/). Vazio = endpoint desativado.
+SALES_API_TOKEN = config('SALES_API_TOKEN', default='')
+
+# Orçamento de queries por view (apps.core.middleware): estourar o orçamento
+# falha a requisição nos testes e só gera warning em produção.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=TESTING, cast=bool)
+
+# Tempo máximo do django.setup() de um worker (apps.core.startup / comando check_startup).
+STARTUP_BUDGET_MS = config('STARTUP_BUDGET_MS', default=2000, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -113,6 +189,10 @@ LOGGING = {
     'disable_existing_loggers': False,
     'handlers': {'console': {'class': 'logging.StreamHandler'}},
     'root': {'handlers': ['console'], 'level': 'DEBUG' if DEBUG else 'INFO'},
+    'loggers': {
+        # Uma linha JSON por requisição com as queries executadas.
+        'apps.core.queries': {'level': config('QUERY_LOG_LEVEL', default='WARNING' if TESTING else 'INFO')},
+    },
 }
 
 # Default primary key